@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+"""
+Mock OpenAI-compatible LLM server for offline benchmarking of post_generator.py.
+
+Implements /v1/chat/completions (streaming and non-streaming, including `n`)
+and /v1/models. Replies are templated per pipeline stage, so EXTRACT, SCORE,
+pairwise, SELECT and VALIDATE receive JSON their parsers accept, and candidate
+and synthesis calls receive a markdown article. Latency follows a simple
+server model: queueing for a limited number of decode slots, prefill time
+proportional to uncached prompt tokens, a log-normal time-to-first-token and a
+fixed decode rate. 429s, 5xx errors and malformed JSON are injected at
+configurable rates.
+
+Usage:
+    python mock_llm_server.py --port 8088
+    python mock_llm_server.py --ttft 0.8 --tokens-per-second 40 --rate-429 0.02 --rate-5xx 0.01
+    python post_generator.py --candidate-presets mock,mock-alt --pipeline-preset mock --iterations 6 --parallel
+
+Counters for the current run are served at GET /stats.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DEFAULT_CRITERIA = [
+    "hook_strength", "argument_clarity", "evidence_quality", "structural_coherence",
+    "originality", "memorability", "actionability"
+]
+
+PREFIX_BLOCK_CHARS = 256  # Prefix cache granularity (about 64 tokens, like a vLLM block)
+
+
+@dataclass
+class MockConfig:
+    """Latency, capacity and failure model of the mock server."""
+    models: List[str] = field(default_factory=lambda: ["mock-fast", "mock-alt"])
+    ttft: float = 0.3  # Median time-to-first-token in seconds (log-normal)
+    ttft_sigma: float = 0.5  # Log-normal sigma of time-to-first-token
+    tokens_per_second: float = 80.0  # Decode rate per request
+    prefill_tokens_per_second: float = 8000.0  # Prefill rate for uncached prompt tokens
+    max_concurrent: int = 32  # Decode slots; further requests queue
+    article_words: int = 900  # Length of generated articles
+    think_ratio: float = 0.0  # Fraction of replies that start with a <think> block
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    rate_malformed: float = 0.0  # Fraction of JSON replies replaced by prose (never with response_format)
+    retry_after: float = 1.0  # Retry-After header sent with 429s
+    seed: Optional[int] = None
+
+
+class MockState:
+    """Shared counters, decode slots and prefix cache of one server process."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.slots = threading.BoundedSemaphore(max(1, config.max_concurrent))
+        self._lock = threading.Lock()
+        self._prefix_blocks: set = set()
+        self.stats: Dict[str, Any] = {
+            "requests": 0,
+            "streamed": 0,
+            "choices": 0,
+            "errors_429": 0,
+            "errors_5xx": 0,
+            "malformed": 0,
+            "structured": 0,
+            "thinking_disabled": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "completion_tokens": 0,
+            "in_flight": 0,
+            "peak_in_flight": 0,
+            "stages": {}
+        }
+
+    def count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+
+    def count_stage(self, stage: str) -> None:
+        with self._lock:
+            self.stats["stages"][stage] = self.stats["stages"].get(stage, 0) + 1
+
+    def enter(self) -> None:
+        with self._lock:
+            self.stats["in_flight"] += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+
+    def leave(self) -> None:
+        with self._lock:
+            self.stats["in_flight"] -= 1
+
+    def roll(self) -> float:
+        with self._lock:
+            return self.rng.random()
+
+    def cached_prefix_tokens(self, prompt: str) -> int:
+        """Return prompt tokens served from the simulated prefix cache and cache the rest.
+
+        Blocks are chained hashes of fixed-size prompt slices, so only an
+        identical prefix hits, as with vLLM's automatic prefix caching.
+        """
+        digest = hashlib.sha256()
+        cached_chars = 0
+        hit = True
+        with self._lock:
+            if len(self._prefix_blocks) > 200_000:
+                self._prefix_blocks.clear()
+            for start in range(0, len(prompt) - PREFIX_BLOCK_CHARS + 1, PREFIX_BLOCK_CHARS):
+                digest.update(prompt[start:start + PREFIX_BLOCK_CHARS].encode("utf-8"))
+                key = digest.hexdigest()
+                if hit and key in self._prefix_blocks:
+                    cached_chars += PREFIX_BLOCK_CHARS
+                else:
+                    hit = False
+                    self._prefix_blocks.add(key)
+        return estimate_tokens(prompt[:cached_chars])
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return json.loads(json.dumps(self.stats))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)."""
+    return max(1, math.ceil(len(text) / 4)) if text else 0
+
+
+# ============================================================================
+# RESPONSE TEMPLATES
+# Purpose: Stage-appropriate replies that the pipeline's parsers accept
+# ============================================================================
+
+FILLER_WORDS = (
+    "reality capture teams share geospatial data across projects while field crews upload scans "
+    "and stakeholders review progress in the browser with measurable savings in time and travel "
+    "the platform keeps every asset versioned searchable and ready for collaboration"
+).split()
+
+JSON_STAGES = ("EXTRACT", "SCORE", "PAIRWISE", "SELECT", "VALIDATE")
+
+
+def detect_stage(system_prompt: str, user_prompt: str) -> str:
+    """Identify the pipeline stage from the prompts post_generator.py sends."""
+    if "content analysis agent" in system_prompt:
+        return "EXTRACT"
+    if "pairwise comparison" in system_prompt:
+        return "PAIRWISE"
+    if "content quality evaluator" in system_prompt:
+        return "SCORE"
+    if "content strategy agent" in system_prompt:
+        return "SELECT"
+    if "content quality assurance agent" in system_prompt:
+        return "VALIDATE"
+    if "synthesis blueprint" in user_prompt:
+        return "SYNTHESIZE"
+    if "condense reference documents" in system_prompt:
+        return "CONDENSE"
+    return "CANDIDATES"
+
+
+def sentence(rng: random.Random, words: int = 12) -> str:
+    text = " ".join(rng.choice(FILLER_WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def article_ids_in(prompt: str) -> List[int]:
+    ids = [int(match) for match in re.findall(r'"article_id": (\d+)', prompt)]
+    return sorted(set(ids)) or [1]
+
+
+def extract_reply(user_prompt: str, rng: random.Random) -> Dict[str, Any]:
+    match = re.search(r"Article #(\d+)", user_prompt)
+    return {
+        "article_id": int(match.group(1)) if match else 1,
+        "headline_candidates": [sentence(rng, 6).rstrip(".") for _ in range(2)],
+        "opening_hook": sentence(rng, 20),
+        "core_argument": sentence(rng, 18),
+        "key_points": [sentence(rng, 10) for _ in range(4)],
+        "memorable_phrases": [sentence(rng, 6) for _ in range(2)],
+        "structural_approach": "Problem-Solution-CTA",
+        "evidence_used": [sentence(rng, 10) for _ in range(2)],
+        "tone": "confident, practical",
+        "target_audience_signals": "Survey and construction teams managing 3D data",
+        "weaknesses": [sentence(rng, 8)],
+        "word_count_estimate": rng.randint(700, 1400)
+    }
+
+
+def score_reply(user_prompt: str, rng: random.Random) -> Dict[str, Any]:
+    criteria = DEFAULT_CRITERIA
+    marker = user_prompt.find("## Scoring Criteria")
+    if marker != -1:
+        try:
+            parsed, _ = json.JSONDecoder().raw_decode(user_prompt, user_prompt.index("{", marker))
+            criteria = list(parsed) or DEFAULT_CRITERIA
+        except ValueError:
+            pass
+    match = re.search(r'"article_id": (\d+)', user_prompt)
+    return {
+        "article_id": int(match.group(1)) if match else 1,
+        "scores": {
+            name: {"score": rng.randint(4, 9), "justification": sentence(rng, 12)} for name in criteria
+        },
+        "standout_strengths": [sentence(rng, 8)],
+        "critical_weaknesses": [sentence(rng, 8)]
+    }
+
+
+def pairwise_reply(user_prompt: str, rng: random.Random) -> Dict[str, Any]:
+    match = re.search(r"better on (\w+)\?", user_prompt) or re.search(r"criterion: (\w+)", user_prompt)
+    return {
+        "criterion": match.group(1) if match else "overall",
+        "winner": "TIE" if rng.random() < 0.05 else rng.choice("AB"),
+        "justification": sentence(rng, 16),
+        "confidence": rng.choice(["high", "medium", "low"])
+    }
+
+
+def select_reply(user_prompt: str, rng: random.Random) -> Dict[str, Any]:
+    ids = article_ids_in(user_prompt)
+    pick = lambda: rng.choice(ids)  # noqa: E731
+    return {
+        "synthesis_blueprint": {
+            "selected_headline": {"source_article": pick(), "headline": sentence(rng, 7).rstrip("."), "rationale": sentence(rng)},
+            "selected_opening": {"source_article": pick(), "approach": sentence(rng), "key_elements": [sentence(rng, 6)], "rationale": sentence(rng)},
+            "selected_structure": {"source_article": pick(), "structure_type": "Problem-Solution-CTA", "section_flow": ["Problem", "Solution", "Proof", "Call to action"], "rationale": sentence(rng)},
+            "selected_arguments": {"primary_source": pick(), "core_thesis": sentence(rng), "supporting_points": [{"point": sentence(rng, 10), "source_article": pick()} for _ in range(3)], "rationale": sentence(rng)},
+            "selected_evidence": [{"evidence": sentence(rng, 10), "source_article": pick(), "where_to_use": "Proof"} for _ in range(2)],
+            "phrases_to_preserve": [{"phrase": sentence(rng, 6), "source_article": pick(), "suggested_placement": "Opening"}],
+            "elements_to_avoid": [sentence(rng, 8)],
+            "synthesis_notes": sentence(rng, 20)
+        },
+        "confidence": {"level": "high", "concerns": []}
+    }
+
+
+def validate_reply(user_prompt: str, system_prompt: str, rng: random.Random) -> Dict[str, Any]:
+    match = re.search(r"at least (\d+(?:\.\d+)?)", system_prompt + user_prompt)
+    threshold = float(match.group(1)) if match else 7.0
+    overall = round(max(threshold, rng.uniform(6.5, 9.0)), 1)
+    return {
+        "passed": True,
+        "blueprint_compliance": {"headline_used": True, "opening_matches": True, "compliance_score": 0.9},
+        "quality_scores": {name: rng.randint(6, 9) for name in DEFAULT_CRITERIA} | {"overall": overall},
+        "coherence_assessment": {"flows_naturally": True, "consistent_voice": True, "no_contradictions": True},
+        "issues": [],
+        "improvement_suggestions": [sentence(rng, 10)],
+        "target_threshold": threshold,
+        "threshold_met": overall >= threshold
+    }
+
+
+def article_reply(rng: random.Random, words: int) -> str:
+    paragraphs = [f"# {sentence(rng, 7).rstrip('.')}"]
+    written = 0
+    while written < words:
+        if written and rng.random() < 0.2:
+            paragraphs.append(f"## {sentence(rng, 4).rstrip('.')}")
+        paragraph = " ".join(sentence(rng, rng.randint(10, 18)) for _ in range(rng.randint(3, 5)))
+        paragraphs.append(paragraph)
+        written += len(paragraph.split())
+    return "\n\n".join(paragraphs)
+
+
+def render_reply(stage: str, system_prompt: str, user_prompt: str, rng: random.Random, config: MockConfig) -> str:
+    """Return the reply text for one choice."""
+    if stage == "EXTRACT":
+        return json.dumps(extract_reply(user_prompt, rng), indent=2)
+    if stage == "SCORE":
+        return json.dumps(score_reply(user_prompt, rng), indent=2)
+    if stage == "PAIRWISE":
+        return json.dumps(pairwise_reply(user_prompt, rng), indent=2)
+    if stage == "SELECT":
+        return json.dumps(select_reply(user_prompt, rng), indent=2)
+    if stage == "VALIDATE":
+        return json.dumps(validate_reply(user_prompt, system_prompt, rng), indent=2)
+    if stage == "CONDENSE":
+        match = re.search(r"at most (\d+) words", user_prompt)
+        return article_reply(rng, int(match.group(1)) if match else config.article_words)
+    return article_reply(rng, config.article_words)
+
+
+# ============================================================================
+# REQUEST HANDLING
+# ============================================================================
+
+@dataclass
+class Completion:
+    """Choices and usage of one mock completion."""
+    texts: List[str]
+    finish_reasons: List[str]
+    prompt_tokens: int
+    cached_tokens: int
+    completion_tokens: int
+    reasoning_tokens: int
+    ttft: float
+
+
+def build_completion(body: Dict[str, Any], state: MockState) -> Tuple[str, Completion]:
+    """Render all choices of a request and compute its simulated time-to-first-token."""
+    config = state.config
+    messages = body.get("messages") or []
+    system_prompt = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+    user_prompt = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    stage = detect_stage(system_prompt, user_prompt)
+    structured = "response_format" in body or "guided_json" in body
+    prompt = "".join(m.get("content") or "" for m in messages)
+
+    # Seeded requests are reproducible, like a deterministic backend
+    if body.get("seed") is not None:
+        base_seed = f"{body['seed']}:{hashlib.sha256(prompt.encode('utf-8')).hexdigest()}"
+    else:
+        base_seed = None
+
+    max_tokens = body.get("max_tokens") or body.get("max_completion_tokens") or 4096
+    # Hybrid reasoning models take their thinking switches as chat template arguments
+    template_kwargs = body.get("chat_template_kwargs") or {}
+    thinking_enabled = template_kwargs.get("enable_thinking", True)
+    thinking_budget = template_kwargs.get("thinking_budget")
+    if not thinking_enabled:
+        state.count("thinking_disabled")
+    texts, finish_reasons = [], []
+    reasoning_tokens = 0
+    for index in range(max(1, int(body.get("n") or 1))):
+        rng = random.Random(f"{base_seed}:{index}") if base_seed is not None else random.Random(state.roll())
+        text = render_reply(stage, system_prompt, user_prompt, rng, config)
+        if stage in JSON_STAGES and not structured and state.roll() < config.rate_malformed:
+            text = "I'm sorry, but I can't produce that JSON right now."
+            state.count("malformed")
+        thinking_tokens = 0
+        if thinking_enabled and not structured and state.roll() < config.think_ratio:
+            thinking = " ".join(sentence(rng, 14) for _ in range(4))
+            if thinking_budget:
+                thinking = thinking[:thinking_budget * 4]
+            thinking_tokens = estimate_tokens(thinking)
+            text = f"<think>\n{thinking}\n</think>\n\n{text}"
+        finish_reason = "stop"
+        if estimate_tokens(text) > max_tokens:
+            text = text[:max_tokens * 4]
+            finish_reason = "length"
+        reasoning_tokens += min(thinking_tokens, estimate_tokens(text))
+        texts.append(text)
+        finish_reasons.append(finish_reason)
+
+    prompt_tokens = estimate_tokens(prompt)
+    cached_tokens = min(state.cached_prefix_tokens(prompt), prompt_tokens)
+    prefill = (prompt_tokens - cached_tokens) / config.prefill_tokens_per_second
+    ttft = prefill + config.ttft * math.exp(config.ttft_sigma * random.gauss(0.0, 1.0))
+
+    state.count_stage(stage)
+    if structured:
+        state.count("structured")
+    return stage, Completion(
+        texts=texts,
+        finish_reasons=finish_reasons,
+        prompt_tokens=prompt_tokens,
+        cached_tokens=cached_tokens,
+        completion_tokens=sum(estimate_tokens(text) for text in texts),
+        reasoning_tokens=reasoning_tokens,
+        ttft=ttft
+    )
+
+
+def usage_payload(completion: Completion) -> Dict[str, Any]:
+    return {
+        "prompt_tokens": completion.prompt_tokens,
+        "completion_tokens": completion.completion_tokens,
+        "total_tokens": completion.prompt_tokens + completion.completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": completion.cached_tokens},
+        "completion_tokens_details": {"reasoning_tokens": completion.reasoning_tokens}
+    }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 handler for the OpenAI chat completions subset the pipeline uses."""
+
+    protocol_version = "HTTP/1.1"
+    state: MockState  # Set on the handler class by main()
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, message: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send_json(status, {"error": {"message": message, "type": "mock_error", "code": status}}, headers)
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") in ("/v1/models", "/models"):
+            models = [{"id": name, "object": "model", "owned_by": "mock"} for name in self.state.config.models]
+            self._send_json(200, {"object": "list", "data": models})
+        elif self.path.rstrip("/") in ("/stats", "/v1/stats"):
+            self._send_json(200, self.state.snapshot())
+        elif self.path.rstrip("/") in ("/health", ""):
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_error(404, f"Unknown path {self.path}")
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_error(400, "Request body is not valid JSON")
+            return
+        if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self._send_error(404, f"Unknown path {self.path}")
+            return
+        if not body.get("messages"):
+            self._send_error(400, "messages is required")
+            return
+
+        state = self.state
+        config = state.config
+        state.count("requests")
+
+        failure = state.roll()
+        if failure < config.rate_429:
+            state.count("errors_429")
+            self._send_error(429, "Rate limit exceeded (mock)", {"Retry-After": f"{config.retry_after:g}"})
+            return
+
+        stage, completion = build_completion(body, state)
+
+        state.slots.acquire()  # Queue for a decode slot like a saturated server
+        state.enter()
+        try:
+            time.sleep(completion.ttft)
+            if failure < config.rate_429 + config.rate_5xx:
+                state.count("errors_5xx")
+                self._send_error(random.choice([500, 502, 503]), "Upstream model error (mock)")
+                return
+            state.count("choices", len(completion.texts))
+            state.count("prompt_tokens", completion.prompt_tokens)
+            state.count("cached_tokens", completion.cached_tokens)
+            state.count("completion_tokens", completion.completion_tokens)
+            if body.get("stream"):
+                state.count("streamed")
+                self._stream(body, completion)
+            else:
+                # Choices decode in parallel, so the longest one sets the duration
+                longest = max(estimate_tokens(text) for text in completion.texts)
+                time.sleep(longest / config.tokens_per_second)
+                self._send_json(200, {
+                    "id": f"chatcmpl-mock-{time.time_ns()}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [
+                        {"index": index, "message": {"role": "assistant", "content": text}, "finish_reason": reason}
+                        for index, (text, reason) in enumerate(zip(completion.texts, completion.finish_reasons))
+                    ],
+                    "usage": usage_payload(completion)
+                })
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client cancelled (early stop or hedge loser)
+        finally:
+            state.leave()
+            state.slots.release()
+
+    def _write_chunk(self, payload: Any) -> None:
+        line = "data: " + (payload if isinstance(payload, str) else json.dumps(payload)) + "\n\n"
+        data = line.encode("utf-8")
+        self.wfile.write(b"%x\r\n" % len(data) + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, body: Dict[str, Any], completion: Completion) -> None:
+        """Send the choices as server-sent events paced at the configured decode rate."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        chunk_chars = 16  # About 4 tokens per event
+        delay = (chunk_chars / 4) / self.state.config.tokens_per_second
+        base = {
+            "id": f"chatcmpl-mock-{time.time_ns()}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "mock")
+        }
+        longest = max(len(text) for text in completion.texts)
+        for offset in range(0, longest, chunk_chars):
+            choices = [
+                {"index": index, "delta": {"content": text[offset:offset + chunk_chars]}, "finish_reason": None}
+                for index, text in enumerate(completion.texts)
+                if offset < len(text)
+            ]
+            self._write_chunk({**base, "choices": choices})
+            time.sleep(delay)
+        self._write_chunk({**base, "choices": [
+            {"index": index, "delta": {}, "finish_reason": reason}
+            for index, reason in enumerate(completion.finish_reasons)
+        ]})
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._write_chunk({**base, "choices": [], "usage": usage_payload(completion)})
+        self._write_chunk("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Mock OpenAI-compatible LLM server for offline runs of post_generator.py",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="Example:\n  python mock_llm_server.py --port 8088 --ttft 0.5 --tokens-per-second 60 --rate-429 0.02"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8088, help="Port (default: 8088)")
+    parser.add_argument("--models", default="mock-fast,mock-alt", help="Comma-separated model IDs listed by /v1/models (any model is accepted)")
+    parser.add_argument("--ttft", type=float, default=0.3, help="Median time-to-first-token in seconds (default: 0.3)")
+    parser.add_argument("--ttft-sigma", type=float, default=0.5, help="Log-normal sigma of time-to-first-token; higher means a longer tail (default: 0.5)")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="Decode rate per request (default: 80)")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=8000.0, help="Prefill rate for prompt tokens not in the prefix cache (default: 8000)")
+    parser.add_argument("--max-concurrent", type=int, default=32, help="Decode slots; extra requests queue (default: 32)")
+    parser.add_argument("--article-words", type=int, default=900, help="Length of generated articles (default: 900)")
+    parser.add_argument("--think-ratio", type=float, default=0.0, help="Fraction of replies that start with a <think> block (default: 0)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests rejected with 429 (default: 0)")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Fraction of requests failing with 500/502/503 (default: 0)")
+    parser.add_argument("--rate-malformed", type=float, default=0.0, help="Fraction of JSON-stage replies replaced by prose, unless response_format is set (default: 0)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s (default: 1)")
+    parser.add_argument("--seed", type=int, help="Seed for failure injection and unseeded replies")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        models=[name.strip() for name in args.models.split(",") if name.strip()],
+        ttft=args.ttft,
+        ttft_sigma=args.ttft_sigma,
+        tokens_per_second=args.tokens_per_second,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+        max_concurrent=args.max_concurrent,
+        article_words=args.article_words,
+        think_ratio=args.think_ratio,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        rate_malformed=args.rate_malformed,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    MockHandler.state = MockState(config)
+    server = MockServer((args.host, args.port), MockHandler)
+    print(f"Mock LLM server listening on http://{args.host}:{args.port}/v1 "
+          f"(ttft {config.ttft}s, {config.tokens_per_second:g} tok/s, {config.max_concurrent} slots)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(MockHandler.state.snapshot(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -10,24 +10,50 @@ Includes comprehensive metrics tracking for words, tokens, and execution times.
 """
 
 import argparse
+import asyncio
+import contextvars
+import dataclasses
+import hashlib
+import heapq
 import json
 import math
 import os
+import random
 import re
 import shutil
+import sqlite3
 import statistics
 import sys
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+import typing
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+import httpx
 import yaml
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    OpenAI,
+    RateLimitError,
+)
+
+try:
+    import tiktoken
+except ImportError:  # Optional: token estimates fall back to ~4 characters per token
+    tiktoken = None
 
 # ============================================================================
 # METRICS TRACKING SYSTEM
@@ -43,24 +69,76 @@ class StageMetrics:
     output_tokens: int = 0
     execution_time: float = 0.0
     llm_calls: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    cached_tokens: int = 0  # Prompt tokens served from the provider's prefix cache
+    reasoning_tokens: int = 0  # Hidden thinking tokens (included in output_tokens)
+    generation_time: float = 0.0  # Wall time of the API requests behind the token counts
+    thinking_time: float = 0.0  # Share of generation_time spent decoding reasoning tokens (estimated)
+    prefix_warmups: int = 0
+    coalesced_requests: int = 0  # Requests that joined an identical in-flight request
+    response_bytes: int = 0  # Raw response bytes of JSON stages
+    discarded_bytes: int = 0  # Of those, bytes outside the extracted JSON payload
+    reasoning_bytes: int = 0  # Of those, bytes inside inline reasoning blocks
+    api_requests: int = 0
+    estimated_requests: int = 0  # Requests without a usage report (tokens estimated offline)
+    # preset -> {"requests", "prompt_tokens", "completion_tokens", "reasoning_tokens", "generation_time"}
+    preset_usage: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    # preset -> {"streams", "ttft_total", "ttft_samples", "tokens", "decode_time", "early_stops"}
+    stream_stats: Dict[str, Dict[str, float]] = field(default_factory=dict)
     
     def add_input(self, text: str):
-        """Add input text and calculate tokens."""
-        words = len(text.split())
-        tokens = int(words / 0.75)  # Simple token estimator: word count / 0.75
-        self.input_words += words
-        self.input_tokens += tokens
+        """Add input text (words; tokens come from add_usage)."""
+        self.input_words += len(text.split())
     
     def add_output(self, text: str):
-        """Add output text and calculate tokens."""
-        words = len(text.split())
-        tokens = int(words / 0.75)  # Simple token estimator: word count / 0.75
-        self.output_words += words
-        self.output_tokens += tokens
+        """Add output text (words; tokens come from add_usage)."""
+        self.output_words += len(text.split())
+
+    def add_usage(self, preset: str, counts: Dict[str, int], duration: float, estimated: bool):
+        """Add the token counts of one API request, as reported by the server or estimated."""
+        self.input_tokens += counts["prompt_tokens"]
+        self.output_tokens += counts["completion_tokens"]
+        self.cached_tokens += counts["cached_tokens"]
+        self.reasoning_tokens += counts["reasoning_tokens"]
+        self.generation_time += duration
+        if counts["completion_tokens"]:
+            self.thinking_time += duration * counts["reasoning_tokens"] / counts["completion_tokens"]
+        self.api_requests += 1
+        if estimated:
+            self.estimated_requests += 1
+        stats = self.preset_usage.setdefault(preset, {
+            "requests": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "reasoning_tokens": 0, "generation_time": 0.0
+        })
+        stats["requests"] += 1
+        stats["prompt_tokens"] += counts["prompt_tokens"]
+        stats["completion_tokens"] += counts["completion_tokens"]
+        stats["reasoning_tokens"] += counts["reasoning_tokens"]
+        stats["generation_time"] += duration
+
+    def get_tokens_per_second(self) -> float:
+        """Output tokens per second of API request time."""
+        return self.output_tokens / self.generation_time if self.generation_time > 0 else 0.0
     
     def add_execution_time(self, duration: float):
         """Add execution time."""
         self.execution_time += duration
+
+    def add_stream_sample(self, preset: str, ttft: Optional[float], tokens: int, decode_time: float, early_stop: bool):
+        """Add time-to-first-token and decode throughput for one streamed call."""
+        stats = self.stream_stats.setdefault(preset, {
+            "streams": 0, "ttft_total": 0.0, "ttft_samples": 0,
+            "tokens": 0, "decode_time": 0.0, "early_stops": 0
+        })
+        stats["streams"] += 1
+        if ttft is not None:
+            stats["ttft_total"] += ttft
+            stats["ttft_samples"] += 1
+        stats["tokens"] += tokens
+        stats["decode_time"] += decode_time
+        if early_stop:
+            stats["early_stops"] += 1
     
     def get_total_words(self) -> int:
         """Get total words (input + output)."""
@@ -73,6 +151,7 @@ class StageMetrics:
 @dataclass
 class PipelineMetrics:
     """Complete metrics for the entire pipeline execution."""
+    context_stage: StageMetrics = field(default_factory=lambda: StageMetrics("CONTEXT"))
     candidates_stage: StageMetrics = field(default_factory=lambda: StageMetrics("CANDIDATES"))
     extract_stage: StageMetrics = field(default_factory=lambda: StageMetrics("EXTRACT"))
     score_stage: StageMetrics = field(default_factory=lambda: StageMetrics("SCORE"))
@@ -80,10 +159,30 @@ class PipelineMetrics:
     synthesize_stage: StageMetrics = field(default_factory=lambda: StageMetrics("SYNTHESIZE"))
     validate_stage: StageMetrics = field(default_factory=lambda: StageMetrics("VALIDATE"))
     total_execution_time: float = 0.0
+    client_pool_hits: int = 0
+    client_pool_misses: int = 0
+    # endpoint -> [(timestamp, old_state, new_state, reason)]
+    breaker_transitions: Dict[str, List[Tuple[float, str, str, str]]] = field(default_factory=dict)
+    fallback_counts: Dict[str, int] = field(default_factory=dict)  # "preset → fallback" -> calls
+    # "STAGE/preset" -> {"hedge_won", "primary_won", "denied"}
+    hedge_stats: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    retry_counts: Dict[str, int] = field(default_factory=dict)  # error class -> retries
+    retries_denied: int = 0  # retries refused because the run's retry budget was spent
+    # provider -> {"requests", "throttled", "wait_time"}
+    rate_limit_stats: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    # "STAGE/preset" -> responses resent after hitting an auto max_tokens budget
+    truncation_retries: Dict[str, int] = field(default_factory=dict)
+    # candidate preset -> {"budget", "full_tokens", "packed_tokens", "condensed", "dropped_sections"}
+    context_packing: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    # context heading -> {"sections", "total_sections", "full_tokens", "retrieved_tokens", "query_time", "index_time", "index_built"}
+    context_retrieval: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # provider -> [(timestamp, old_limit, new_limit, reason)]
+    concurrency_history: Dict[str, List[Tuple[float, int, int, str]]] = field(default_factory=dict)
     
     def get_stage_metrics(self) -> List[StageMetrics]:
         """Get list of all stage metrics."""
         return [
+            self.context_stage,
             self.candidates_stage,
             self.extract_stage,
             self.score_stage,
@@ -92,6 +191,13 @@ class PipelineMetrics:
             self.validate_stage
         ]
     
+    def get_stage(self, stage_name: str) -> Optional[StageMetrics]:
+        """Get the metrics for a stage by name (e.g. "SCORE")."""
+        for stage in self.get_stage_metrics():
+            if stage.stage_name == stage_name:
+                return stage
+        return None
+
     def get_total_words_all_stages(self) -> int:
         """Get total words across all stages."""
         return sum(stage.get_total_words() for stage in self.get_stage_metrics())
@@ -112,13 +218,41 @@ class PipelineMetrics:
         
         # Stage-by-stage breakdown
         for stage in self.get_stage_metrics():
-            if stage.llm_calls > 0:  # Only show stages that executed
+            if stage.llm_calls + stage.cache_hits + stage.coalesced_requests > 0:  # Only show stages that executed
                 print(f"\n{stage.stage_name} STAGE:")
                 print(f"  LLM Calls: {stage.llm_calls}")
-                print(f"  Input: {stage.input_words:,} words ({stage.input_tokens:,} tokens)")
-                print(f"  Output: {stage.output_words:,} words ({stage.output_tokens:,} tokens)")
+                print(f"  Input: {stage.input_words:,} words ({stage.input_tokens:,} tokens, {stage.cached_tokens:,} cached)")
+                print(f"  Output: {stage.output_words:,} words ({stage.output_tokens:,} tokens, {stage.reasoning_tokens:,} reasoning)")
                 print(f"  Total: {stage.get_total_words():,} words ({stage.get_total_tokens():,} tokens)")
                 print(f"  Execution Time: {stage.execution_time:.2f} seconds")
+                if stage.reasoning_tokens and stage.output_tokens:
+                    print(f"  Thinking: {stage.reasoning_tokens:,} of {stage.output_tokens:,} output tokens "
+                          f"({stage.reasoning_tokens / stage.output_tokens * 100:.1f}%), "
+                          f"~{stage.thinking_time:.1f}s of {stage.generation_time:.1f}s generation time")
+                if stage.input_tokens > 0 and (stage.cached_tokens or stage.prefix_warmups):
+                    print(f"  Prefix Cache: {stage.cached_tokens:,} of {stage.input_tokens:,} prompt tokens served from cache "
+                          f"({stage.cached_tokens / stage.input_tokens * 100:.1f}%), {stage.prefix_warmups} warm-up prefills")
+                if stage.api_requests > 0:
+                    estimated = f", {stage.estimated_requests} without usage (estimated)" if stage.estimated_requests else ""
+                    print(f"  Throughput: {stage.get_tokens_per_second():.1f} output tokens/sec "
+                          f"over {stage.api_requests} API requests{estimated}")
+                for preset, stats in stage.preset_usage.items():
+                    preset_rate = stats["completion_tokens"] / stats["generation_time"] if stats["generation_time"] > 0 else 0.0
+                    print(f"  Tokens [{preset}]: {int(stats['prompt_tokens']):,} in / {int(stats['completion_tokens']):,} out "
+                          f"({int(stats['reasoning_tokens']):,} reasoning), {preset_rate:.1f} tokens/sec")
+                if stage.cache_hits + stage.cache_misses > 0:
+                    print(f"  Response Cache: {stage.cache_hits} hits / {stage.cache_misses} misses")
+                if stage.coalesced_requests:
+                    print(f"  Coalesced: {stage.coalesced_requests} requests joined an identical in-flight request")
+                if stage.response_bytes:
+                    print(f"  Post-processing: {stage.discarded_bytes / 1024:.1f} of {stage.response_bytes / 1024:.1f} KB "
+                          f"discarded around the JSON ({stage.reasoning_bytes / 1024:.1f} KB reasoning)")
+                for preset, stats in stage.stream_stats.items():
+                    avg_ttft = stats["ttft_total"] / stats["ttft_samples"] if stats["ttft_samples"] else 0.0
+                    tokens_per_sec = stats["tokens"] / stats["decode_time"] if stats["decode_time"] > 0 else 0.0
+                    print(f"  Streaming [{preset}]: {int(stats['streams'])} streams, "
+                          f"avg TTFT {avg_ttft:.2f}s, {tokens_per_sec:.1f} tokens/sec, "
+                          f"{int(stats['early_stops'])} early JSON stops")
         
         # Totals
         total_words = self.get_total_words_all_stages()
@@ -131,9 +265,90 @@ class PipelineMetrics:
         print(f"Total LLM Calls: {total_calls}")
         print(f"Total Words Processed: {total_words:,}")
         print(f"Total Tokens Processed: {total_tokens:,}")
+        preset_totals: Dict[str, List[float]] = {}
+        for stage in self.get_stage_metrics():
+            for preset, stats in stage.preset_usage.items():
+                totals = preset_totals.setdefault(preset, [0, 0, 0.0])
+                totals[0] += stats["completion_tokens"]
+                totals[1] += stats["reasoning_tokens"]
+                totals[2] += stats["generation_time"]
+        for preset, (completion_tokens, reasoning_tokens, generation_time) in sorted(preset_totals.items()):
+            rate = completion_tokens / generation_time if generation_time > 0 else 0.0
+            thinking = f", {reasoning_tokens / completion_tokens * 100:.0f}% reasoning" if completion_tokens else ""
+            print(f"Throughput [{preset}]: {rate:.1f} output tokens/sec ({int(completion_tokens):,} tokens{thinking})")
         print(f"Total Execution Time: {self.total_execution_time:.2f} seconds")
         if total_calls > 0:
             print(f"Average Time per LLM Call: {self.total_execution_time/total_calls:.2f} seconds")
+        cache_hits = sum(stage.cache_hits for stage in self.get_stage_metrics())
+        cache_misses = sum(stage.cache_misses for stage in self.get_stage_metrics())
+        if cache_hits + cache_misses > 0:
+            print(f"Response Cache: {cache_hits} hits / {cache_misses} misses "
+                  f"({cache_hits / (cache_hits + cache_misses) * 100:.1f}% served from disk)")
+        coalesced = sum(stage.coalesced_requests for stage in self.get_stage_metrics())
+        if coalesced:
+            print(f"Coalesced Requests: {coalesced} served by an identical in-flight request")
+        for provider, endpoints in endpoint_router.endpoint_stats().items():
+            for endpoint in endpoints:
+                avg_latency = endpoint.total_latency / endpoint.requests if endpoint.requests else 0
+                print(f"Endpoint [{provider}] {endpoint.url}: {endpoint.requests} requests, "
+                      f"avg {avg_latency:.2f}s, {endpoint.errors} errors (breaker {endpoint.breaker.state})")
+        for endpoint_url, transitions in self.breaker_transitions.items():
+            path = " → ".join([transitions[0][1]] + [new for _, _, new, _ in transitions])
+            print(f"Circuit Breaker [{endpoint_url}]: {path}")
+        for route, count in sorted(self.fallback_counts.items()):
+            print(f"Preset Fallback [{route}]: {count} calls")
+        for key, stats in sorted(self.hedge_stats.items()):
+            hedged = stats["hedge_won"] + stats["primary_won"]
+            win_rate = stats["hedge_won"] / hedged * 100 if hedged else 0
+            print(f"Hedging [{key}]: {hedged} hedged, hedge won {stats['hedge_won']}/{hedged} ({win_rate:.0f}%), "
+                  f"{stats['denied']} skipped by budget")
+        if self.retry_counts or self.retries_denied:
+            by_class = ", ".join(f"{name}={count}" for name, count in sorted(self.retry_counts.items()))
+            print(f"Retries: {sum(self.retry_counts.values())} ({by_class or 'none'}), "
+                  f"{self.retries_denied} refused by retry budget")
+        for provider, stats in self.rate_limit_stats.items():
+            print(f"Rate Limits [{provider}]: {int(stats['throttled'])}/{int(stats['requests'])} requests paced, "
+                  f"{stats['wait_time']:.1f}s total wait")
+        for provider, history in self.concurrency_history.items():
+            limits = [history[0][1]] + [new for _, _, new, _ in history]
+            print(f"Adaptive Concurrency [{provider}]: final limit {limits[-1]} "
+                  f"(range {min(limits)}-{max(limits)}, {len(history)} adjustments)")
+        for key, budget, configured, observed in output_length_stats.budget_report():
+            print(f"Max Tokens [{key}]: auto {budget:,} of {configured:,} configured "
+                  f"(p{output_length_stats.percentile:g} {observed[0]:,} tokens over {observed[1]:,} samples)")
+        for key, count in sorted(self.truncation_retries.items()):
+            print(f"Truncation Retries [{key}]: {count} resent with a larger max_tokens")
+        for heading, retrieval in self.context_retrieval.items():
+            shrink = (1 - retrieval["retrieved_tokens"] / retrieval["full_tokens"]) * 100 if retrieval["full_tokens"] else 0.0
+            index_source = "built" if retrieval["index_built"] else "loaded"
+            selected = (f"{retrieval['sections']} of {retrieval['total_sections']} sections" if retrieval["sections"]
+                        else f"no section of {retrieval['total_sections']} matched, sent whole")
+            print(f"Context Retrieval [{heading}]: {selected}, "
+                  f"{retrieval['full_tokens']:,} → {retrieval['retrieved_tokens']:,} tokens ({shrink:.0f}% smaller), "
+                  f"query {retrieval['query_time'] * 1000:.1f} ms, index {index_source} in {retrieval['index_time'] * 1000:.1f} ms")
+        for preset, packing in sorted(self.context_packing.items()):
+            requests = int(self.candidates_stage.preset_usage.get(preset, {}).get("requests", 0))
+            saved = (packing["full_tokens"] - packing["packed_tokens"]) * requests
+            print(f"Context Packing [{preset}]: {packing['packed_tokens']:,} of {packing['full_tokens']:,} reference tokens "
+                  f"(budget {packing['budget']:,}; {packing['condensed']} condensed, "
+                  f"{packing['dropped_sections']} sections dropped), {saved:,} prompt tokens saved over {requests} requests")
+        scheduler = llm_scheduler.stats()
+        if scheduler["tasks"] > 0:
+            print(f"Scheduler: {scheduler['tasks']} tasks on {scheduler['capacity']} slots, "
+                  f"peak queue depth {scheduler['peak_queue_depth']}, "
+                  f"{scheduler['utilisation'] * 100:.1f}% utilised while busy")
+            for stage_name, stage_stats in scheduler["stages"].items():
+                print(f"  Queue wait [{stage_name}]: {stage_stats['tasks']} tasks, "
+                      f"mean {stage_stats['mean_wait']:.2f}s")
+        references = reference_registry.stats()
+        if references["reads"] > 0:
+            print(f"Reference Files: {references['files']} loaded ({references['bytes'] / 1024:.0f} KB), "
+                  f"{references['reads'] - references['loads'] - references['reloads']}/{references['reads']} "
+                  f"reads served from memory, {references['reloads']} reloaded after a change")
+        pool_lookups = self.client_pool_hits + self.client_pool_misses
+        if pool_lookups > 0:
+            print(f"Client Pool: {self.client_pool_hits} hits / {self.client_pool_misses} misses "
+                  f"({self.client_pool_hits / pool_lookups * 100:.1f}% reused)")
         print(f"{'='*100}\n")
 
 # ============================================================================
@@ -236,25 +451,139 @@ SCORING_CRITERIA = {
 
 # ============================================================================
 # MODEL CONFIGURATION SYSTEM
+# Purpose: Parse models.yaml and .env once into immutable resolved presets,
+# reload when models.yaml changes on disk and validate presets before any
+# LLM spend
 # ============================================================================
 
+@dataclass(frozen=True)
+class ResolvedPreset:
+    """A preset merged with its provider and API key from models.yaml and the environment."""
+    name: str
+    provider: str
+    model: str
+    base_url: Optional[str]
+    api_key: str
+    api_key_env: str = ""
+    endpoints: Tuple[str, ...] = ()
+    fallbacks: Tuple[str, ...] = ()
+
+    def as_tuple(self) -> Tuple[str, str, str]:
+        """Return (base_url, api_key, model_name), the shape get_preset_config() returns."""
+        return self.base_url, self.api_key, self.model
+
+
+def _resolve_preset(config: Dict[str, Any], preset_name: str) -> ResolvedPreset:
+    """Resolve one preset of a parsed models.yaml against its provider and the environment."""
+    presets = config.get("presets") or {}
+    providers = config.get("providers") or {}
+
+    if preset_name not in presets:
+        available = ", ".join(presets.keys())
+        raise ValueError(f"Preset '{preset_name}' not found. Available presets: {available}")
+
+    preset = presets[preset_name] or {}
+    provider_name = preset.get("provider")
+    if provider_name not in providers:
+        raise ValueError(f"Provider '{provider_name}' referenced by preset '{preset_name}' not found in configuration.")
+
+    provider = providers[provider_name] or {}
+    endpoints = tuple(provider_endpoints(provider))
+    api_key_env = provider.get("api_key_env", "")
+    return ResolvedPreset(
+        name=preset_name,
+        provider=provider_name,
+        model=preset.get("model"),
+        base_url=endpoints[0] if endpoints else None,
+        api_key=os.getenv(api_key_env, "sk-dummy-key-if-not-needed"),
+        api_key_env=api_key_env,
+        endpoints=endpoints,
+        fallbacks=tuple(preset.get("fallbacks") or ())
+    )
+
+
+class ModelsConfigStore:
+    """Memoized models.yaml per path, reloaded when the file's mtime changes.
+
+    The file is stat-ed at most once per `check_interval` seconds, so hot
+    paths can ask for the config on every call. `version` increases on
+    every (re)load; components that derive state from the config compare it
+    to know when to rebuild. Parsed configs are shared, so callers must not
+    modify them.
+    """
+
+    def __init__(self, check_interval: float = 1.0):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}  # path -> {"mtime", "checked_at", "config", "presets"}
+        self._dotenv_loaded = False
+        self.check_interval = check_interval
+        self.version = 0
+
+    def _ensure_dotenv(self) -> None:
+        if not self._dotenv_loaded:
+            load_dotenv()
+            self._dotenv_loaded = True
+
+    def get(self, config_path: str = "models.yaml") -> Dict[str, Any]:
+        """Return the parsed config, re-reading it only when the file changed."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(config_path)
+            if entry is not None and now - entry["checked_at"] < self.check_interval:
+                return entry["config"]
+        path = Path(config_path)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Models configuration file not found: {config_path}") from None
+        with self._lock:
+            entry = self._entries.get(config_path)
+            if entry is not None and entry["mtime"] == mtime:
+                entry["checked_at"] = now
+                return entry["config"]
+        with open(path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        with self._lock:
+            reloaded = config_path in self._entries
+            self._entries[config_path] = {"mtime": mtime, "checked_at": now, "config": config, "presets": {}}
+            self.version += 1
+        if reloaded:
+            print(f"↻ Reloaded {config_path} (changed on disk)")
+        return config
+
+    def resolve(self, preset_name: str, config_path: str = "models.yaml") -> ResolvedPreset:
+        """Return the resolved preset, cached until models.yaml changes."""
+        config = self.get(config_path)
+        with self._lock:
+            resolved = self._entries[config_path]["presets"].get(preset_name)
+        if resolved is not None:
+            return resolved
+        self._ensure_dotenv()
+        resolved = _resolve_preset(config, preset_name)
+        with self._lock:
+            entry = self._entries.get(config_path)
+            if entry is not None and entry["config"] is config:
+                entry["presets"][preset_name] = resolved
+        return resolved
+
+
+# Shared by every config lookup in the process
+models_config_store = ModelsConfigStore()
+
+
 def load_models_config(config_path: str = "models.yaml") -> Dict[str, Any]:
     """Load the models configuration from YAML file.
 
+    The parsed file is memoized and re-read only when its mtime changes;
+    treat the returned dictionary as read-only.
+
     Args:
         config_path: Path to the models.yaml configuration file
 
     Returns:
         Dictionary containing providers, presets, and default_preset
     """
-    path = Path(config_path)
-    if not path.exists():
-        raise FileNotFoundError(f"Models configuration file not found: {config_path}")
-
-    with open(path, "r", encoding="utf-8") as f:
-        config = yaml.safe_load(f)
-
-    return config
+    return models_config_store.get(config_path)
 
 
 def list_available_presets(config_path: str = "models.yaml") -> None:
@@ -301,33 +630,74 @@ def get_preset_config(preset_name: str, config_path: str = "models.yaml") -> Tup
     Returns:
         Tuple of (base_url, api_key, model_name)
     """
-    # Ensure .env is loaded so API keys are available
-    load_dotenv()
-
-    config = load_models_config(config_path)
-
-    presets = config.get("presets", {})
-    providers = config.get("providers", {})
-
-    if preset_name not in presets:
-        available = ", ".join(presets.keys())
-        raise ValueError(f"Preset '{preset_name}' not found. Available presets: {available}")
+    return models_config_store.resolve(preset_name, config_path).as_tuple()
 
-    preset = presets[preset_name]
-    provider_name = preset.get("provider")
-    model_name = preset.get("model")
 
-    if provider_name not in providers:
-        raise ValueError(f"Provider '{provider_name}' referenced by preset '{preset_name}' not found in configuration.")
+def validate_presets(preset_names: List[str], config_path: str = "models.yaml") -> List[str]:
+    """
+    Check every preset a run will use, and their fallbacks, before any LLM call.
 
-    provider = providers[provider_name]
-    base_url = provider.get("base_url")
-    api_key_env = provider.get("api_key_env", "")
+    Args:
+        preset_names: Presets referenced by the command line (candidates, pipeline, hedge)
+        config_path: Path to the models.yaml configuration file
 
-    # Get API key from environment variable
-    api_key = os.getenv(api_key_env, "sk-dummy-key-if-not-needed")
+    Returns:
+        Warnings that do not stop the run, such as an unset API key variable
 
-    return base_url, api_key, model_name
+    Raises:
+        ValueError: Listing every problem that would make a call fail
+    """
+    config = load_models_config(config_path)
+    presets = config.get("presets") or {}
+    providers = config.get("providers") or {}
+    stage_names = {stage.stage_name for stage in PipelineMetrics().get_stage_metrics()}
+    errors: List[str] = []
+    warnings: List[str] = []
+    pending = list(dict.fromkeys(preset_names))
+    checked: set = set()
+    while pending:
+        name = pending.pop(0)
+        if name in checked:
+            continue
+        checked.add(name)
+        try:
+            resolved = models_config_store.resolve(name, config_path)
+        except ValueError as e:
+            errors.append(str(e))
+            continue
+        preset = presets[name] or {}
+        provider = providers[resolved.provider] or {}
+        if not resolved.model:
+            errors.append(f"Preset '{name}' has no model.")
+        if not resolved.endpoints:
+            errors.append(f"Provider '{resolved.provider}' (preset '{name}') has no base_url or endpoints.")
+        if resolved.api_key_env and not os.getenv(resolved.api_key_env):
+            warning = f"{resolved.api_key_env} is not set; provider '{resolved.provider}' will be sent a placeholder API key"
+            if warning not in warnings:
+                warnings.append(warning)
+        structured = preset.get("structured_output", provider.get("structured_output"))
+        if structured is not None and structured not in STRUCTURED_OUTPUT_MODES:
+            errors.append(
+                f"Preset '{name}' has structured_output '{structured}' (expected one of {', '.join(STRUCTURED_OUTPUT_MODES)})."
+            )
+        context_budget = preset.get("context_budget", provider.get("context_budget"))
+        if context_budget is not None and (isinstance(context_budget, bool) or not isinstance(context_budget, int) or context_budget < 0):
+            errors.append(f"Preset '{name}' has context_budget '{context_budget}' (expected a token count).")
+        reasoning = preset.get("reasoning", provider.get("reasoning")) or {}
+        style = reasoning.get("style", "chat_template")
+        if style not in REASONING_STYLES:
+            errors.append(f"Preset '{name}' has reasoning style '{style}' (expected one of {', '.join(REASONING_STYLES)}).")
+        for stage in reasoning.get("stages") or {}:
+            if stage not in stage_names:
+                warnings.append(f"Preset '{name}' has reasoning settings for unknown stage '{stage}'")
+        for fallback in resolved.fallbacks:
+            if fallback not in presets:
+                errors.append(f"Preset '{name}' falls back to unknown preset '{fallback}'.")
+            else:
+                pending.append(fallback)
+    if errors:
+        raise ValueError("Invalid model configuration:\n  " + "\n  ".join(errors))
+    return warnings
 
 
 def load_environment(preset: Optional[str] = None, config_path: str = "models.yaml") -> None:
@@ -347,6 +717,7 @@ def load_environment(preset: Optional[str] = None, config_path: str = "models.ya
         os.environ["OPENAI_API_BASE"] = base_url
         os.environ["OPENAI_API_KEY"] = api_key
         os.environ["OPENAI_MODEL_NAME"] = model_name
+        os.environ["OPENAI_PRESET_NAME"] = preset
         return
 
     # Check if models.yaml exists and has a default preset
@@ -360,11 +731,13 @@ def load_environment(preset: Optional[str] = None, config_path: str = "models.ya
                 os.environ["OPENAI_API_BASE"] = base_url
                 os.environ["OPENAI_API_KEY"] = api_key
                 os.environ["OPENAI_MODEL_NAME"] = model_name
+                os.environ["OPENAI_PRESET_NAME"] = default_preset
                 return
         except Exception:
             pass  # Fall through to .env-based configuration
 
     # Fallback to original .env-based configuration
+    os.environ.pop("OPENAI_PRESET_NAME", None)
     openai_api_base = os.getenv("OPENAI_API_BASE")
     if not openai_api_base:
         raise ValueError("OPENAI_API_BASE environment variable is not set and no preset configured.")
@@ -378,62 +751,6 @@ def load_environment(preset: Optional[str] = None, config_path: str = "models.ya
     os.environ["OPENAI_MODEL_NAME"] = openai_model_name
 
 
-def read_reference_file(file_path: str) -> str:
-    """Read and return the content of a reference file."""
-    try:
-        path = Path(file_path)
-        if not path.exists():
-            raise FileNotFoundError(f"Reference file not found: {file_path}")
-        if not path.is_file():
-            raise ValueError(f"Path is not a file: {file_path}")
-        return path.read_text(encoding="utf-8")
-    except Exception as e:
-        raise RuntimeError(f"Failed to read reference file {file_path}: {e}")
-
-
-def filter_think_tags(text: str) -> str:
-    """
-    Filter out content between <think> and </think> tags.
-    
-    Args:
-        text: The text to filter
-        
-    Returns:
-        The filtered text with think tag content removed
-    """
-    # Pattern to match content between <think> and </think> tags
-    pattern = r'<think>.*?</think>'
-    # Use DOTALL flag to match across newlines
-    filtered_text = re.sub(pattern, '', text, flags=re.DOTALL)
-    # Clean up any extra whitespace that might be left
-    filtered_text = re.sub(r'\n\s*\n', '\n\n', filtered_text)
-    return filtered_text.strip()
-
-
-def extract_json_from_response(text: str) -> str:
-    """
-    Extract JSON from LLM response, handling markdown code blocks.
-    
-    Args:
-        text: The text potentially containing JSON
-        
-    Returns:
-        Extracted JSON string
-    """
-    # Remove think tags first
-    text = filter_think_tags(text)
-    
-    # Try to extract JSON from markdown code blocks
-    # Pattern for ```json ... ``` or ``` ... ```
-    code_block_pattern = r'```(?:json)?\s*\n?(.*?)\n?```'
-    match = re.search(code_block_pattern, text, re.DOTALL)
-    
-    if match:
-        return match.group(1).strip()
-    
-    # If no code block found, return the text as-is (might already be pure JSON)
-    return text.strip()
-
 def create_output_directory(base_name: str) -> Path:
     """Create organized output directory structure."""
     date_str = datetime.now().strftime("%Y-%m-%d")
@@ -461,1616 +778,5557 @@ def cleanup_old_outputs(days_to_keep: int = 30) -> None:
                         shutil.rmtree(output_dir)
                         print(f"Removed: {output_dir}")
 
-def send_to_llm(
-    llm_user_prompt: str,
-    llm_system_prompt: Optional[str] = None,
-    temperature: float = 0.7,
-    max_tokens: int = 4000,
-    retry_count: int = 3,
-    retry_delay: float = 1.0,
-    verbose: bool = False,
-    seed: Optional[int] = None
-) -> str:
+# ============================================================================
+# RESPONSE POST-PROCESSING
+# Purpose: One incremental pass over a response (whole or streamed) that strips
+# reasoning blocks, finds the first balanced JSON object or code fence and
+# counts the bytes it threw away
+# ============================================================================
+
+# Reasoning block tags (lowercase) -> their closing tag
+REASONING_TAGS = {
+    "<think>": "</think>",
+    "<thinking>": "</thinking>",
+    "<reasoning>": "</reasoning>",
+    "<reflection>": "</reflection>",
+    "<|begin_of_thought|>": "<|end_of_thought|>",
+}
+_REASONING_CLOSE_TAGS = frozenset(REASONING_TAGS.values())
+
+# Tag-like runs, runs of plain text within a line, whitespace runs and single special characters
+_SCAN_TOKEN = re.compile(r"<[^<>\s]{1,40}>|[^<{}\"\\`\n]+|\s+|.", re.DOTALL)
+# A possible tag cut off at the end of a chunk, held back until the next one
+_PARTIAL_TAG = re.compile(r"<[^<>\s]{0,40}$")
+
+
+@dataclass(frozen=True)
+class ScannedResponse:
+    """A response with its reasoning removed and its JSON payload located."""
+    text: str  # Visible text: reasoning removed, blank-line runs collapsed, stripped
+    json: str  # First balanced JSON object or code fence body (the visible text if neither)
+    reasoning: Tuple[str, ...]  # Removed reasoning blocks, including an unterminated one
+    discarded_bytes: int  # UTF-8 bytes of the raw response that are not part of `json`
+    reasoning_bytes: int  # UTF-8 bytes of the reasoning blocks
+
+
+class ResponseScanner:
+    """Incremental state machine over response text, fed whole or chunk by chunk.
+
+    Reasoning blocks in any REASONING_TAGS style are dropped, including one
+    left open when a reasoning model hits max_tokens. Tags inside a JSON
+    string are data, not reasoning. A closing tag with no opening tag is
+    dropped when it starts the response (chat templates that put `<think>`
+    in the prompt and reason elsewhere); later on it is ordinary text, since
+    an article may well quote it. The first top-level JSON object is tracked
+    with string and escape awareness; inside a code fence the fence body is
+    used when it closes before an object does. `feed` reports when
+    that payload is complete, so streams of JSON stages can stop early.
     """
-    Send prompt to the local OpenAI compliant API endpoint.
+
+    def __init__(self):
+        self.end_offset: Optional[int] = None  # Raw offset just past the payload
+        self._offset = 0
+        self._pending = ""  # Possible partial tag carried over from the previous chunk
+        self._raw_bytes = 0
+        self._visible: List[str] = []
+        self._visible_len = 0
+        self._whitespace = ""  # Whitespace run not emitted yet (blank-line runs collapse to one)
+        self._reasoning: List[str] = []
+        self._block: Optional[List[str]] = None  # Reasoning block being read
+        self._close_tag = ""
+        self._reset_payload()
+
+    def _reset_payload(self) -> None:
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._ticks = 0
+        self._in_fence = False
+        self._fence_header = False
+        self._json_start: Optional[int] = None
+        self._json_end: Optional[int] = None
+        self._fence_start: Optional[int] = None
+        self._fence_end: Optional[int] = None
+
+    @property
+    def complete(self) -> bool:
+        return self.end_offset is not None
+
+    def feed(self, chunk: str) -> bool:
+        """Consume a chunk; return True once the JSON object or code fence has closed."""
+        self._raw_bytes += len(chunk.encode("utf-8"))
+        text = self._pending + chunk
+        partial = _PARTIAL_TAG.search(text)
+        self._pending = text[partial.start():] if partial else ""
+        if partial:
+            text = text[:partial.start()]
+        for match in _SCAN_TOKEN.finditer(text):
+            self._token(match.group())
+        return self.complete
+
+    def _token(self, token: str) -> None:
+        if self._block is not None:
+            if token.lower() == self._close_tag:
+                self._reasoning.append("".join(self._block))
+                self._block = None
+            else:
+                self._block.append(token)
+            self._offset += len(token)
+            return
+        if token[0] == "<" and len(token) > 2 and not self._in_string:
+            tag = token.lower()
+            if tag in REASONING_TAGS:
+                self._block = []
+                self._close_tag = REASONING_TAGS[tag]
+                self._offset += len(token)
+                return
+            if tag in _REASONING_CLOSE_TAGS and not self._visible:
+                # The opening tag was in the prompt; nothing visible has been written yet
+                self._whitespace = ""
+                self._offset += len(token)
+                return
+        if token.isspace():
+            self._whitespace += token
+            self._offset += len(token)
+            return
+        if self._whitespace:
+            self._emit_whitespace()
+        self._emit(token)
+        self._offset += len(token)
+        if not self.complete and self._json_end is not None:
+            self.end_offset = self._offset
+
+    def _close_ticks(self) -> None:
+        """Resolve a run of backticks that ended; three or more open or close a fence."""
+        ticks, self._ticks = self._ticks, 0
+        if ticks >= 3 and self._json_end is None and self._fence_end is None:
+            self._fence_boundary(self._visible_len - ticks)
+
+    def _emit_whitespace(self) -> None:
+        if self._ticks:
+            self._close_ticks()
+        whitespace, self._whitespace = self._whitespace, ""
+        if whitespace.count("\n") >= 2:
+            whitespace = whitespace[:whitespace.index("\n")] + "\n\n" + whitespace[whitespace.rindex("\n") + 1:]
+        if self._fence_header and "\n" in whitespace:
+            self._fence_header = False
+            self._fence_start = self._visible_len + whitespace.index("\n") + 1
+        self._visible.append(whitespace)
+        self._visible_len += len(whitespace)
+
+    def _emit(self, token: str) -> None:
+        if self._ticks and token != "`":
+            self._close_ticks()
+        start = self._visible_len
+        self._visible.append(token)
+        self._visible_len += len(token)
+        if self._json_end is not None or self._fence_end is not None:
+            return
+        if token == "`" and self._depth == 0:
+            self._ticks += 1
+            return
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif token == "\\":
+                self._escape = True
+            elif token == '"':
+                self._in_string = False
+            return
+        if self._fence_header and token == "{":
+            self._fence_header = False
+            self._fence_start = start
+        if token == '"' and self._depth > 0:
+            self._in_string = True
+        elif token == "{":
+            if self._depth == 0:
+                self._json_start = start
+            self._depth += 1
+        elif token == "}" and self._depth > 0:
+            self._depth -= 1
+            if self._depth == 0:
+                self._json_end = self._visible_len
+
+    def _fence_boundary(self, ticks_start: int) -> None:
+        if not self._in_fence:
+            self._in_fence = True
+            self._fence_header = True
+            self._depth = 0
+            self._json_start = None
+        else:
+            if self._fence_start is None:
+                self._fence_start = ticks_start
+            self._fence_end = ticks_start
+            self.end_offset = self._offset
+
+    def finish(self) -> ScannedResponse:
+        """Flush the input and return the visible text, payload and discard counts."""
+        if self._pending:
+            pending, self._pending = self._pending, ""
+            for match in _SCAN_TOKEN.finditer(pending):
+                self._token(match.group())
+        if self._ticks:
+            self._close_ticks()
+        if self._block is not None:
+            self._reasoning.append("".join(self._block))
+            self._block = None
+        visible = "".join(self._visible)
+        if self._json_end is not None:
+            payload = visible[self._json_start:self._json_end]
+        elif self._fence_end is not None:
+            payload = visible[self._fence_start:self._fence_end]
+        elif self._in_fence:
+            payload = visible[self._fence_start if self._fence_start is not None else self._visible_len:]
+        elif self._json_start is not None:
+            payload = visible[self._json_start:]
+        else:
+            payload = visible
+        payload = payload.strip()
+        return ScannedResponse(
+            text=visible.strip(),
+            json=payload,
+            reasoning=tuple(self._reasoning),
+            discarded_bytes=self._raw_bytes - len(payload.encode("utf-8")),
+            reasoning_bytes=sum(len(block.encode("utf-8")) for block in self._reasoning)
+        )
+
+    def truncate(self, text: str) -> str:
+        """Cut trailing chatter after the payload, closing an open code fence."""
+        if self.end_offset is None:
+            return text
+        text = text[:self.end_offset]
+        if text.count("```") % 2 == 1:
+            text += "\n```"
+        return text
+
+
+@lru_cache(maxsize=256)
+def scan_response(text: str) -> ScannedResponse:
+    """Scan a complete response (memoized: response checks, parsers and metrics share one pass)."""
+    scanner = ResponseScanner()
+    scanner.feed(text)
+    return scanner.finish()
+
+
+def filter_think_tags(text: str) -> str:
+    """
+    Remove reasoning blocks (<think> and the other REASONING_TAGS styles) from a response.
+
+    Unterminated blocks are removed to the end of the text, and runs of
+    blank lines left behind collapse to one.
 
     Args:
-        llm_user_prompt: User prompt/instruction
-        llm_system_prompt: System prompt (uses built-in prompt if None)
-        temperature: Sampling temperature (default 0.7)
-        max_tokens: Maximum tokens to generate (default 4000)
-        retry_count: Number of API call retries (default 3)
-        retry_delay: Delay between retries in seconds (default 1.0)
-        verbose: Enable verbose logging (default False)
-        seed: Optional seed for reproducible outputs (default None)
+        text: The text to filter
 
     Returns:
-        The LLM response content as a string
+        The filtered text with reasoning removed
     """
-    # Create OpenAI client using the configured vLLM endpoint
-    client = OpenAI(
-        api_key=os.getenv("OPENAI_API_KEY", "sk-dummy-key-if-not-needed"),
-        base_url=os.getenv("OPENAI_API_BASE")
-    )
-    
-    # Use built-in system prompt if none provided
-    if llm_system_prompt is None:
-        print ("WARNING: System prompt missing.")
-    
-    # Prepare messages for the API
-    messages = [
-        {"role": "system", "content": llm_system_prompt},
-        {"role": "user", "content": llm_user_prompt}
-    ]
-    
-    # Get model name from environment
-    model_name = os.getenv("OPENAI_MODEL_NAME")
-    if not model_name:
-        raise ValueError("OPENAI_MODEL_NAME environment variable is not set")
-    
-    last_error = None
-    for attempt in range(retry_count):
-        try:
-            # Make API call to the local OpenAI compliant endpoint
-            api_params = {
-                "model": model_name,
-                "messages": messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens
-            }
-            if seed is not None:
-                api_params["seed"] = seed
-            response = client.chat.completions.create(**api_params)  # type: ignore[arg-type]
-            
-            # Extract and return the response content
-            response_content = response.choices[0].message.content
-            if response_content is None:
-                raise ValueError("Empty response from LLM")
-                
-            return response_content.strip()
-            
-        except Exception as e:
-            last_error = e
-            if verbose:
-                print(f"API call attempt {attempt + 1} failed: {e}")
-            
-            if attempt < retry_count - 1:  # Don't sleep on the last attempt
-                if verbose:
-                    print(f"Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-    
-    # If we get here, all retries failed
-    raise RuntimeError(f"Failed to get response from LLM after {retry_count} attempts. Last error: {last_error}")
+    return scan_response(text).text
 
 
-def send_to_llm_with_preset(
-    preset_name: str,
-    llm_user_prompt: str,
-    llm_system_prompt: Optional[str] = None,
-    temperature: float = 0.7,
-    max_tokens: int = 4000,
-    retry_count: int = 3,
-    retry_delay: float = 1.0,
-    verbose: bool = False,
-    seed: Optional[int] = None
-) -> str:
+def extract_json_from_response(text: str) -> str:
     """
-    Send prompt to a specific model preset without modifying global environment.
+    Extract JSON from LLM response, handling reasoning blocks, markdown code blocks and chatter.
 
     Args:
-        preset_name: Name of the preset to use (from models.yaml)
-        llm_user_prompt: User prompt/instruction
-        llm_system_prompt: System prompt (uses built-in prompt if None)
-        temperature: Sampling temperature (default 0.7)
-        max_tokens: Maximum tokens to generate (default 4000)
-        retry_count: Number of API call retries (default 3)
-        retry_delay: Delay between retries in seconds (default 1.0)
-        verbose: Enable verbose logging (default False)
-        seed: Optional seed for reproducible outputs (default None)
+        text: The text potentially containing JSON
 
     Returns:
-        The LLM response content as a string
+        The first balanced JSON object or code block body, else the visible text
     """
-    # Get preset configuration
-    base_url, api_key, model_name = get_preset_config(preset_name)
+    return scan_response(text).json
 
-    # Create OpenAI client with preset-specific configuration
-    client = OpenAI(
-        api_key=api_key,
-        base_url=base_url
-    )
 
-    if llm_system_prompt is None:
-        print("WARNING: System prompt missing.")
+# ============================================================================
+# REFERENCE FILE REGISTRY
+# Purpose: Load prompts/ and reference_context/ once, serve every later read
+# from memory, keep content hashes for cache keys and artifacts and reload a
+# file when it changes on disk
+# ============================================================================
 
-    # Prepare messages for the API
-    messages = [
-        {"role": "system", "content": llm_system_prompt},
-        {"role": "user", "content": llm_user_prompt}
-    ]
+REFERENCE_DIRS = ("prompts", "reference_context")
+
+
+@dataclass(frozen=True)
+class ReferenceFile:
+    """One loaded reference file and the stat it was read at."""
+    path: str
+    content: str
+    sha256: str
+    mtime_ns: int
+    size: int
+
+
+class ReferenceRegistry:
+    """Memoized prompt and reference files, reloaded when a file's mtime changes.
+
+    Like ModelsConfigStore, each file is stat-ed at most once per
+    `check_interval` seconds, so stage functions can ask for their prompt on
+    every call. Files outside the preloaded directories (e.g. the topic file)
+    are loaded on first use and tracked the same way.
+    """
 
-    last_error = None
-    for attempt in range(retry_count):
+    def __init__(self, check_interval: float = 1.0):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, ReferenceFile] = {}
+        self._checked_at: Dict[str, float] = {}
+        self.check_interval = check_interval
+        self.reads = 0
+        self.loads = 0
+        self.reloads = 0
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return Path(file_path).as_posix()
+
+    def _load(self, key: str, stat: os.stat_result) -> ReferenceFile:
+        data = Path(key).read_bytes()
+        return ReferenceFile(
+            path=key,
+            content=data.decode("utf-8"),
+            sha256=hashlib.sha256(data).hexdigest(),
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size
+        )
+
+    def get(self, file_path: str) -> ReferenceFile:
+        """Return the file, re-reading it only when it changed on disk.
+
+        Raises:
+            FileNotFoundError: If the file does not exist
+            ValueError: If the path is not a regular file
+        """
+        key = self._key(file_path)
+        now = time.monotonic()
+        with self._lock:
+            self.reads += 1
+            entry = self._entries.get(key)
+            if entry is not None and now - self._checked_at[key] < self.check_interval:
+                return entry
+        path = Path(key)
         try:
-            # Make API call with preset-specific model
-            api_params = {
-                "model": model_name,
-                "messages": messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens
+            stat = path.stat()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Reference file not found: {file_path}") from None
+        if not path.is_file():
+            raise ValueError(f"Path is not a file: {file_path}")
+        if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+            with self._lock:
+                self._checked_at[key] = now
+            return entry
+        loaded = self._load(key, stat)
+        with self._lock:
+            if key in self._entries:
+                self.reloads += 1
+            else:
+                self.loads += 1
+            self._entries[key] = loaded
+            self._checked_at[key] = now
+        return loaded
+
+    def read(self, file_path: str) -> str:
+        """Return the content of a file."""
+        return self.get(file_path).content
+
+    def content_hash(self, file_path: str) -> str:
+        """Return the sha256 of a file's current content."""
+        return self.get(file_path).sha256
+
+    def preload(self, directories: Tuple[str, ...] = REFERENCE_DIRS) -> int:
+        """Load every file under the given directories; returns the number loaded.
+
+        Missing directories are skipped, and so are files that are not UTF-8
+        text - those still fail loudly if a stage actually asks for them.
+        """
+        count = 0
+        for directory in directories:
+            root = Path(directory)
+            if not root.is_dir():
+                continue
+            for path in sorted(root.rglob("*")):
+                if not path.is_file() or path.name.startswith("."):
+                    continue
+                try:
+                    self.get(str(path))
+                    count += 1
+                except (OSError, UnicodeDecodeError, ValueError):
+                    continue
+        return count
+
+    def hashes(self) -> Dict[str, str]:
+        """Return path -> sha256 for every file loaded so far."""
+        with self._lock:
+            return {key: entry.sha256 for key, entry in sorted(self._entries.items())}
+
+    def stats(self) -> Dict[str, int]:
+        """Return counters for the summary."""
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "bytes": sum(entry.size for entry in self._entries.values()),
+                "reads": self.reads,
+                "loads": self.loads,
+                "reloads": self.reloads
             }
-            if seed is not None:
-                api_params["seed"] = seed
-            response = client.chat.completions.create(**api_params)  # type: ignore[arg-type]
 
-            # Extract and return the response content
-            response_content = response.choices[0].message.content
-            if response_content is None:
-                raise ValueError("Empty response from LLM")
 
-            return response_content.strip()
+# Shared by every prompt and reference read in the process
+reference_registry = ReferenceRegistry()
 
-        except Exception as e:
-            last_error = e
-            if verbose:
-                print(f"API call attempt {attempt + 1} failed: {e}")
 
-            if attempt < retry_count - 1:  # Don't sleep on the last attempt
-                if verbose:
-                    print(f"Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
+def read_reference_file(file_path: str) -> str:
+    """Read and return the content of a reference file.
 
-    # If we get here, all retries failed
-    raise RuntimeError(f"Failed to get response from LLM after {retry_count} attempts. Last error: {last_error}")
+    Served from `reference_registry`, so the file is read from disk once and
+    again only after it changes.
+    """
+    try:
+        return reference_registry.read(file_path)
+    except Exception as e:
+        raise RuntimeError(f"Failed to read reference file {file_path}: {e}")
 
 
 # ============================================================================
-# PIPELINE STAGE 2: EXTRACT
-# Purpose: Convert full articles into structured article cards
+# TOKEN COUNTING
+# Purpose: Offline token estimates for calls whose response carries no usage
+# (tiktoken when installed, otherwise ~4 characters per token)
 # ============================================================================
 
-def extract_article_card(
-    article_content: str,
-    article_id: int,
-    verbose: bool = False,
-    retry_count: int = 3,
-    filter_think: bool = True
-) -> ArticleCard:
-    """
-    Extract structured card from a single article.
+_token_encoding = None
 
-    Args:
-        article_content: Full article text
-        article_id: Unique identifier for this article
-        verbose: Enable progress logging
-        retry_count: Number of retry attempts for failed extractions
-        filter_think: Whether to filter out think tags from response
 
-    Returns:
-        ArticleCard with structured data
-    """
-    extract_system_prompt = read_reference_file("prompts/pipeline_stage2_extract_system.md")
+def _get_token_encoding():
+    """Load the tiktoken encoding once; False when tiktoken or its data is unavailable."""
+    global _token_encoding
+    if _token_encoding is None:
+        _token_encoding = False
+        if tiktoken is not None:
+            try:
+                _token_encoding = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                pass  # Encoding data missing and not downloadable: use the character estimate
+    return _token_encoding
 
-    extract_user_prompt = f"""Extract the article card for Article #{article_id}.
 
-<article>
-{article_content}
-</article>
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Estimate the token count of a text (memoized, since prompts repeat across calls)."""
+    if not text:
+        return 0
+    encoding = _get_token_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
 
-Respond with only the JSON object."""
 
-    for attempt in range(retry_count):
-        try:
-            # Prepare input text for metrics tracking
-            input_text = extract_system_prompt + "\n\n" + extract_user_prompt
+def count_think_tokens(text: str) -> int:
+    """Estimate the tokens spent in inline reasoning blocks, including one left unterminated."""
+    return sum(count_tokens(block) for block in scan_response(text).reasoning)
 
-            # Send to LLM with timing
-            llm_start_time = time.time()
-            response = send_to_llm(
-                llm_user_prompt=extract_user_prompt,
-                llm_system_prompt=extract_system_prompt,
-                temperature=0.3,  # Low temp for consistent extraction
-                max_tokens=4000,
-                verbose=verbose
-            )
-            llm_end_time = time.time()
-            execution_time = llm_end_time - llm_start_time
 
-            # Filter out think tags if requested
-            if filter_think:
-                response = filter_think_tags(response)
+def count_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Estimate the prompt tokens of a chat message list."""
+    return sum(count_tokens(message.get("content") or "") + 4 for message in messages)
 
-            # Extract JSON from response (handles markdown code blocks and think tags)
-            json_str = extract_json_from_response(response)
-            
-            # Parse and validate JSON
-            card_data = json.loads(json_str)
-            
-            # Validate required fields
-            required_fields = [
-                "article_id", "headline_candidates", "opening_hook",
-                "core_argument", "key_points", "memorable_phrases",
-                "structural_approach", "evidence_used", "tone",
-                "target_audience_signals", "weaknesses"
-            ]
-            
-            for field in required_fields:
-                if field not in card_data:
-                    raise ValueError(f"Missing required field: {field}")
-            
-            # Create ArticleCard object
-            card = ArticleCard(**card_data)
-            
-            # Track LLM call metrics
-            track_llm_call("EXTRACT", input_text, json_str, execution_time)
+
+def usage_token_counts(usage: Any) -> Optional[Dict[str, int]]:
+    """Extract prompt, completion, cached-prompt and reasoning token counts from an API usage object."""
+    if usage is None or getattr(usage, "completion_tokens", None) is None:
+        return None
+    prompt_details = getattr(usage, "prompt_tokens_details", None)
+    completion_details = getattr(usage, "completion_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "completion_tokens": usage.completion_tokens or 0,
+        "cached_tokens": getattr(prompt_details, "cached_tokens", None) or 0,
+        "reasoning_tokens": getattr(completion_details, "reasoning_tokens", None) or 0,
+    }
+
+
+# ============================================================================
+# LLM CLIENT REGISTRY
+# Purpose: Share long-lived OpenAI clients (and their keep-alive connection
+# pools) across all stages and worker threads
+# ============================================================================
+
+class LLMClientRegistry:
+    """Thread-safe registry of OpenAI clients keyed by (base_url, api_key).
+
+    Each client owns an HTTP connection pool sized to the configured stage
+    concurrency, so repeated calls to the same endpoint reuse open keep-alive
+    connections instead of paying a new TCP/TLS handshake per request.
+    """
+
+    def __init__(self, max_connections: int = 5):
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple[str, str], OpenAI] = {}
+        self._async_clients: Dict[Tuple[str, str, int], AsyncOpenAI] = {}
+        self._fallbacks: Dict[str, List[str]] = {}
+        self._capabilities: Dict[Tuple[str, str], Any] = {}
+        self._config_version = -1
+        self.max_connections = max_connections
+
+    def configure(self, max_connections: int) -> None:
+        """Size connection pools for the given concurrency.
+
+        Clients created with a smaller pool are dropped so the next lookup
+        rebuilds them with the new limits.
+        """
+        with self._lock:
+            if max_connections > self.max_connections:
+                self._clients.clear()
+                self._async_clients.clear()
+            self.max_connections = max(1, max_connections)
+
+    def _pool_limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+            keepalive_expiry=60.0
+        )
+
+    def get_client(self, base_url: str, api_key: str) -> OpenAI:
+        """Return the shared client for an endpoint, creating it on first use."""
+        key = (base_url, api_key)
+        with self._lock:
+            client = self._clients.get(key)
+            hit = client is not None
+            if client is None:
+                client = OpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    max_retries=0,  # Retries are handled by llm_retry_policy
+                    http_client=DefaultHttpxClient(limits=self._pool_limits())
+                )
+                self._clients[key] = client
+        track_client_pool_lookup(hit)
+        return client
+
+    def get_async_client(self, base_url: str, api_key: str) -> AsyncOpenAI:
+        """Return the shared async client for an endpoint on the running event loop.
+
+        Async connection pools are bound to the loop that created them, so
+        clients are keyed by loop as well as endpoint.
+        """
+        key = (base_url, api_key, id(asyncio.get_running_loop()))
+        with self._lock:
+            client = self._async_clients.get(key)
+            hit = client is not None
+            if client is None:
+                client = AsyncOpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    max_retries=0,  # Retries are handled by llm_retry_policy
+                    http_client=DefaultAsyncHttpxClient(limits=self._pool_limits())
+                )
+                self._async_clients[key] = client
+        track_client_pool_lookup(hit)
+        return client
+
+    def resolve_preset(self, preset_name: str) -> Tuple[str, str, str]:
+        """Resolve a preset to (base_url, api_key, model_name), cached until models.yaml changes."""
+        return models_config_store.resolve(preset_name).as_tuple()
+
+    def _sync_config(self) -> Dict[str, Any]:
+        """Return the current models.yaml, dropping settings derived from an older version of it."""
+        try:
+            config = load_models_config()
+        except FileNotFoundError:
+            config = {}
+        with self._lock:
+            if self._config_version != models_config_store.version:
+                self._config_version = models_config_store.version
+                self._fallbacks.clear()
+                self._capabilities.clear()
+        return config
+
+    def fallback_chain(self, preset_name: str) -> List[str]:
+        """Return [preset_name, *fallbacks] from the preset's `fallbacks` list in models.yaml."""
+        config = self._sync_config()
+        with self._lock:
+            chain = self._fallbacks.get(preset_name)
+        if chain is None:
+            preset = config.get("presets", {}).get(preset_name) or {}
+            chain = [preset_name]
+            for fallback in preset.get("fallbacks") or []:
+                if fallback not in chain:
+                    chain.append(fallback)
+            with self._lock:
+                self._fallbacks[preset_name] = chain
+        return chain
+
+    def capability(self, preset_name: Optional[str], capability: str, default: Any = None) -> Any:
+        """Return a preset's capability setting (e.g. `supports_n`, `structured_output`) from models.yaml.
+
+        The preset's own setting wins over its provider's; unset settings use the default.
+        """
+        if preset_name is None:
+            return default
+        config = self._sync_config()
+        key = (preset_name, capability)
+        with self._lock:
+            if key in self._capabilities:
+                return self._capabilities[key]
+        preset = config.get("presets", {}).get(preset_name) or {}
+        provider = config.get("providers", {}).get(preset.get("provider")) or {}
+        value = preset.get(capability, provider.get(capability, default))
+        with self._lock:
+            return self._capabilities.setdefault(key, value)
+
+    def supports(self, preset_name: Optional[str], capability: str, default: bool = True) -> bool:
+        """Return a preset's boolean capability flag (e.g. `supports_n`)."""
+        return bool(self.capability(preset_name, capability, default))
+
+    def disable_capability(self, preset_name: str, capability: str) -> None:
+        """Record that a preset's endpoint rejected or ignored a capability, for the rest of the run."""
+        with self._lock:
+            self._capabilities[(preset_name, capability)] = False
+
+    def close(self) -> None:
+        """Close all pooled clients and their connections."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+    async def aclose(self) -> None:
+        """Close the async clients that belong to the running event loop."""
+        loop_id = id(asyncio.get_running_loop())
+        with self._lock:
+            keys = [key for key in self._async_clients if key[2] == loop_id]
+            clients = [self._async_clients.pop(key) for key in keys]
+        for client in clients:
+            await client.close()
+
+
+# Shared by all stages and candidate workers
+llm_client_registry = LLMClientRegistry()
+
+
+# ============================================================================
+# LLM RESPONSE CACHE
+# Purpose: Persist responses of deterministic calls on disk so re-running
+# EXTRACT/SCORE over an unchanged candidate set is nearly free
+# ============================================================================
+
+# Request parameters that do not change the model's output
+_CACHE_KEY_EXCLUDED_PARAMS = {"stream", "stream_options", "timeout"}
+
+# SELECT samples at temperature 0.4 without a seed; caching it would freeze one blueprint
+DEFAULT_CACHE_STAGES = ("EXTRACT", "SCORE")
+
+
+def make_cache_key(base_url: str, api_params: Dict[str, Any]) -> str:
+    """Hash endpoint, model, messages and sampling parameters into a cache key."""
+    keyed_params = {k: v for k, v in api_params.items() if k not in _CACHE_KEY_EXCLUDED_PARAMS}
+    payload = json.dumps({"base_url": base_url, "params": keyed_params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Content-addressed SQLite cache of LLM responses with size-bounded LRU eviction.
+
+    Disabled until configure() is called. Only stages listed in `stages` are
+    cached, so sampled stages (CANDIDATES, SELECT, SYNTHESIZE) keep producing
+    fresh output by default.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.max_bytes = 0
+        self.stages: set = set()
+
+    def configure(self, cache_dir: str, max_mb: float = 512, stages: Optional[List[str]] = None) -> None:
+        """Open (or create) the cache database and set the cached stages."""
+        path = Path(cache_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = sqlite3.connect(str(path / "responses.sqlite3"), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    stage TEXT,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+            self._conn.commit()
+            self.max_bytes = int(max_mb * 1024 * 1024)
+            self.stages = {s.upper() for s in (stages if stages is not None else DEFAULT_CACHE_STAGES)}
+
+    def is_enabled_for(self, stage: Optional[str]) -> bool:
+        """Return True if responses for this stage should be cached."""
+        return self._conn is not None and stage is not None and stage in self.stages
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, refreshing its LRU position."""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, response: str, stage: Optional[str], model: str) -> None:
+        """Store a response and evict least-recently-used entries over the size bound."""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, stage, model, response, size, now, now)
+            )
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, old_size in self._conn.execute(
+                    "SELECT key, size FROM responses ORDER BY last_access ASC"
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    total -= old_size
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Close the cache database."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Shared by all stages; enabled from main() unless --no-cache is given
+llm_response_cache = LLMResponseCache()
+
+
+def _lookup_cached_response(base_url: str, api_params: Dict[str, Any], stage: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Return (cache_key, cached_response) for a request; key is None when caching is off.
+
+    Multi-choice (n > 1) requests are never cached - they exist to sample distinct outputs.
+    """
+    if not llm_response_cache.is_enabled_for(stage) or api_params.get("n", 1) > 1:
+        return None, None
+    cache_key = make_cache_key(base_url, api_params)
+    cached = llm_response_cache.get(cache_key)
+    track_cache_lookup(stage, cached is not None)
+    return cache_key, cached
+
+
+def _store_cached_response(
+    cache_key: Optional[str],
+    response: str,
+    stage: Optional[str],
+    model_name: str
+) -> None:
+    """Cache a fresh response (already accepted by the stage's parser)."""
+    if cache_key is None:
+        return
+    llm_response_cache.put(cache_key, response, stage, model_name)
+
+
+def _build_chat_messages(llm_user_prompt: str, llm_system_prompt: Optional[str]) -> List[Dict[str, Any]]:
+    """Build the chat message list, warning when the system prompt is missing."""
+    if llm_system_prompt is None:
+        print("WARNING: System prompt missing.")
+
+    return [
+        {"role": "system", "content": llm_system_prompt},
+        {"role": "user", "content": llm_user_prompt}
+    ]
+
+
+def _build_api_params(
+    model_name: str,
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    max_tokens: int,
+    seed: Optional[int]
+) -> Dict[str, Any]:
+    """Build chat completion parameters shared by the sync and async paths."""
+    api_params = {
+        "model": model_name,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }
+    if seed is not None:
+        api_params["seed"] = seed
+    return api_params
+
+
+def _get_environment_model() -> Tuple[str, str, str]:
+    """Return (base_url, api_key, model_name) configured by load_environment()."""
+    model_name = os.getenv("OPENAI_MODEL_NAME")
+    if not model_name:
+        raise ValueError("OPENAI_MODEL_NAME environment variable is not set")
+    return (
+        os.getenv("OPENAI_API_BASE"),
+        os.getenv("OPENAI_API_KEY", "sk-dummy-key-if-not-needed"),
+        model_name
+    )
+
+
+def _get_environment_preset() -> Optional[str]:
+    """Return the preset load_environment() configured, or None for plain .env configuration."""
+    return os.getenv("OPENAI_PRESET_NAME")
+
+
+@dataclass
+class LLMRequest:
+    """A single chat completion request as it moves through the LLM call layer."""
+    base_url: str
+    api_key: str
+    api_params: Dict[str, Any]
+    stage: Optional[str] = None
+    label: str = ""  # Preset (or model) name used for per-preset metrics
+    stream_name: Optional[str] = None
+    response_check: Optional[Callable[[str], Any]] = None
+    cancel_event: Optional[threading.Event] = None  # Set when a hedged twin has already won
+    preset: Optional[str] = None  # Preset the request was built from, for capability lookups
+    max_tokens_ceiling: Optional[int] = None  # Configured max_tokens when an auto budget sent less
+    output_kind: Optional[str] = None  # Output-length histogram when it differs from the stage (e.g. "PAIRWISE")
+
+    @property
+    def length_stage(self) -> Optional[str]:
+        """Stage name the request's output lengths are recorded and budgeted under."""
+        return self.output_kind or self.stage
+
+
+@dataclass
+class LLMResponse:
+    """Content and call statistics returned by one completion request."""
+    content: str
+    finish_reason: Optional[str] = None
+    ttft: Optional[float] = None
+    usage: Any = None  # Raw usage object reported by the server, if any
+    choices: List[str] = field(default_factory=list)  # Every choice's content when the request sets n > 1
+
+
+# ============================================================================
+# OUTPUT LENGTH BUDGETS
+# Purpose: Keep per-stage, per-preset histograms of observed output lengths
+# across runs and right-size max_tokens from them, so requests stop reserving
+# batch slots and TPM budget for tokens they never generate
+# ============================================================================
+
+OUTPUT_LENGTH_BUCKET_TOKENS = 32
+MIN_AUTO_MAX_TOKENS = 256
+OUTPUT_LENGTH_MAX_SAMPLES = 2000  # Histograms are halved past this so they follow model and prompt changes
+MAX_TOKENS_MODES = ("fixed", "auto")
+# Bumped when histogram keys change meaning; files in an older format are ignored.
+# 2: pairwise verdicts are recorded under PAIRWISE instead of SCORE
+OUTPUT_LENGTH_STATS_FORMAT = 2
+
+
+class OutputLengthStats:
+    """Output-length histograms keyed by "STAGE|preset", persisted as JSON between runs.
+
+    Samples are only recorded once configure() is called. In "auto" mode a
+    request's max_tokens becomes a high percentile of the recorded lengths
+    plus a margin; the configured max_tokens stays the ceiling that a
+    truncated response is retried up to.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.path: Optional[Path] = None
+        self.mode = "fixed"
+        self.percentile = 95.0
+        self.margin = 0.25
+        self.min_samples = 20
+        self._histograms: Dict[str, Dict[str, Any]] = {}
+        self._budgets: Dict[str, Tuple[int, int, Tuple[int, int]]] = {}  # key -> (auto budget, configured, observed)
+
+    def configure(
+        self,
+        path: str,
+        mode: str = "fixed",
+        percentile: float = 95.0,
+        margin: float = 0.25,
+        min_samples: int = 20
+    ) -> None:
+        """Load the histograms recorded by earlier runs and set the max_tokens mode."""
+        stats_path = Path(path)
+        histograms: Dict[str, Dict[str, Any]] = {}
+        if stats_path.exists():
+            try:
+                saved = json.loads(stats_path.read_text(encoding="utf-8"))
+                if saved.get("format") == OUTPUT_LENGTH_STATS_FORMAT:
+                    histograms = saved.get("histograms", {})
+            except (OSError, ValueError) as e:
+                print(f"⚠ Ignoring unreadable output length stats {stats_path}: {e}")
+        with self._lock:
+            self.path = stats_path
+            self.mode = mode
+            self.percentile = min(100.0, max(0.0, percentile))
+            self.margin = max(0.0, margin)
+            self.min_samples = max(1, min_samples)
+            self._histograms = histograms
+
+    @staticmethod
+    def _key(stage: str, label: str) -> str:
+        return f"{stage}|{label}"
+
+    def record(self, stage: Optional[str], label: str, completion_tokens: int, samples: int = 1) -> None:
+        """Add `samples` outputs of `completion_tokens` tokens each to a stage/preset histogram."""
+        if self.path is None or stage is None:
+            return
+        bucket = str(max(0, completion_tokens) // OUTPUT_LENGTH_BUCKET_TOKENS)
+        with self._lock:
+            histogram = self._histograms.setdefault(self._key(stage, label), {"samples": 0, "counts": {}})
+            counts = histogram["counts"]
+            counts[bucket] = counts.get(bucket, 0) + samples
+            histogram["samples"] += samples
+            if histogram["samples"] > OUTPUT_LENGTH_MAX_SAMPLES:
+                histogram["counts"] = {b: c // 2 for b, c in counts.items() if c // 2}
+                histogram["samples"] = sum(histogram["counts"].values())
+
+    def observed_tokens(self, stage: str, label: str) -> Optional[Tuple[int, int]]:
+        """Return (percentile output length, sample count), or None below min_samples."""
+        with self._lock:
+            histogram = self._histograms.get(self._key(stage, label))
+            if histogram is None or histogram["samples"] < self.min_samples:
+                return None
+            target = histogram["samples"] * self.percentile / 100
+            seen = 0
+            for bucket in sorted(histogram["counts"], key=int):
+                seen += histogram["counts"][bucket]
+                if seen >= target:
+                    return (int(bucket) + 1) * OUTPUT_LENGTH_BUCKET_TOKENS, histogram["samples"]
+            return None
+
+    def budget(self, stage: Optional[str], label: str, max_tokens: int) -> int:
+        """Return the max_tokens to send: the configured value, or in auto mode the observed percentile plus margin."""
+        if self.mode != "auto" or stage is None or max_tokens <= MIN_AUTO_MAX_TOKENS:
+            return max_tokens
+        observed = self.observed_tokens(stage, label)
+        if observed is None:
+            return max_tokens
+        budget = min(max_tokens, max(MIN_AUTO_MAX_TOKENS, math.ceil(observed[0] * (1 + self.margin))))
+        with self._lock:
+            self._budgets[self._key(stage, label)] = (budget, max_tokens, observed)
+        return budget
+
+    def apply(self, request: LLMRequest) -> None:
+        """Lower a request's max_tokens to its auto budget, keeping the configured value as the retry ceiling."""
+        configured = request.api_params.get("max_tokens")
+        if not configured:
+            return
+        budget = self.budget(request.length_stage, request.label, configured)
+        if budget < configured:
+            request.api_params["max_tokens"] = budget
+            request.max_tokens_ceiling = configured
+
+    def budget_report(self) -> List[Tuple[str, int, int, Tuple[int, int]]]:
+        """Return (key, auto budget, configured max_tokens, observed) for the last budget used per key this run.
+
+        observed is the (percentile length, sample count) that budget was computed from.
+        """
+        with self._lock:
+            return [(key, *entry) for key, entry in sorted(self._budgets.items())]
+
+    def save(self) -> None:
+        """Write the histograms back to the stats file."""
+        if self.path is None:
+            return
+        with self._lock:
+            payload = json.dumps(
+                {"format": OUTPUT_LENGTH_STATS_FORMAT, "bucket_tokens": OUTPUT_LENGTH_BUCKET_TOKENS,
+                 "histograms": self._histograms},
+                indent=2, sort_keys=True
+            )
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp_path.write_text(payload, encoding="utf-8")
+            tmp_path.replace(self.path)
+        except OSError as e:
+            print(f"⚠ Could not save output length stats to {self.path}: {e}")
+
+
+# Shared by all stages; configured from main()
+output_length_stats = OutputLengthStats()
+
+
+def _cache_params(request: LLMRequest) -> Dict[str, Any]:
+    """Return the parameters a request is cached under.
+
+    Auto budgets drift between runs, so requests carrying one are keyed on the
+    configured max_tokens instead.
+    """
+    if request.max_tokens_ceiling is None:
+        return request.api_params
+    return {**request.api_params, "max_tokens": request.max_tokens_ceiling}
+
+
+def _grow_truncated_budget(request: LLMRequest, response: LLMResponse) -> bool:
+    """Double an auto max_tokens budget (up to the configured value) after a truncated response.
+
+    Returns True when the request should be resent with the larger budget.
+    """
+    ceiling = request.max_tokens_ceiling
+    current = request.api_params.get("max_tokens") or 0
+    if response.finish_reason != "length" or ceiling is None or current >= ceiling:
+        return False
+    request.api_params["max_tokens"] = min(ceiling, current * 2)
+    track_truncation_retry(request.length_stage, request.label)
+    return True
+
+
+# ============================================================================
+# STREAMING COMPLETIONS
+# Purpose: Stream responses to measure time-to-first-token, stop JSON stages
+# as soon as the top-level object closes and tee long-form text to disk
+# ============================================================================
+
+# Stages whose responses are a single JSON object
+JSON_STAGES = {"EXTRACT", "SCORE", "SELECT", "VALIDATE"}
+
+
+@dataclass
+class StreamingConfig:
+    """Process-wide streaming settings, configured from the command line."""
+    enabled: bool = False
+    stream_dir: Optional[Path] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _used_names: Dict[str, int] = field(default_factory=dict, repr=False)
+
+    def open_stream_file(self, stream_name: Optional[str]):
+        """Open a unique file for streamed tokens, or return None when not writing to disk."""
+        if not stream_name or self.stream_dir is None:
+            return None
+        with self._lock:
+            count = self._used_names.get(stream_name, 0) + 1
+            self._used_names[stream_name] = count
+        suffix = "" if count == 1 else f"_{count}"
+        self.stream_dir.mkdir(parents=True, exist_ok=True)
+        return open(self.stream_dir / f"{stream_name}{suffix}.md", "w", encoding="utf-8")
+
+
+llm_streaming = StreamingConfig()
+
+
+def _chunk_delta(chunk) -> Tuple[str, bool]:
+    """Return (content_text, has_any_token) for a streamed chunk."""
+    if not chunk.choices:
+        return "", False
+    delta = chunk.choices[0].delta
+    content = delta.content or ""
+    reasoning = getattr(delta, "reasoning_content", None) or getattr(delta, "reasoning", None)
+    return content, bool(content or reasoning)
+
+
+def _record_stream(
+    request: "LLMRequest",
+    start_time: float,
+    first_token_time: Optional[float],
+    token_count: int,
+    usage,
+    early_stop: bool
+) -> Tuple[Optional[float], int]:
+    """Record TTFT and decode throughput for a finished stream."""
+    end_time = time.time()
+    ttft = (first_token_time - start_time) if first_token_time else None
+    if usage is not None and getattr(usage, "completion_tokens", None):
+        token_count = usage.completion_tokens
+    decode_time = end_time - (first_token_time or end_time)
+    track_stream_metrics(request.stage, request.label, ttft, token_count, decode_time, early_stop)
+    return ttft, token_count
+
+
+def _stream_completion(client: OpenAI, request: "LLMRequest") -> "LLMResponse":
+    """Stream a chat completion, stopping early for JSON stages."""
+    start_time = time.time()
+    stream = client.chat.completions.create(
+        **request.api_params, stream=True, stream_options={"include_usage": True}
+    )  # type: ignore[arg-type]
+    scanner = ResponseScanner() if request.stage in JSON_STAGES else None
+    stream_file = llm_streaming.open_stream_file(request.stream_name)
+    parts: List[str] = []
+    first_token_time = None
+    token_count = 0
+    usage = None
+    finish_reason = None
+    early_stop = False
+    try:
+        for chunk in stream:
+            content, has_token = _chunk_delta(chunk)
+            if has_token:
+                token_count += 1
+                if first_token_time is None:
+                    first_token_time = time.time()
+            if chunk.choices and chunk.choices[0].finish_reason:
+                finish_reason = chunk.choices[0].finish_reason
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if content:
+                parts.append(content)
+                if stream_file is not None:
+                    stream_file.write(content)
+                    stream_file.flush()
+                if scanner is not None and scanner.feed(content):
+                    early_stop = True
+                    break
+            if request.cancel_event is not None and request.cancel_event.is_set():
+                raise HedgeCancelledError("Hedged twin finished first")
+    finally:
+        stream.close()
+        if stream_file is not None:
+            stream_file.close()
+
+    text = "".join(parts)
+    if scanner is not None:
+        text = scanner.truncate(text)
+    ttft, token_count = _record_stream(request, start_time, first_token_time, token_count, usage, early_stop)
+    return LLMResponse(content=text, finish_reason="stop" if early_stop else finish_reason, ttft=ttft, usage=usage)
+
+
+async def _stream_completion_async(client: AsyncOpenAI, request: "LLMRequest") -> "LLMResponse":
+    """Async counterpart of _stream_completion."""
+    start_time = time.time()
+    stream = await client.chat.completions.create(
+        **request.api_params, stream=True, stream_options={"include_usage": True}
+    )  # type: ignore[arg-type]
+    scanner = ResponseScanner() if request.stage in JSON_STAGES else None
+    stream_file = llm_streaming.open_stream_file(request.stream_name)
+    parts: List[str] = []
+    first_token_time = None
+    token_count = 0
+    usage = None
+    finish_reason = None
+    early_stop = False
+    try:
+        async for chunk in stream:
+            content, has_token = _chunk_delta(chunk)
+            if has_token:
+                token_count += 1
+                if first_token_time is None:
+                    first_token_time = time.time()
+            if chunk.choices and chunk.choices[0].finish_reason:
+                finish_reason = chunk.choices[0].finish_reason
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if content:
+                parts.append(content)
+                if stream_file is not None:
+                    stream_file.write(content)
+                    stream_file.flush()
+                if scanner is not None and scanner.feed(content):
+                    early_stop = True
+                    break
+    finally:
+        await stream.close()
+        if stream_file is not None:
+            stream_file.close()
+
+    text = "".join(parts)
+    if scanner is not None:
+        text = scanner.truncate(text)
+    ttft, token_count = _record_stream(request, start_time, first_token_time, token_count, usage, early_stop)
+    return LLMResponse(content=text, finish_reason="stop" if early_stop else finish_reason, ttft=ttft, usage=usage)
+
+
+def _response_from_completion(response: Any) -> LLMResponse:
+    """Convert a non-streamed completion into an LLMResponse, keeping every choice in index order."""
+    choices = sorted(response.choices, key=lambda c: c.index)
+    return LLMResponse(
+        content=choices[0].message.content,
+        finish_reason=choices[0].finish_reason,
+        usage=response.usage,
+        choices=[choice.message.content or "" for choice in choices]
+    )
+
+
+def _request_completion(client: OpenAI, request: LLMRequest) -> LLMResponse:
+    """Send one completion request, streaming when enabled (multi-choice requests are never streamed)."""
+    if llm_streaming.enabled and request.api_params.get("n", 1) == 1:
+        return _stream_completion(client, request)
+    response = client.chat.completions.create(**request.api_params)  # type: ignore[arg-type]
+    return _response_from_completion(response)
+
+
+async def _request_completion_async(client: AsyncOpenAI, request: LLMRequest) -> LLMResponse:
+    """Async counterpart of _request_completion."""
+    if llm_streaming.enabled and request.api_params.get("n", 1) == 1:
+        return await _stream_completion_async(client, request)
+    response = await client.chat.completions.create(**request.api_params)  # type: ignore[arg-type]
+    return _response_from_completion(response)
+
+
+# ============================================================================
+# ADAPTIVE CONCURRENCY (AIMD)
+# Purpose: Tune in-flight requests per provider - grow additively while
+# latency is stable, back off multiplicatively on errors, 429s and spikes
+# ============================================================================
+
+class AIMDLimiter:
+    """Additive-increase / multiplicative-decrease concurrency limit for one provider.
+
+    Usable from worker threads (acquire) and from the event loop (acquire_async).
+    Latency spikes are judged against a per-stage baseline because a candidate
+    generation call is legitimately much slower than a pairwise comparison.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff_factor: float = 0.5,
+        latency_tolerance: float = 2.0
+    ):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.backoff_factor = backoff_factor
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._baselines: Dict[str, Tuple[float, int]] = {}  # stage -> (ewma latency, samples)
+        self._last_decrease = 0.0
+
+    def _try_acquire(self) -> bool:
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def acquire(self) -> None:
+        """Block the calling thread until a slot is available."""
+        with self._cond:
+            while not self._try_acquire():
+                self._cond.wait()
+
+    async def acquire_async(self) -> None:
+        """Wait on the event loop until a slot is available."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._try_acquire():
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+
+    def release(self, stage: Optional[str], latency: float, outcome: str) -> None:
+        """Return a slot and adjust the limit from the call outcome.
+
+        Args:
+            stage: Pipeline stage of the call (latency baseline key)
+            latency: Wall time of the call in seconds
+            outcome: "success", "rate_limited", "error" or "cancelled" (lost a hedge race)
+        """
+        with self._cond:
+            self.in_flight -= 1
+            previous = int(self.limit)
+            reason = None
+            if outcome == "success":
+                baseline, samples = self._baselines.get(stage or "", (latency, 0))
+                if samples >= 5 and latency > baseline * self.latency_tolerance:
+                    reason = self._decrease(f"latency spike {latency:.1f}s vs {baseline:.1f}s baseline")
+                else:
+                    # +1 per full window of successful calls
+                    self.limit = min(self.max_limit, self.limit + 1.0 / max(self.limit, 1.0))
+                    if int(self.limit) > previous:
+                        reason = "stable latency"
+                self._baselines[stage or ""] = (baseline * 0.9 + latency * 0.1 if samples else latency, samples + 1)
+            elif outcome != "cancelled":
+                reason = self._decrease("rate limited (429)" if outcome == "rate_limited" else "request error")
+
+            current = int(self.limit)
+            self._cond.notify_all()
+            self._wake_async_waiters(max(0, current - self.in_flight))
+
+        if reason and current != previous:
+            track_concurrency_limit(self.name, previous, current, reason)
+
+    def _decrease(self, reason: str) -> Optional[str]:
+        # Only back off once per burst of simultaneous failures
+        now = time.time()
+        if now - self._last_decrease < 1.0:
+            return None
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit * self.backoff_factor)
+        return reason
+
+    def _wake_async_waiters(self, count: int) -> None:
+        while count > 0 and self._async_waiters:
+            loop, waiter = self._async_waiters.pop(0)
+            if waiter.done():
+                continue
+            loop.call_soon_threadsafe(_resolve_waiter, waiter)
+            count -= 1
+
+
+def _resolve_waiter(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def _classify_outcome(error: Optional[BaseException]) -> str:
+    """Map a call result to an AIMD outcome."""
+    if error is None:
+        return "success"
+    if isinstance(error, (HedgeCancelledError, asyncio.CancelledError)):
+        return "cancelled"
+    if isinstance(error, RateLimitError):
+        return "rate_limited"
+    return "error"
+
+
+class AdaptiveConcurrencyController:
+    """Holds one AIMDLimiter per provider (keyed by base URL). Disabled until configured."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limiters: Dict[str, AIMDLimiter] = {}
+        self.enabled = False
+        self.verbose = False
+        self.initial_limit = 5
+        self.max_limit = 20
+
+    def configure(self, initial_limit: int, max_limit: int, verbose: bool = False) -> None:
+        """Enable adaptive limits starting at initial_limit, capped at max_limit."""
+        with self._lock:
+            self.enabled = True
+            self.verbose = verbose
+            self.initial_limit = initial_limit
+            self.max_limit = max(initial_limit, max_limit)
+            self._limiters.clear()
+
+    def worker_count(self, max_concurrent: int) -> int:
+        """Pool size for a parallel stage; the limiters, not the pool, bound in-flight calls."""
+        return self.max_limit if self.enabled else max_concurrent
+
+    def limiter_for(self, base_url: str) -> Optional[AIMDLimiter]:
+        """Return the provider's limiter, or None when adaptive concurrency is off."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            limiter = self._limiters.get(base_url)
+            if limiter is None:
+                provider_name, provider = _find_provider_by_url(base_url)
+                settings = provider.get("concurrency", {}) if provider else {}
+                limiter = AIMDLimiter(
+                    name=provider_name,
+                    initial_limit=settings.get("initial", self.initial_limit),
+                    min_limit=settings.get("min", 1),
+                    max_limit=settings.get("max", self.max_limit)
+                )
+                self._limiters[base_url] = limiter
+            return limiter
+
+
+def _find_provider_by_url(base_url: str) -> Tuple[str, Dict[str, Any]]:
+    """Return (provider_name, provider_config) for a base URL, falling back to the URL."""
+    try:
+        providers = load_models_config().get("providers", {})
+    except FileNotFoundError:
+        providers = {}
+    for name, provider in providers.items():
+        if base_url in provider_endpoints(provider):
+            return name, provider
+    return base_url, {}
+
+
+adaptive_concurrency = AdaptiveConcurrencyController()
+
+
+# ============================================================================
+# PROVIDER RATE LIMITS (RPM / TPM)
+# Purpose: Token buckets per provider so bursts of parallel calls are paced
+# at the provider's ceiling instead of bouncing off 429s
+# ============================================================================
+
+DEFAULT_RESERVED_COMPLETION_TOKENS = 1024
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding up to `capacity` units, refilled over one minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (requests larger than the bucket wait for a full bucket)."""
+        needed = min(amount, self.capacity) - self.tokens
+        return max(0.0, needed / self.rate)
+
+
+class ProviderRateLimiter:
+    """Requests-per-minute and tokens-per-minute budgets for one provider.
+
+    TPM is reserved up front from an estimate of prompt plus max_tokens and
+    settled against the real usage once the response arrives. A bucket may go
+    into debt when a response was larger than reserved; later callers wait it off.
+    """
+
+    def __init__(self, name: str, requests_per_minute: Optional[float], tokens_per_minute: Optional[float]):
+        self.name = name
+        self._lock = threading.Lock()
+        self.rpm = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tpm = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def _try_reserve(self, tokens: int) -> float:
+        """Take one request and `tokens` if both are available, else return the wait time."""
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            for bucket, amount in ((self.rpm, 1), (self.tpm, tokens)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_time(amount))
+            if wait > 0:
+                return wait
+            if self.rpm is not None:
+                self.rpm.tokens -= 1
+            if self.tpm is not None:
+                self.tpm.tokens -= tokens
+            return 0.0
+
+    def reserve(self, tokens: int) -> float:
+        """Block until the request fits both budgets. Returns seconds spent waiting."""
+        waited = 0.0
+        while True:
+            wait = self._try_reserve(tokens)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def reserve_async(self, tokens: int) -> float:
+        """Async counterpart of reserve."""
+        waited = 0.0
+        while True:
+            wait = self._try_reserve(tokens)
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def settle(self, reserved: int, actual: int) -> None:
+        """Refund (or charge) the difference between reserved and actual token usage."""
+        if self.tpm is None:
+            return
+        with self._lock:
+            self.tpm.refill(time.monotonic())
+            self.tpm.tokens = min(self.tpm.capacity, self.tpm.tokens + reserved - actual)
+
+
+class RateLimitRegistry:
+    """Lazily builds a ProviderRateLimiter for every provider declaring `rate_limits`."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limiters: Dict[str, Optional[ProviderRateLimiter]] = {}
+
+    def limiter_for(self, base_url: str) -> Optional[ProviderRateLimiter]:
+        """Return the provider's limiter, or None when it declares no rate limits."""
+        with self._lock:
+            if base_url not in self._limiters:
+                provider_name, provider = _find_provider_by_url(base_url)
+                limits = provider.get("rate_limits") or {}
+                rpm = limits.get("requests_per_minute")
+                tpm = limits.get("tokens_per_minute")
+                self._limiters[base_url] = ProviderRateLimiter(provider_name, rpm, tpm) if (rpm or tpm) else None
+            return self._limiters[base_url]
+
+
+provider_rate_limits = RateLimitRegistry()
+
+
+def _estimate_request_tokens(api_params: Dict[str, Any]) -> Tuple[int, int]:
+    """Estimate (prompt_tokens, reserved_total) for a request."""
+    prompt_tokens = count_message_tokens(api_params.get("messages", []))
+    completion_tokens = api_params.get("max_tokens") or DEFAULT_RESERVED_COMPLETION_TOKENS
+    return prompt_tokens, prompt_tokens + completion_tokens * api_params.get("n", 1)
+
+
+def _actual_request_tokens(response: Optional[LLMResponse], prompt_tokens: int) -> int:
+    """Tokens consumed by a finished request, from usage when the server reported it."""
+    if response is None:
+        # Failed before generating: the provider still counts the prompt
+        return prompt_tokens
+    usage = response.usage
+    if usage is not None and getattr(usage, "total_tokens", None):
+        return usage.total_tokens
+    return prompt_tokens + count_tokens(response.content or "")
+
+
+# ============================================================================
+# MULTI-ENDPOINT ROUTING AND CIRCUIT BREAKERS
+# Purpose: Spread a provider over several replicas - least-outstanding-requests
+# balancing, optional system-prompt affinity so each replica's prefix cache
+# stays hot, and a circuit breaker per endpoint that stops traffic to a
+# failing endpoint and probes its recovery in the background
+# ============================================================================
+
+def provider_endpoints(provider: Dict[str, Any]) -> List[str]:
+    """Return the endpoint URLs of a provider (`endpoints` list, else its single `base_url`)."""
+    endpoints = provider.get("endpoints") or []
+    if provider.get("base_url") and provider["base_url"] not in endpoints:
+        endpoints = [provider["base_url"]] + list(endpoints)
+    return endpoints
+
+
+class CircuitOpenError(Exception):
+    """Raised when every endpoint of a provider has an open circuit breaker."""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one endpoint.
+
+    Opens after failure_threshold consecutive failures (server errors, timeouts,
+    connection errors). While open no traffic is sent; once reset_timeout has
+    passed the background health check probes the endpoint and, if it answers,
+    moves the breaker to half-open, where a single trial request decides
+    between closing it again and re-opening it with a doubled timeout.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 10.0, max_reset_timeout: float = 120.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def _transition(self, new_state: str, reason: str) -> None:
+        old_state, self.state = self.state, new_state
+        if new_state == self.OPEN:
+            self.opened_at = time.time()
+        track_breaker_transition(self.name, old_state, new_state, reason)
+
+    def allow_request(self) -> bool:
+        """Whether a request may be sent now (claims the single half-open trial slot)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                self.reset_timeout = self.base_reset_timeout
+                self._transition(self.CLOSED, "trial request succeeded")
+
+    def record_failure(self, reason: str) -> None:
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+                self._transition(self.OPEN, f"trial request failed: {reason}")
+            elif self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                self._transition(self.OPEN, f"{self.failures} consecutive failures, last: {reason}")
+
+    def release_trial(self) -> None:
+        """Give back the half-open trial slot without a verdict (request was cancelled)."""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def probe_due(self) -> bool:
+        with self._lock:
+            return self.state == self.OPEN and time.time() - self.opened_at >= self.reset_timeout
+
+    def record_probe(self, healthy: bool) -> None:
+        """Apply a background health check result."""
+        with self._lock:
+            if self.state == self.OPEN and healthy:
+                self._transition(self.HALF_OPEN, "health check passed")
+            elif self.state == self.OPEN:
+                self.opened_at = time.time()
+            elif not healthy:
+                self._transition(self.OPEN, "health check failed")
+
+
+# Failures that say something about the endpoint (not about the prompt or the account)
+BREAKER_FAILURE_CLASSES = ("server", "timeout", "connection")
+
+
+@dataclass
+class EndpointState:
+    """Live load, stats and circuit breaker of one endpoint."""
+    url: str
+    breaker: CircuitBreaker
+    outstanding: int = 0
+    requests: int = 0
+    errors: int = 0
+    total_latency: float = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return self.breaker.state != CircuitBreaker.OPEN
+
+
+class EndpointPool:
+    """Replicas of one provider with least-outstanding-requests or affinity routing."""
+
+    def __init__(self, name: str, urls: List[str], affinity: bool = False, breaker_settings: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.affinity = affinity
+        self.endpoints = [
+            EndpointState(url=url, breaker=CircuitBreaker(url, **(breaker_settings or {})))
+            for url in urls
+        ]
+        self._lock = threading.Lock()
+
+    def acquire(self, affinity_key: Optional[str]) -> EndpointState:
+        """Pick an endpoint for a request and count it as outstanding.
+
+        Raises:
+            CircuitOpenError: If every endpoint's breaker is open
+        """
+        with self._lock:
+            # A half-open endpoint gets its single trial request even while others are closed,
+            # otherwise a recovered replica would never rejoin a pool that still has capacity
+            trial = next((
+                e for e in self.endpoints
+                if e.breaker.state == CircuitBreaker.HALF_OPEN and e.breaker.allow_request()
+            ), None)
+            candidates = [trial] if trial is not None else [
+                e for e in self.endpoints if e.breaker.state == CircuitBreaker.CLOSED
+            ]
+            if not candidates:
+                raise CircuitOpenError(f"All endpoints of provider '{self.name}' are unavailable (circuit open)")
+            least_loaded = min(candidates, key=lambda e: (e.outstanding, e.requests))
+            chosen = least_loaded
+            if self.affinity and affinity_key is not None and len(candidates) > 1:
+                # Rendezvous hashing keeps a prompt on the same replica as long as it is healthy
+                preferred = max(
+                    candidates,
+                    key=lambda e: hashlib.sha256(f"{affinity_key}|{e.url}".encode("utf-8")).digest()
+                )
+                # ...unless that replica is far busier than the least-loaded one
+                if preferred.outstanding <= 2 * least_loaded.outstanding + 2:
+                    chosen = preferred
+            chosen.outstanding += 1
+            chosen.requests += 1
+            return chosen
+
+    def release(self, endpoint: EndpointState, latency: float, error: Optional[BaseException]) -> None:
+        """Finish a request and feed its outcome to the endpoint's circuit breaker."""
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.total_latency += latency
+            if error is not None and not isinstance(error, (HedgeCancelledError, asyncio.CancelledError)):
+                endpoint.errors += 1
+        if error is None:
+            endpoint.breaker.record_success()
+        elif isinstance(error, (HedgeCancelledError, asyncio.CancelledError)):
+            endpoint.breaker.release_trial()
+        elif classify_llm_error(error) in BREAKER_FAILURE_CLASSES:
+            endpoint.breaker.record_failure(classify_llm_error(error))
+            if not endpoint.healthy:
+                endpoint_router.start_health_checks()
+        else:
+            endpoint.breaker.record_success()  # The endpoint answered; the problem was the request
+
+
+class EndpointRouter:
+    """Builds an EndpointPool per provider and runs background health checks.
+
+    Multi-endpoint pools are swept every health_check_interval seconds; open
+    breakers on any provider are probed as soon as their reset timeout expires.
+    """
+
+    def __init__(self, health_check_interval: float = 15.0):
+        self._lock = threading.Lock()
+        self._pools: Dict[str, EndpointPool] = {}
+        self._api_keys: Dict[str, str] = {}
+        self.health_check_interval = health_check_interval
+        self._health_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def pool_for(self, base_url: str, api_key: str) -> EndpointPool:
+        """Return the pool for a provider, identified by its primary base URL."""
+        with self._lock:
+            pool = self._pools.get(base_url)
+            if pool is None:
+                provider_name, provider = _find_provider_by_url(base_url)
+                urls = provider_endpoints(provider) or [base_url]
+                pool = EndpointPool(
+                    provider_name,
+                    urls,
+                    affinity=provider.get("routing") == "affinity",
+                    breaker_settings=provider.get("circuit_breaker")
+                )
+                self._pools[base_url] = pool
+                self._api_keys[base_url] = api_key
+            start = len(pool.endpoints) > 1
+        if start:
+            self.start_health_checks()
+        return pool
+
+    def acquire(self, request: LLMRequest) -> Tuple[EndpointPool, EndpointState]:
+        """Route a request to an endpoint of its provider."""
+        pool = self.pool_for(request.base_url, request.api_key)
+        affinity_key = None
+        if pool.affinity:
+            system_prompt = request.api_params["messages"][0].get("content") or ""
+            affinity_key = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        return pool, pool.acquire(affinity_key)
+
+    def start_health_checks(self) -> None:
+        """Start the background health-check thread (once)."""
+        with self._lock:
+            if self._health_thread is None:
+                self._health_thread = threading.Thread(target=self._health_loop, name="endpoint-health", daemon=True)
+                self._health_thread.start()
+
+    def _health_loop(self) -> None:
+        last_sweep = 0.0
+        with httpx.Client(timeout=3.0) as http:
+            while not self._stop.is_set():
+                sweep = time.time() - last_sweep >= self.health_check_interval
+                if sweep:
+                    last_sweep = time.time()
+                with self._lock:
+                    pools = [(pool, self._api_keys[key]) for key, pool in self._pools.items()]
+                for pool, api_key in pools:
+                    for endpoint in pool.endpoints:
+                        if endpoint.breaker.probe_due() or (sweep and len(pool.endpoints) > 1):
+                            endpoint.breaker.record_probe(self._probe(http, endpoint.url, api_key))
+                self._stop.wait(1.0)
+
+    @staticmethod
+    def _probe(http: httpx.Client, url: str, api_key: str) -> bool:
+        try:
+            reply = http.get(f"{url.rstrip('/')}/models", headers={"Authorization": f"Bearer {api_key}"})
+            return reply.status_code < 500
+        except httpx.HTTPError:
+            return False
+
+    def close(self) -> None:
+        """Stop background health checks."""
+        self._stop.set()
+
+    def endpoint_stats(self) -> Dict[str, List[EndpointState]]:
+        """Per-endpoint stats for every provider with more than one endpoint."""
+        with self._lock:
+            return {pool.name: list(pool.endpoints) for pool in self._pools.values() if len(pool.endpoints) > 1}
+
+
+endpoint_router = EndpointRouter()
+
+
+def _run_with_limits(request: LLMRequest) -> LLMResponse:
+    """Run one request on an endpoint of its provider, inside the provider's rate and concurrency limits."""
+    rate_limiter = provider_rate_limits.limiter_for(request.base_url)
+    limiter = adaptive_concurrency.limiter_for(request.base_url)
+    reserved = None
+    acquired = False
+    pool, endpoint = None, None
+    start_time = time.time()
+    response = None
+    error = None
+    try:
+        if rate_limiter is not None:
+            prompt_tokens, reserved = _estimate_request_tokens(request.api_params)
+            track_rate_limit_wait(rate_limiter.name, rate_limiter.reserve(reserved))
+        if limiter is not None:
+            limiter.acquire()
+            acquired = True
+        # Route only once the limits let the request through, so throttled requests
+        # neither count as outstanding nor hold a half-open breaker's trial slot
+        pool, endpoint = endpoint_router.acquire(request)
+        client = llm_client_registry.get_client(base_url=endpoint.url, api_key=request.api_key)
+        start_time = time.time()
+        response = _request_completion(client, request)
+        track_token_usage(request, response, time.time() - start_time)
+        return response
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        if endpoint is not None:
+            pool.release(endpoint, time.time() - start_time, error)
+        if acquired:
+            # A request that never reached an endpoint says nothing about the provider's capacity
+            outcome = _classify_outcome(error) if endpoint is not None else "cancelled"
+            limiter.release(request.stage, time.time() - start_time, outcome)
+        if reserved is not None:
+            rate_limiter.settle(reserved, _actual_request_tokens(response, prompt_tokens) if endpoint is not None else 0)
+
+
+async def _run_with_limits_async(request: LLMRequest) -> LLMResponse:
+    """Async counterpart of _run_with_limits."""
+    rate_limiter = provider_rate_limits.limiter_for(request.base_url)
+    limiter = adaptive_concurrency.limiter_for(request.base_url)
+    reserved = None
+    acquired = False
+    pool, endpoint = None, None
+    start_time = time.time()
+    response = None
+    error = None
+    try:
+        if rate_limiter is not None:
+            prompt_tokens, reserved = _estimate_request_tokens(request.api_params)
+            track_rate_limit_wait(rate_limiter.name, await rate_limiter.reserve_async(reserved))
+        if limiter is not None:
+            await limiter.acquire_async()
+            acquired = True
+        # Route only once the limits let the request through, so throttled requests
+        # neither count as outstanding nor hold a half-open breaker's trial slot
+        pool, endpoint = endpoint_router.acquire(request)
+        client = llm_client_registry.get_async_client(base_url=endpoint.url, api_key=request.api_key)
+        start_time = time.time()
+        response = await _request_completion_async(client, request)
+        track_token_usage(request, response, time.time() - start_time)
+        return response
+    except BaseException as e:  # Includes CancelledError when a hedged twin wins
+        error = e
+        raise
+    finally:
+        if endpoint is not None:
+            pool.release(endpoint, time.time() - start_time, error)
+        if acquired:
+            # A request that never reached an endpoint says nothing about the provider's capacity
+            outcome = _classify_outcome(error) if endpoint is not None else "cancelled"
+            limiter.release(request.stage, time.time() - start_time, outcome)
+        if reserved is not None:
+            rate_limiter.settle(reserved, _actual_request_tokens(response, prompt_tokens) if endpoint is not None else 0)
+
+
+# ============================================================================
+# HEDGED REQUESTS
+# Purpose: Cut tail latency - when a call outlives the p90 latency of its
+# stage and preset, race a duplicate and keep whichever finishes first
+# ============================================================================
+
+class HedgeCancelledError(Exception):
+    """Raised inside the losing request of a hedged pair once the other one has won."""
+
+
+class HedgingController:
+    """Latency history, hedge budget and alternate target for hedged requests.
+
+    Disabled until configured. Hedging starts for a (stage, preset) pair once
+    min_samples successful latencies have been observed; hedges are limited to
+    budget_ratio of the calls made while hedging was enabled.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.enabled = False
+        self.budget_ratio = 0.1
+        self.min_samples = 5
+        self.alternate_preset: Optional[str] = None
+        self._latencies: Dict[Tuple[Optional[str], str], deque] = {}
+        self._calls = 0
+        self._hedges = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_workers = 0
+
+    def configure(self, budget_ratio: float = 0.1, alternate_preset: Optional[str] = None) -> None:
+        """Enable hedging with an extra-call budget and an optional alternate preset."""
+        with self._lock:
+            self.enabled = True
+            self.budget_ratio = budget_ratio
+            self.alternate_preset = alternate_preset
+
+    def begin(self, request: LLMRequest) -> Optional[float]:
+        """Count a call and return its hedge delay (observed p90), or None if it must not be hedged."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._calls += 1
+            samples = self._latencies.get((request.stage, request.label))
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            return statistics.quantiles(samples, n=10)[-1]
+
+    def record_latency(self, request: LLMRequest, latency: float) -> None:
+        """Add a call's latency to its (stage, preset) history.
+
+        For a hedged primary this is its elapsed time when the race ended, so
+        stragglers stay in the history even when their hedge wins.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._latencies.setdefault((request.stage, request.label), deque(maxlen=200)).append(latency)
+
+    def try_reserve_hedge(self) -> bool:
+        """Take one hedge from the budget if available."""
+        with self._lock:
+            if self._hedges + 1 > self.budget_ratio * self._calls:
+                return False
+            self._hedges += 1
+            return True
+
+    def hedge_request(self, request: LLMRequest) -> LLMRequest:
+        """Build the duplicate request, retargeted to the alternate preset when one is configured."""
+        if not self.alternate_preset:
+            return replace(request, cancel_event=threading.Event())
+        base_url, api_key, model_name = llm_client_registry.resolve_preset(self.alternate_preset)
+        api_params = {**request.api_params, "model": model_name}
+        if "extra_body" in api_params:
+            api_params["extra_body"] = dict(api_params["extra_body"])
+        structured_mode = llm_client_registry.capability(request.preset, "structured_output")
+        if llm_client_registry.capability(self.alternate_preset, "structured_output") != structured_mode:
+            # The schema parameters are provider-specific; send the hedge as free-form JSON
+            remove_api_params(api_params, {"response_format": None, "extra_body": {"guided_json": None}})
+        # Reasoning settings are per preset; swap the primary's for the alternate's
+        remove_api_params(api_params, reasoning_params(request.preset, request.stage))
+        merge_api_params(api_params, reasoning_params(self.alternate_preset, request.stage))
+        return replace(
+            request,
+            base_url=base_url,
+            api_key=api_key,
+            api_params=api_params,
+            label=self.alternate_preset,
+            preset=self.alternate_preset,
+            cancel_event=threading.Event()
+        )
+
+    def executor(self, workers: int) -> ThreadPoolExecutor:
+        """Pool that runs hedge duplicates for the threaded engine, with at least `workers` threads.
+
+        The pool is replaced by a larger one when the configured concurrency
+        grows; duplicates already running on the old pool finish there.
+        """
+        with self._lock:
+            if self._executor is None or self._executor_workers < workers:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+                self._executor_workers = workers
+            return self._executor
+
+    def close(self) -> None:
+        """Stop the hedge pool without waiting for abandoned losers."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self._executor_workers = 0
+
+
+llm_hedging = HedgingController()
+
+
+def _timed_run(request: LLMRequest) -> Tuple[LLMResponse, float]:
+    start_time = time.time()
+    response = _run_with_limits(request)
+    return response, time.time() - start_time
+
+
+async def _timed_run_async(request: LLMRequest) -> Tuple[LLMResponse, float]:
+    start_time = time.time()
+    response = await _run_with_limits_async(request)
+    return response, time.time() - start_time
+
+
+def _run_hedge_twin(hedge: LLMRequest, primary: LLMRequest) -> Tuple[LLMResponse, float]:
+    """Run a hedge duplicate and, if it succeeds, tell the primary to stop."""
+    response, latency = _timed_run(hedge)
+    primary.cancel_event.set()
+    return response, latency
+
+
+def _run_hedged(request: LLMRequest) -> LLMResponse:
+    """Run a request, racing a duplicate once it exceeds the p90 latency for its stage and preset.
+
+    The primary runs on the calling thread; only the duplicate goes to the
+    hedge pool. A streaming primary stops at its next chunk once the duplicate
+    succeeds, while a non-streaming one cannot be interrupted and runs to
+    completion before the duplicate's response is returned.
+    """
+    hedge_delay = llm_hedging.begin(request)
+    if hedge_delay is None:
+        response, latency = _timed_run(request)
+        llm_hedging.record_latency(request, latency)
+        return response
+
+    primary = replace(request, cancel_event=threading.Event())
+    hedge_lock = threading.Lock()
+    race: Dict[str, Any] = {"finished": False, "hedge": None, "future": None}
+
+    def launch_hedge():
+        with hedge_lock:
+            if race["finished"]:
+                return
+            if not llm_hedging.try_reserve_hedge():
+                track_hedge(request.stage, request.label, "denied")
+                return
+            hedge = llm_hedging.hedge_request(request)
+            executor = llm_hedging.executor(max(1, llm_scheduler.capacity))
+            race["hedge"] = hedge
+            race["future"] = executor.submit(_run_hedge_twin, hedge, primary)
+
+    timer = threading.Timer(hedge_delay, launch_hedge)
+    timer.daemon = True
+    start_time = time.time()
+    timer.start()
+    response, primary_error = None, None
+    try:
+        response = _run_with_limits(primary)
+    except Exception as e:
+        primary_error = e
+    primary_elapsed = time.time() - start_time
+    with hedge_lock:
+        race["finished"] = True
+        timer.cancel()
+    hedge, future = race["hedge"], race["future"]
+
+    if future is None:
+        if primary_error is not None:
+            raise primary_error
+        llm_hedging.record_latency(request, primary_elapsed)
+        return response
+
+    if primary_error is None and not primary.cancel_event.is_set():
+        # Primary finished first: stop the duplicate
+        hedge.cancel_event.set()
+        future.cancel()
+        llm_hedging.record_latency(request, primary_elapsed)
+        track_hedge(request.stage, request.label, "primary_won")
+        return response
+
+    try:
+        hedge_response, hedge_latency = future.result()
+    except Exception:
+        if primary_error is not None and not isinstance(primary_error, HedgeCancelledError):
+            raise primary_error
+        raise
+    llm_hedging.record_latency(hedge, hedge_latency)
+    if primary_error is None or isinstance(primary_error, HedgeCancelledError):
+        # The straggling primary ran at least until the duplicate answered
+        llm_hedging.record_latency(request, max(primary_elapsed, hedge_delay + hedge_latency))
+    track_hedge(request.stage, request.label, "hedge_won")
+    return hedge_response
+
+
+async def _run_hedged_async(request: LLMRequest) -> LLMResponse:
+    """Async counterpart of _run_hedged; the losing task is cancelled outright."""
+    hedge_delay = llm_hedging.begin(request)
+    if hedge_delay is None:
+        response, latency = await _timed_run_async(request)
+        llm_hedging.record_latency(request, latency)
+        return response
+
+    start_time = time.time()
+    tasks = {asyncio.ensure_future(_timed_run_async(request)): request}
+    primary_task = next(iter(tasks))
+    hedged = False
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+        if not done:
+            if llm_hedging.try_reserve_hedge():
+                hedge = llm_hedging.hedge_request(request)
+                tasks[asyncio.ensure_future(_timed_run_async(hedge))] = hedge
+                hedged = True
+            else:
+                track_hedge(request.stage, request.label, "denied")
+
+        pending = set(tasks)
+        first_error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    first_error = first_error or task.exception()
+                    continue
+                response, latency = task.result()
+                llm_hedging.record_latency(tasks[task], latency)
+                if hedged:
+                    if task is not primary_task and primary_task in pending:
+                        # The straggling primary ran at least until the duplicate answered
+                        primary_elapsed = max(time.time() - start_time, hedge_delay + latency)
+                        llm_hedging.record_latency(request, primary_elapsed)
+                    track_hedge(request.stage, request.label, "hedge_won" if task is not primary_task else "primary_won")
+                return response
+        raise first_error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+# ============================================================================
+# RETRY POLICY
+# Purpose: One classified retry path for every LLM call - exponential backoff
+# with jitter, Retry-After support and a per-run retry budget
+# ============================================================================
+
+class ResponseParseError(ValueError):
+    """Raised when a stage's parser rejects an otherwise successful response."""
+
+
+RETRYABLE_ERROR_CLASSES = ("rate_limit", "server", "timeout", "connection", "parse")
+
+
+def classify_llm_error(error: BaseException) -> str:
+    """Map an exception from an LLM call to a retry class.
+
+    Returns one of RETRYABLE_ERROR_CLASSES, or "client" for errors that will
+    not succeed on retry (bad request, authentication, unknown model, ...).
+    """
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"  # Not retried here: the caller falls back to another preset
+    if isinstance(error, RateLimitError):
+        return "rate_limit"
+    if isinstance(error, (APITimeoutError, httpx.TimeoutException)):
+        return "timeout"
+    if isinstance(error, (APIConnectionError, httpx.TransportError)):
+        return "connection"
+    if isinstance(error, APIStatusError):
+        if error.status_code >= 500:
+            return "server"
+        if error.status_code == 408:
+            return "timeout"
+        return "client"
+    if isinstance(error, ValueError):
+        # ResponseParseError, json.JSONDecodeError and empty responses
+        return "parse"
+    return "client"
+
+
+def _retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Read a Retry-After (or retry-after-ms) header from an API error, if present."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+
+class RetryPolicy:
+    """Decides whether and when a failed LLM call is retried.
+
+    Delays grow exponentially from the caller's base delay with equal jitter,
+    capped at max_delay. A Retry-After header from the server takes precedence
+    when longer. Retries across the whole run are limited to
+    min_budget + budget_ratio * calls, so a failing provider cannot multiply
+    the call count.
+    """
+
+    def __init__(self, budget_ratio: float = 0.2, min_budget: int = 10, max_delay: float = 30.0):
+        self._lock = threading.Lock()
+        self.budget_ratio = budget_ratio
+        self.min_budget = min_budget
+        self.max_delay = max_delay
+        self.calls = 0
+        self.retries = 0
+
+    def configure(self, budget_ratio: float) -> None:
+        """Set the retry budget as a fraction of calls made in this run."""
+        with self._lock:
+            self.budget_ratio = budget_ratio
+
+    def record_call(self) -> None:
+        """Count a first attempt towards the retry budget."""
+        with self._lock:
+            self.calls += 1
+
+    def next_delay(
+        self,
+        error: BaseException,
+        attempt: int,
+        max_attempts: int,
+        base_delay: float
+    ) -> Optional[float]:
+        """Return the seconds to wait before retrying, or None to give up.
+
+        Args:
+            error: Exception raised by the failed attempt
+            attempt: Zero-based index of the failed attempt
+            max_attempts: Attempts allowed for this call
+            base_delay: Backoff delay for the first retry in seconds
+
+        Returns:
+            Delay in seconds, or None when the error is not retryable, the
+            attempts are used up or the run's retry budget is exhausted
+        """
+        error_class = classify_llm_error(error)
+        if error_class not in RETRYABLE_ERROR_CLASSES or attempt + 1 >= max_attempts:
+            return None
+        with self._lock:
+            if self.retries >= self.min_budget + self.budget_ratio * self.calls:
+                budget_exhausted = True
+            else:
+                budget_exhausted = False
+                self.retries += 1
+        track_retry(error_class, allowed=not budget_exhausted)
+        if budget_exhausted:
+            return None
+
+        backoff = min(self.max_delay, base_delay * (2 ** attempt))
+        delay = backoff / 2 + random.uniform(0, backoff / 2)
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay * 4))
+        return delay
+
+
+llm_retry_policy = RetryPolicy()
+
+
+def _checked_text(request: LLMRequest, text: Optional[str]) -> str:
+    """Return one stripped response text, raising if it is empty or the stage parser rejects it."""
+    if not text:
+        raise ValueError("Empty response from LLM")
+    content = text.strip()
+    if request.response_check is not None:
+        try:
+            request.response_check(content)
+        except Exception as e:
+            raise ResponseParseError(f"Unparseable {request.stage or 'LLM'} response: {e}") from e
+    return content
+
+
+def _checked_choices(request: LLMRequest, response: LLMResponse) -> List[str]:
+    """Return every usable choice of a response.
+
+    Single-choice responses raise exactly like a rejected text. For n > 1 the
+    bad choices are dropped and the call only fails when none survive.
+    """
+    if len(response.choices) <= 1:
+        return [_checked_text(request, response.content)]
+    contents = []
+    first_error: Optional[Exception] = None
+    for text in response.choices:
+        try:
+            contents.append(_checked_text(request, text))
+        except ValueError as e:
+            first_error = first_error or e
+    if not contents and first_error is not None:
+        raise first_error
+    return contents
+
+
+# ============================================================================
+# STRUCTURED OUTPUT
+# Purpose: JSON Schemas derived from the stage dataclasses, sent as
+# response_format / guided_json to presets that support schema-guided decoding
+# ============================================================================
+
+STRUCTURED_OUTPUT_MODES = ("json_schema", "guided_json", "json_object")
+
+
+def _type_json_schema(annotation: Any) -> Dict[str, Any]:
+    """Map a dataclass field annotation to a JSON Schema fragment."""
+    origin = typing.get_origin(annotation)
+    if annotation is str:
+        return {"type": "string"}
+    if annotation is bool:
+        return {"type": "boolean"}
+    if annotation is int:
+        return {"type": "integer"}
+    if annotation is float:
+        return {"type": "number"}
+    if origin in (list, List):
+        (item,) = typing.get_args(annotation) or (Any,)
+        return {"type": "array", "items": _type_json_schema(item)}
+    if origin in (dict, Dict):
+        args = typing.get_args(annotation)
+        value = args[1] if len(args) == 2 else Any
+        return {"type": "object"} if value is Any else {"type": "object", "additionalProperties": _type_json_schema(value)}
+    return {}
+
+
+def dataclass_json_schema(
+    cls: type,
+    exclude: Tuple[str, ...] = (),
+    overrides: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Build a JSON Schema for a dataclass; every remaining field is required.
+
+    Args:
+        cls: Dataclass whose fields the LLM must produce
+        exclude: Fields computed locally rather than generated (e.g. overall_score)
+        overrides: Per-field schemas that are tighter than the annotation (enums, fixed keys)
+
+    Returns:
+        JSON Schema dict titled with the class name
+    """
+    overrides = overrides or {}
+    hints = typing.get_type_hints(cls)
+    properties = {
+        f.name: overrides.get(f.name, _type_json_schema(hints[f.name]))
+        for f in dataclasses.fields(cls)
+        if f.name not in exclude
+    }
+    return {
+        "title": cls.__name__,
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False
+    }
+
+
+@lru_cache(maxsize=None)
+def extract_response_schema() -> Dict[str, Any]:
+    """Schema of an EXTRACT response (an ArticleCard)."""
+    return dataclass_json_schema(ArticleCard)
+
+
+def score_response_schema(criteria: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Schema of a SCORE response; overall_score is computed locally from the criterion weights."""
+    criterion_schema = {
+        "type": "object",
+        "properties": {"score": {"type": "integer", "minimum": 1, "maximum": 10}, "justification": {"type": "string"}},
+        "required": ["score", "justification"],
+        "additionalProperties": False
+    }
+    scores_schema = {
+        "type": "object",
+        "properties": {name: criterion_schema for name in criteria},
+        "required": list(criteria),
+        "additionalProperties": False
+    }
+    return dataclass_json_schema(ArticleScore, exclude=("overall_score",), overrides={"scores": scores_schema})
+
+
+@lru_cache(maxsize=None)
+def pairwise_response_schema() -> Dict[str, Any]:
+    """Schema of a pairwise comparison; the article IDs are filled in locally."""
+    return dataclass_json_schema(
+        PairwiseResult,
+        exclude=("article_a_id", "article_b_id"),
+        overrides={
+            "winner": {"type": "string", "enum": ["A", "B", "TIE"]},
+            "confidence": {"type": "string", "enum": ["high", "medium", "low"]}
+        }
+    )
+
+
+@lru_cache(maxsize=None)
+def select_response_schema() -> Dict[str, Any]:
+    """Schema of a SELECT response: the blueprint plus its confidence block, as the prompt asks."""
+    blueprint = dataclass_json_schema(SynthesisBlueprint, exclude=("confidence",))
+    confidence = {
+        "type": "object",
+        "properties": {
+            "level": {"type": "string", "enum": ["high", "medium", "low"]},
+            "concerns": {"type": "array", "items": {"type": "string"}}
+        },
+        "required": ["level", "concerns"],
+        "additionalProperties": False
+    }
+    return {
+        "title": "SynthesisBlueprintResponse",
+        "type": "object",
+        "properties": {"synthesis_blueprint": blueprint, "confidence": confidence},
+        "required": ["synthesis_blueprint", "confidence"],
+        "additionalProperties": False
+    }
+
+
+@lru_cache(maxsize=None)
+def validate_response_schema() -> Dict[str, Any]:
+    """Schema of a VALIDATE response (a ValidationResult)."""
+    # The prompt asks for a float "overall" next to the integer criterion scores
+    return dataclass_json_schema(
+        ValidationResult,
+        overrides={"quality_scores": {
+            "type": "object",
+            "properties": {"overall": {"type": "number"}},
+            "required": ["overall"],
+            "additionalProperties": {"type": "number"}
+        }}
+    )
+
+
+def structured_output_params(preset_name: Optional[str], schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Return the extra chat completion parameters that constrain a preset's output to a schema.
+
+    The preset (or its provider) opts in with `structured_output` in models.yaml:
+    `json_schema` sends an OpenAI-style response_format (OpenAI, recent vLLM),
+    `guided_json` sends vLLM's guided_json extra body, and `json_object` only
+    forces syntactically valid JSON. Presets without the flag get no extra parameters.
+    """
+    mode = llm_client_registry.capability(preset_name, "structured_output")
+    if schema is None or mode not in STRUCTURED_OUTPUT_MODES:
+        return {}
+    if mode == "guided_json":
+        return {"extra_body": {"guided_json": schema}}
+    if mode == "json_object":
+        return {"response_format": {"type": "json_object"}}
+    return {
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": schema.get("title", "response"), "schema": schema, "strict": False}
+        }
+    }
+
+
+def _drop_rejected_structured_output(request: LLMRequest, error: Exception) -> bool:
+    """Strip schema parameters from a request the server refused as a bad request.
+
+    The preset is marked as not supporting structured output for the rest of
+    the run. Returns True when the request should simply be resent.
+    """
+    if not (isinstance(error, APIStatusError) and error.status_code in (400, 422)):
+        return False
+    if "response_format" not in request.api_params and "guided_json" not in request.api_params.get("extra_body", {}):
+        return False
+    remove_api_params(request.api_params, {"response_format": None, "extra_body": {"guided_json": None}})
+    if request.preset is not None:
+        llm_client_registry.disable_capability(request.preset, "structured_output")
+    print(f"⚠ {request.label} rejected structured output ({error.status_code}); using free-form JSON instead")
+    return True
+
+
+# ============================================================================
+# REASONING CONTROLS
+# Purpose: Per-preset, per-stage thinking settings from models.yaml, so JSON
+# stages can run thinking-free while synthesis keeps its reasoning
+# ============================================================================
+
+REASONING_STYLES = ("chat_template", "openai", "openrouter", "anthropic")
+
+
+def reasoning_settings(preset_name: Optional[str], stage: Optional[str]) -> Dict[str, Any]:
+    """Return a preset's `reasoning` settings from models.yaml with the stage's overrides applied."""
+    config = llm_client_registry.capability(preset_name, "reasoning") or {}
+    settings = {key: value for key, value in config.items() if key != "stages"}
+    if stage is not None:
+        settings.update((config.get("stages") or {}).get(stage) or {})
+    return settings
+
+
+def reasoning_params(preset_name: Optional[str], stage: Optional[str]) -> Dict[str, Any]:
+    """
+    Return the chat completion parameters that apply a preset's reasoning settings to a stage.
+
+    Settings (on the preset or its provider, overridable per stage under `stages`):
+    `enabled: false` turns thinking off, `budget_tokens` caps thinking tokens,
+    `effort` sets the reasoning effort and `extra_body` is sent as-is. `style`
+    picks how they are expressed: `chat_template` (vLLM/SGLang
+    chat_template_kwargs, the default), `openai` (reasoning_effort),
+    `openrouter` (the `reasoning` object) or `anthropic` (the `thinking` block).
+    Settings a style cannot express are ignored.
+    """
+    settings = reasoning_settings(preset_name, stage)
+    if not settings:
+        return {}
+    style = settings.get("style", "chat_template")
+    if style not in REASONING_STYLES:
+        raise ValueError(
+            f"Unknown reasoning style '{style}' for preset '{preset_name}' (expected one of {', '.join(REASONING_STYLES)})"
+        )
+    enabled = settings.get("enabled", True)
+    budget = settings.get("budget_tokens")
+    effort = settings.get("effort")
+    params: Dict[str, Any] = {}
+    extra_body: Dict[str, Any] = {}
+    if style == "chat_template":
+        template_kwargs: Dict[str, Any] = {}
+        if "enabled" in settings:
+            template_kwargs["enable_thinking"] = bool(enabled)
+        if enabled and budget:
+            template_kwargs["thinking_budget"] = budget  # Honoured by templates that accept a budget
+        if template_kwargs:
+            extra_body["chat_template_kwargs"] = template_kwargs
+        if enabled and effort:
+            params["reasoning_effort"] = effort
+    elif style == "openai":
+        if not enabled:
+            params["reasoning_effort"] = "minimal"
+        elif effort:
+            params["reasoning_effort"] = effort
+    elif style == "openrouter":
+        if not enabled:
+            extra_body["reasoning"] = {"enabled": False}
+        elif effort or budget:
+            extra_body["reasoning"] = {"effort": effort} if effort else {"max_tokens": budget}
+    elif style == "anthropic":
+        if not enabled:
+            extra_body["thinking"] = {"type": "disabled"}
+        elif budget:
+            extra_body["thinking"] = {"type": "enabled", "budget_tokens": budget}
+    extra_body.update(settings.get("extra_body") or {})
+    if extra_body:
+        params["extra_body"] = extra_body
+    return params
+
+
+def merge_api_params(api_params: Dict[str, Any], extra: Dict[str, Any]) -> None:
+    """Add extra request parameters in place, merging `extra_body` instead of replacing it."""
+    for key, value in extra.items():
+        if key == "extra_body":
+            api_params["extra_body"] = {**api_params.get("extra_body", {}), **value}
+        else:
+            api_params[key] = value
+
+
+def remove_api_params(api_params: Dict[str, Any], extra: Dict[str, Any]) -> None:
+    """Undo merge_api_params for the given parameters, dropping `extra_body` once it is empty."""
+    for key in extra:
+        if key != "extra_body":
+            api_params.pop(key, None)
+    extra_body = api_params.get("extra_body")
+    if extra_body is not None:
+        for key in extra.get("extra_body", {}):
+            extra_body.pop(key, None)
+        if not extra_body:
+            api_params.pop("extra_body")
+
+
+# ============================================================================
+# SINGLE-FLIGHT COALESCING
+# Purpose: Let concurrent identical requests (e.g. the zero-temperature votes
+# for one card) share one upstream call within a run
+# ============================================================================
+
+DEFAULT_COALESCE_STAGES = ("EXTRACT", "SCORE")  # Same stages as the response cache; SELECT/VALIDATE sample without a seed
+
+
+class _LeaderCancelled(Exception):
+    """Set on a shared call whose leader was cancelled, so a waiting follower takes over."""
+
+
+class SingleFlight:
+    """Coalesces in-flight requests that share a cache key onto one upstream call.
+
+    The first caller (the leader) makes the call; callers that arrive while
+    it is in flight wait for its result, or its error, instead of sending
+    their own. If the leader is cancelled (it lost a hedge race or its run
+    stopped early) the followers do not inherit that: the first one to wake
+    up becomes the new leader and the rest follow it. Nothing is kept once
+    the call finishes; the persistent response cache is separate.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self.stages: set = set(DEFAULT_COALESCE_STAGES)
+
+    def configure(self, stages: List[str]) -> None:
+        """Set the stages whose requests are coalesced (empty disables coalescing)."""
+        self.stages = {stage.upper() for stage in stages}
+
+    def key_for(self, request: LLMRequest) -> Optional[str]:
+        """Return the coalescing key of a request, or None when it must run on its own."""
+        if request.stage not in self.stages or request.api_params.get("n", 1) > 1:
+            return None
+        return make_cache_key(request.base_url, _cache_params(request))
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        """Return (shared future, is_leader) for a key."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            return future, True
+
+    def _finish(self, key: str, future: Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def run(self, request: LLMRequest, call: Callable[[], List[str]]) -> List[str]:
+        """Run `call` for a request, or wait for the identical request already in flight."""
+        key = self.key_for(request)
+        if key is None:
+            return call()
+        future, leader = self._join(key)
+        while not leader:
+            try:
+                result = list(future.result())
+            except _LeaderCancelled:
+                future, leader = self._join(key)
+                continue
+            track_coalesced_request(request.stage)
+            llm_response_source.set("coalesced")
+            return result
+        try:
+            result = call()
+        except (HedgeCancelledError, asyncio.CancelledError):
+            self._finish(key, future, error=_LeaderCancelled())
+            raise
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def run_async(self, request: LLMRequest, call: Callable[[], Any]) -> List[str]:
+        """Async counterpart of run(); `call` returns the coroutine to await."""
+        key = self.key_for(request)
+        if key is None:
+            return await call()
+        future, leader = self._join(key)
+        while not leader:
+            try:
+                # Shielded so a cancelled follower does not cancel the shared call
+                result = list(await asyncio.shield(asyncio.wrap_future(future)))
+            except _LeaderCancelled:
+                future, leader = self._join(key)
+                continue
+            track_coalesced_request(request.stage)
+            llm_response_source.set("coalesced")
+            return result
+        try:
+            result = await call()
+        except (HedgeCancelledError, asyncio.CancelledError):
+            self._finish(key, future, error=_LeaderCancelled())
+            raise
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+
+# Shared by all stages and both engines
+llm_single_flight = SingleFlight()
+
+# Where the current thread's (or asyncio task's) latest response came from:
+# "api", "cache" or "coalesced". track_llm_call() counts only "api" responses.
+llm_response_source: contextvars.ContextVar[str] = contextvars.ContextVar("llm_response_source", default="api")
+
+
+def _complete_chat(
+    request: LLMRequest,
+    retry_count: int,
+    retry_delay: float,
+    verbose: bool
+) -> str:
+    """Run a chat completion on a pooled client with retries and response caching."""
+    return (_complete_chat_choices(request, retry_count, retry_delay, verbose))[0]
+
+
+def _complete_chat_choices(
+    request: LLMRequest,
+    retry_count: int,
+    retry_delay: float,
+    verbose: bool
+) -> List[str]:
+    """Run a chat completion and return every usable choice (one unless api_params sets n).
+
+    Retries, hedging and caching behave exactly as in _complete_chat. A
+    response truncated under an auto max_tokens budget is resent with a
+    larger budget without using up a retry. Identical requests already in
+    flight are joined instead of sent again.
+    """
+    llm_response_source.set("api")
+    cache_key, cached = _lookup_cached_response(request.base_url, _cache_params(request), request.stage)
+    if cached is not None:
+        llm_response_source.set("cache")
+        return [cached]
+    return llm_single_flight.run(
+        request, lambda: _request_choices(request, cache_key, retry_count, retry_delay, verbose)
+    )
+
+
+def _request_choices(
+    request: LLMRequest,
+    cache_key: Optional[str],
+    retry_count: int,
+    retry_delay: float,
+    verbose: bool
+) -> List[str]:
+    """Send a request upstream with retries and store the first choice in the response cache."""
+    llm_retry_policy.record_call()
+
+    attempt = 0
+    while True:
+        try:
+            response = _run_hedged(request)
+            if _grow_truncated_budget(request, response):
+                continue
+            contents = _checked_choices(request, response)
+            _store_cached_response(cache_key, contents[0], request.stage, request.api_params["model"])
+            return contents
+
+        except Exception as e:
+            if _drop_rejected_structured_output(request, e):
+                continue
+            if verbose:
+                print(f"API call attempt {attempt + 1} failed ({classify_llm_error(e)}): {e}")
+            delay = llm_retry_policy.next_delay(e, attempt, retry_count, retry_delay)
+            if delay is None:
+                raise RuntimeError(
+                    f"Failed to get response from LLM after {attempt + 1} attempts. Last error: {e}"
+                ) from e
+            if verbose:
+                print(f"Retrying in {delay:.1f} seconds...")
+            time.sleep(delay)
+            attempt += 1
+
+
+async def _complete_chat_async(
+    request: LLMRequest,
+    retry_count: int,
+    retry_delay: float,
+    verbose: bool
+) -> str:
+    """Async counterpart of _complete_chat running on the current event loop."""
+    return (await _complete_chat_choices_async(request, retry_count, retry_delay, verbose))[0]
+
+
+async def _complete_chat_choices_async(
+    request: LLMRequest,
+    retry_count: int,
+    retry_delay: float,
+    verbose: bool
+) -> List[str]:
+    """Async counterpart of _complete_chat_choices."""
+    llm_response_source.set("api")
+    cache_key, cached = _lookup_cached_response(request.base_url, _cache_params(request), request.stage)
+    if cached is not None:
+        llm_response_source.set("cache")
+        return [cached]
+    return await llm_single_flight.run_async(
+        request, lambda: _request_choices_async(request, cache_key, retry_count, retry_delay, verbose)
+    )
+
+
+async def _request_choices_async(
+    request: LLMRequest,
+    cache_key: Optional[str],
+    retry_count: int,
+    retry_delay: float,
+    verbose: bool
+) -> List[str]:
+    """Async counterpart of _request_choices."""
+    llm_retry_policy.record_call()
+
+    attempt = 0
+    while True:
+        try:
+            response = await _run_hedged_async(request)
+            if _grow_truncated_budget(request, response):
+                continue
+            contents = _checked_choices(request, response)
+            _store_cached_response(cache_key, contents[0], request.stage, request.api_params["model"])
+            return contents
+
+        except Exception as e:
+            if _drop_rejected_structured_output(request, e):
+                continue
+            if verbose:
+                print(f"API call attempt {attempt + 1} failed ({classify_llm_error(e)}): {e}")
+            delay = llm_retry_policy.next_delay(e, attempt, retry_count, retry_delay)
+            if delay is None:
+                raise RuntimeError(
+                    f"Failed to get response from LLM after {attempt + 1} attempts. Last error: {e}"
+                ) from e
+            if verbose:
+                print(f"Retrying in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+# ============================================================================
+# PIPELINE MODEL SELECTION
+# Purpose: Say which preset each pipeline stage calls with an explicit,
+# immutable object instead of process-wide environment variables, so
+# pipelines (and stages) with different presets can run side by side
+# ============================================================================
+
+PIPELINE_STAGES = ("CONTEXT", "EXTRACT", "SCORE", "SELECT", "SYNTHESIZE", "VALIDATE")
+
+
+@dataclass(frozen=True)
+class PipelineModels:
+    """Presets used by the pipeline stages.
+
+    Stages without an override use `default_preset`. A None default means the
+    plain .env configuration (OPENAI_API_BASE / OPENAI_MODEL_NAME). Pairwise
+    comparisons are SCORE calls.
+    """
+    default_preset: Optional[str] = None
+    stage_presets: Tuple[Tuple[str, str], ...] = ()  # (stage, preset) overrides
+
+    @classmethod
+    def from_overrides(cls, default_preset: Optional[str], overrides: Dict[str, str]) -> "PipelineModels":
+        """Build from a default preset and a {stage: preset} mapping."""
+        return cls(default_preset=default_preset, stage_presets=tuple(sorted(overrides.items())))
+
+    def preset_for(self, stage: Optional[str]) -> Optional[str]:
+        """Return the preset a stage calls (None for the .env configuration)."""
+        for override_stage, preset in self.stage_presets:
+            if override_stage == stage:
+                return preset
+        return self.default_preset
+
+    def presets(self) -> List[str]:
+        """Return every named preset, for up-front validation."""
+        names = [self.default_preset] if self.default_preset else []
+        return names + [preset for _, preset in self.stage_presets if preset not in names]
+
+
+def parse_stage_presets(spec: str) -> Dict[str, str]:
+    """Parse --stage-presets "EXTRACT=local-qwen,SYNTHESIZE=or-sonnet-45" into {stage: preset}."""
+    overrides: Dict[str, str] = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        stage, separator, preset = item.partition("=")
+        stage = stage.strip().upper()
+        if not separator or not preset.strip():
+            raise ValueError(f"Invalid stage preset '{item.strip()}' (expected STAGE=preset)")
+        if stage not in PIPELINE_STAGES:
+            raise ValueError(f"Unknown stage '{stage}' in stage presets (expected one of {', '.join(PIPELINE_STAGES)})")
+        overrides[stage] = preset.strip()
+    return overrides
+
+
+def _resolve_stage_model(
+    models: Optional[PipelineModels],
+    stage: Optional[str]
+) -> Tuple[Optional[str], Tuple[str, str, str]]:
+    """Return (preset, (base_url, api_key, model_name)) for a stage call.
+
+    Without a PipelineModels the pipeline preset configured by
+    load_environment() is used.
+    """
+    if models is None:
+        return _get_environment_preset(), _get_environment_model()
+    preset_name = models.preset_for(stage)
+    if preset_name is None:
+        return None, _get_environment_model()
+    return preset_name, llm_client_registry.resolve_preset(preset_name)
+
+
+def _fall_back(chain: List[str], index: int, error: RuntimeError, verbose: bool) -> None:
+    """Move on from chain[index] after it failed, or re-raise the error if it was the last preset."""
+    if index == len(chain) - 1:
+        raise error
+    if verbose:
+        print(f"Preset '{chain[index]}' failed ({error}); falling back to '{chain[index + 1]}'")
+    track_preset_fallback(chain[index], chain[index + 1])
+
+
+def _complete_with_fallbacks(
+    preset_name: str,
+    build_request: Callable[[str], LLMRequest],
+    complete: Callable[[LLMRequest], Any],
+    verbose: bool = False,
+    use_fallbacks: bool = True
+) -> Any:
+    """Complete a request on a preset, moving on to its `fallbacks` while they keep failing.
+
+    Args:
+        preset_name: Preset to try first
+        build_request: Builds the request for a preset of the fallback chain
+        complete: Sends a request and returns its result, raising RuntimeError once retries are exhausted
+        verbose: Print each fallback (default False)
+        use_fallbacks: False to stay on preset_name and raise its error (default True)
+
+    Returns:
+        The result of the first preset that succeeds
+    """
+    chain = llm_client_registry.fallback_chain(preset_name) if use_fallbacks else [preset_name]
+    for index, current_preset in enumerate(chain):
+        try:
+            return complete(build_request(current_preset))
+        except RuntimeError as e:
+            _fall_back(chain, index, e, verbose)
+    raise RuntimeError("Preset fallback chain exhausted unexpectedly")
+
+
+async def _complete_with_fallbacks_async(
+    preset_name: str,
+    build_request: Callable[[str], LLMRequest],
+    complete: Callable[[LLMRequest], Any],
+    verbose: bool = False,
+    use_fallbacks: bool = True
+) -> Any:
+    """Async version of _complete_with_fallbacks; `complete` returns an awaitable."""
+    chain = llm_client_registry.fallback_chain(preset_name) if use_fallbacks else [preset_name]
+    for index, current_preset in enumerate(chain):
+        try:
+            return await complete(build_request(current_preset))
+        except RuntimeError as e:
+            _fall_back(chain, index, e, verbose)
+    raise RuntimeError("Preset fallback chain exhausted unexpectedly")
+
+
+def send_to_llm(
+    llm_user_prompt: str,
+    llm_system_prompt: Optional[str] = None,
+    temperature: float = 0.7,
+    max_tokens: int = 4000,
+    retry_count: int = 3,
+    retry_delay: float = 1.0,
+    verbose: bool = False,
+    seed: Optional[int] = None,
+    stage: Optional[str] = None,
+    response_check: Optional[Callable[[str], Any]] = None,
+    stream_name: Optional[str] = None,
+    response_schema: Optional[Dict[str, Any]] = None,
+    models: Optional[PipelineModels] = None,
+    output_kind: Optional[str] = None
+) -> str:
+    """
+    Send prompt to the local OpenAI compliant API endpoint.
+
+    If the stage's preset keeps failing (or its endpoints' circuit breakers
+    are open), the call moves on to the preset's `fallbacks` from models.yaml
+    in order.
+
+    Args:
+        llm_user_prompt: User prompt/instruction
+        llm_system_prompt: System prompt (uses built-in prompt if None)
+        temperature: Sampling temperature (default 0.7)
+        max_tokens: Maximum tokens to generate (default 4000)
+        retry_count: Maximum attempts, including retries of unparseable responses (default 3)
+        retry_delay: Base delay for exponential backoff in seconds (default 1.0)
+        verbose: Enable verbose logging (default False)
+        seed: Optional seed for reproducible outputs (default None)
+        stage: Pipeline stage name, used to decide response caching (default None)
+        response_check: Optional parser that must accept a response; rejected responses are retried and never cached
+        stream_name: File name for teeing streamed tokens to disk (default None)
+        response_schema: JSON Schema the reply must follow, enforced for presets with `structured_output` (default None)
+        models: Presets per stage; None uses the pipeline preset set by load_environment() (default None)
+        output_kind: Output-length histogram to use instead of the stage's, for calls with much shorter replies (default None)
+
+    Returns:
+        The LLM response content as a string
+    """
+    preset_name, model = _resolve_stage_model(models, stage)
+    messages = _build_chat_messages(llm_user_prompt, llm_system_prompt)
+    if preset_name is None:
+        request = _build_stage_request(
+            None, model, messages, temperature, max_tokens, seed, stage, response_check, stream_name, response_schema,
+            output_kind
+        )
+        return _complete_chat(request, retry_count, retry_delay, verbose)
+
+    def build_request(current_preset: str) -> LLMRequest:
+        return _build_stage_request(
+            current_preset, model if current_preset == preset_name else llm_client_registry.resolve_preset(current_preset),
+            messages, temperature, max_tokens, seed, stage, response_check, stream_name, response_schema,
+            output_kind
+        )
+
+    return _complete_with_fallbacks(
+        preset_name, build_request, lambda request: _complete_chat(request, retry_count, retry_delay, verbose), verbose
+    )
+
+
+def _build_stage_request(
+    preset_name: Optional[str],
+    model: Tuple[str, str, str],
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    max_tokens: int,
+    seed: Optional[int],
+    stage: Optional[str],
+    response_check: Optional[Callable[[str], Any]],
+    stream_name: Optional[str],
+    response_schema: Optional[Dict[str, Any]],
+    output_kind: Optional[str] = None
+) -> LLMRequest:
+    """Build a pipeline stage request for one preset (or the environment model when preset_name is None)."""
+    base_url, api_key, model_name = model
+    api_params = _build_api_params(model_name, messages, temperature, max_tokens, seed)
+    merge_api_params(api_params, structured_output_params(preset_name, response_schema))
+    merge_api_params(api_params, reasoning_params(preset_name, stage))
+    request = LLMRequest(
+        base_url=base_url,
+        api_key=api_key,
+        api_params=api_params,
+        stage=stage,
+        label=preset_name or model_name,
+        stream_name=stream_name,
+        response_check=response_check,
+        preset=preset_name,
+        output_kind=output_kind
+    )
+    output_length_stats.apply(request)
+    return request
+
+
+def _build_preset_request(
+    preset_name: str,
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    max_tokens: int,
+    seed: Optional[int],
+    stage: Optional[str],
+    response_check: Optional[Callable[[str], Any]],
+    stream_name: Optional[str],
+    n: int = 1
+) -> LLMRequest:
+    """Build the request for a preset (resolved once per process)."""
+    base_url, api_key, model_name = llm_client_registry.resolve_preset(preset_name)
+    api_params = _build_api_params(model_name, messages, temperature, max_tokens, seed)
+    if n > 1:
+        api_params["n"] = n
+    merge_api_params(api_params, reasoning_params(preset_name, stage))
+    request = LLMRequest(
+        base_url=base_url,
+        api_key=api_key,
+        api_params=api_params,
+        stage=stage,
+        label=preset_name,
+        stream_name=stream_name,
+        response_check=response_check,
+        preset=preset_name
+    )
+    output_length_stats.apply(request)
+    return request
+
+
+def send_to_llm_with_preset(
+    preset_name: str,
+    llm_user_prompt: str,
+    llm_system_prompt: Optional[str] = None,
+    temperature: float = 0.7,
+    max_tokens: int = 4000,
+    retry_count: int = 3,
+    retry_delay: float = 1.0,
+    verbose: bool = False,
+    seed: Optional[int] = None,
+    stage: Optional[str] = None,
+    response_check: Optional[Callable[[str], Any]] = None,
+    stream_name: Optional[str] = None
+) -> str:
+    """
+    Send prompt to a specific model preset without modifying global environment.
+
+    If the preset keeps failing (or its endpoints' circuit breakers are open),
+    the call moves on to the preset's `fallbacks` from models.yaml in order.
+
+    Args:
+        preset_name: Name of the preset to use (from models.yaml)
+        llm_user_prompt: User prompt/instruction
+        llm_system_prompt: System prompt (uses built-in prompt if None)
+        temperature: Sampling temperature (default 0.7)
+        max_tokens: Maximum tokens to generate (default 4000)
+        retry_count: Maximum attempts, including retries of unparseable responses (default 3)
+        retry_delay: Base delay for exponential backoff in seconds (default 1.0)
+        verbose: Enable verbose logging (default False)
+        seed: Optional seed for reproducible outputs (default None)
+        stage: Pipeline stage name, used to decide response caching (default None)
+        response_check: Optional parser that must accept a response; rejected responses are retried and never cached
+        stream_name: File name for teeing streamed tokens to disk (default None)
+
+    Returns:
+        The LLM response content as a string
+    """
+    return (send_to_llm_with_preset_choices(
+        preset_name, llm_user_prompt, llm_system_prompt, temperature, max_tokens, retry_count,
+        retry_delay, verbose, seed, stage, response_check, stream_name
+    ))[0]
+
+
+def send_to_llm_with_preset_choices(
+    preset_name: str,
+    llm_user_prompt: str,
+    llm_system_prompt: Optional[str] = None,
+    temperature: float = 0.7,
+    max_tokens: int = 4000,
+    retry_count: int = 3,
+    retry_delay: float = 1.0,
+    verbose: bool = False,
+    seed: Optional[int] = None,
+    stage: Optional[str] = None,
+    response_check: Optional[Callable[[str], Any]] = None,
+    stream_name: Optional[str] = None,
+    n: int = 1
+) -> List[str]:
+    """
+    Send one prompt to a preset asking for `n` sampled choices in a single request.
+
+    Providers that ignore `n` return fewer choices than asked for; callers
+    should top up with separate requests. Multi-choice requests are not
+    streamed or cached, and they do not move on to the preset's `fallbacks`:
+    a rejection of `n` is raised so the caller can retry with single requests
+    on the same preset.
+
+    Args:
+        n: Number of choices to request (default 1); other arguments as in send_to_llm_with_preset
+
+    Returns:
+        The usable choice contents, in choice order (at least one, at most n)
+    """
+    messages = _build_chat_messages(llm_user_prompt, llm_system_prompt)
+    return _complete_with_fallbacks(
+        preset_name,
+        lambda current_preset: _build_preset_request(
+            current_preset, messages, temperature, max_tokens, seed, stage, response_check, stream_name, n
+        ),
+        lambda request: _complete_chat_choices(request, retry_count, retry_delay, verbose),
+        verbose,
+        use_fallbacks=n == 1
+    )
+
+
+async def send_to_llm_async(
+    llm_user_prompt: str,
+    llm_system_prompt: Optional[str] = None,
+    temperature: float = 0.7,
+    max_tokens: int = 4000,
+    retry_count: int = 3,
+    retry_delay: float = 1.0,
+    verbose: bool = False,
+    seed: Optional[int] = None,
+    stage: Optional[str] = None,
+    response_check: Optional[Callable[[str], Any]] = None,
+    stream_name: Optional[str] = None,
+    response_schema: Optional[Dict[str, Any]] = None,
+    models: Optional[PipelineModels] = None,
+    output_kind: Optional[str] = None
+) -> str:
+    """Async version of send_to_llm using a pooled AsyncOpenAI client."""
+    preset_name, model = _resolve_stage_model(models, stage)
+    messages = _build_chat_messages(llm_user_prompt, llm_system_prompt)
+    if preset_name is None:
+        request = _build_stage_request(
+            None, model, messages, temperature, max_tokens, seed, stage, response_check, stream_name, response_schema,
+            output_kind
+        )
+        return await _complete_chat_async(request, retry_count, retry_delay, verbose)
+
+    def build_request(current_preset: str) -> LLMRequest:
+        return _build_stage_request(
+            current_preset, model if current_preset == preset_name else llm_client_registry.resolve_preset(current_preset),
+            messages, temperature, max_tokens, seed, stage, response_check, stream_name, response_schema,
+            output_kind
+        )
+
+    return await _complete_with_fallbacks_async(
+        preset_name, build_request, lambda request: _complete_chat_async(request, retry_count, retry_delay, verbose), verbose
+    )
+
+
+async def send_to_llm_with_preset_async(
+    preset_name: str,
+    llm_user_prompt: str,
+    llm_system_prompt: Optional[str] = None,
+    temperature: float = 0.7,
+    max_tokens: int = 4000,
+    retry_count: int = 3,
+    retry_delay: float = 1.0,
+    verbose: bool = False,
+    seed: Optional[int] = None,
+    stage: Optional[str] = None,
+    response_check: Optional[Callable[[str], Any]] = None,
+    stream_name: Optional[str] = None
+) -> str:
+    """Async version of send_to_llm_with_preset using a pooled AsyncOpenAI client."""
+    return (await send_to_llm_with_preset_choices_async(
+        preset_name, llm_user_prompt, llm_system_prompt, temperature, max_tokens, retry_count,
+        retry_delay, verbose, seed, stage, response_check, stream_name
+    ))[0]
+
+
+async def send_to_llm_with_preset_choices_async(
+    preset_name: str,
+    llm_user_prompt: str,
+    llm_system_prompt: Optional[str] = None,
+    temperature: float = 0.7,
+    max_tokens: int = 4000,
+    retry_count: int = 3,
+    retry_delay: float = 1.0,
+    verbose: bool = False,
+    seed: Optional[int] = None,
+    stage: Optional[str] = None,
+    response_check: Optional[Callable[[str], Any]] = None,
+    stream_name: Optional[str] = None,
+    n: int = 1
+) -> List[str]:
+    """Async version of send_to_llm_with_preset_choices."""
+    messages = _build_chat_messages(llm_user_prompt, llm_system_prompt)
+    return await _complete_with_fallbacks_async(
+        preset_name,
+        lambda current_preset: _build_preset_request(
+            current_preset, messages, temperature, max_tokens, seed, stage, response_check, stream_name, n
+        ),
+        lambda request: _complete_chat_choices_async(request, retry_count, retry_delay, verbose),
+        verbose,
+        use_fallbacks=n == 1
+    )
+
+
+# ============================================================================
+# PROMPT LAYOUT
+# Purpose: Prefix-cache-friendly prompts - static content (system prompt,
+# criteria, schema) first in a fixed order, per-item data last, plus an
+# optional warm-up prefill before each fan-out
+# ============================================================================
+
+@dataclass
+class PromptLayoutConfig:
+    """How stage prompts are laid out. Disabled ("standard") by default."""
+    mode: str = "standard"  # "standard" or "prefix-cache"
+    warmup: bool = False  # Send one max_tokens=1 prefill per stage before fanning out
+
+    @property
+    def prefix_first(self) -> bool:
+        return self.mode == "prefix-cache"
+
+
+prompt_layout = PromptLayoutConfig()
+
+
+def _warmup_request(
+    kind: str,
+    criteria: Optional[Dict[str, Dict[str, Any]]],
+    models: Optional[PipelineModels] = None
+) -> Optional[LLMRequest]:
+    """Build the warm-up request for a fan-out's shared prefix, or None when warm-ups are off.
+
+    Args:
+        kind: "EXTRACT", "SCORE" or "PAIRWISE"
+        criteria: Scoring criteria (SCORE only)
+        models: Presets per stage (default: the environment's pipeline model)
+    """
+    if not (prompt_layout.prefix_first and prompt_layout.warmup):
+        return None
+    if kind == "EXTRACT":
+        system_prompt, user_prefix = read_reference_file("prompts/pipeline_stage2_extract_system.md"), EXTRACT_USER_PREFIX
+    elif kind == "SCORE":
+        system_prompt, user_prefix = read_reference_file("prompts/pipeline_stage3_score_system.md"), score_user_prefix(criteria)
+    else:
+        system_prompt, user_prefix = read_reference_file("prompts/pipeline_stage3_pairwise_system.md"), PAIRWISE_USER_PREFIX
+    stage = "EXTRACT" if kind == "EXTRACT" else "SCORE"
+    preset_name, (base_url, api_key, model_name) = _resolve_stage_model(models, stage)
+    messages = _build_chat_messages(user_prefix, system_prompt)
+    return LLMRequest(
+        base_url=base_url,
+        api_key=api_key,
+        api_params=_build_api_params(model_name, messages, 0.0, 1, None),
+        stage=stage,
+        label=preset_name or model_name,
+        preset=preset_name
+    )
+
+
+def warm_prefix_cache(
+    kind: str,
+    criteria: Optional[Dict[str, Dict[str, Any]]] = None,
+    verbose: bool = False,
+    models: Optional[PipelineModels] = None
+) -> None:
+    """Prefill the server's prefix cache with a stage's static prompt before fan-out (best effort)."""
+    request = _warmup_request(kind, criteria, models)
+    if request is None:
+        return
+    try:
+        _run_with_limits(request)
+        track_prefix_warmup(request.stage)
+    except Exception as e:
+        if verbose:
+            print(f"  ⚠ Prefix warm-up for {kind} failed: {e}")
+
+
+async def warm_prefix_cache_async(
+    kind: str,
+    criteria: Optional[Dict[str, Dict[str, Any]]] = None,
+    verbose: bool = False,
+    models: Optional[PipelineModels] = None
+) -> None:
+    """Async counterpart of warm_prefix_cache."""
+    request = _warmup_request(kind, criteria, models)
+    if request is None:
+        return
+    try:
+        await _run_with_limits_async(request)
+        track_prefix_warmup(request.stage)
+    except Exception as e:
+        if verbose:
+            print(f"  ⚠ Prefix warm-up for {kind} failed: {e}")
+
+
+# ============================================================================
+# TASK SCHEDULER
+# Purpose: One long-lived scheduler that owns the concurrency budget of every
+# stage, runs fine-grained tasks by priority and reports queue depth and
+# utilisation
+# ============================================================================
+
+# Lower numbers run first: work that finishes a run beats bulk generation
+STAGE_PRIORITIES = {
+    "VALIDATE": 0,
+    "SYNTHESIZE": 1,
+    "SELECT": 2,
+    "PAIRWISE": 3,
+    "SCORE": 3,
+    "EXTRACT": 4,
+    "CANDIDATES": 5,
+}
+
+
+class TaskScheduler:
+    """Process-wide priority scheduler shared by every fan-out.
+
+    Threaded fan-outs submit one task per LLM call (candidate, card×vote,
+    pair×criterion) to a single pool of long-lived workers instead of building
+    a ThreadPoolExecutor per stage; the async engine takes slots from the same
+    budget. Queued tasks start in priority order. A task submitted from one of
+    the scheduler's own workers runs inline on that worker, so a task that fans
+    out and waits cannot deadlock on slots it is itself holding.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._queue: List[Tuple[int, int, float, str, Future, Callable[..., Any], tuple, dict]] = []
+        self._async_waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = 0
+        self._workers: List[threading.Thread] = []
+        self._local = threading.local()
+        self._closed = False
+        self.capacity = 0
+        self._busy = 0
+        # Utilisation is measured only while tasks are queued or running
+        self._active_since: Optional[float] = None
+        self._capacity_seconds = 0.0
+        self._busy_seconds = 0.0
+        self.peak_queue_depth = 0
+        self._stage_stats: Dict[str, List[float]] = {}  # stage -> [tasks, total queue wait]
+
+    def ensure_capacity(self, slots: int) -> None:
+        """Grow the shared budget to at least `slots` concurrent tasks (it never shrinks)."""
+        with self._cond:
+            if slots <= self.capacity:
+                return
+            self._accrue_capacity(time.time())
+            self.capacity = slots
+            self._spawn_workers()
+            self._grant_async_slots()
+            self._cond.notify_all()
+
+    def _spawn_workers(self) -> None:
+        # Threads are only started once threaded work has been queued
+        if not self._queue:
+            return
+        while len(self._workers) < self.capacity:
+            worker = threading.Thread(
+                target=self._worker_loop, name=f"llm-worker-{len(self._workers) + 1}", daemon=True
+            )
+            self._workers.append(worker)
+            worker.start()
+
+    def _accrue_capacity(self, now: float) -> None:
+        if self._active_since is not None:
+            self._capacity_seconds += self.capacity * (now - self._active_since)
+            self._active_since = now
+
+    def _mark_active(self) -> None:
+        if self._active_since is None:
+            self._active_since = time.time()
+
+    def _mark_idle_if_done(self) -> None:
+        if self._busy == 0 and not self._queue and not self._async_waiters and self._active_since is not None:
+            self._accrue_capacity(time.time())
+            self._active_since = None
+
+    def _record_start(self, stage: str, queued_at: float) -> None:
+        stats = self._stage_stats.setdefault(stage, [0, 0.0])
+        stats[0] += 1
+        stats[1] += time.time() - queued_at
+
+    def _note_queue_depth(self) -> None:
+        self.peak_queue_depth = max(self.peak_queue_depth, len(self._queue) + len(self._async_waiters))
+
+    def submit(self, stage: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """
+        Queue fn(*args, **kwargs) on the shared worker pool.
+
+        Args:
+            stage: Pipeline stage of the task; sets its priority (see STAGE_PRIORITIES)
+            fn: Task to run
+
+        Returns:
+            A Future usable with concurrent.futures.as_completed
+        """
+        future: Future = Future()
+        if getattr(self._local, "is_worker", False):
+            # Nested fan-out: run on this worker instead of waiting for another slot
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+            return future
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Task scheduler is closed")
+            if self.capacity == 0:
+                self.capacity = 1
+            self._mark_active()
+            priority = STAGE_PRIORITIES.get(stage, len(STAGE_PRIORITIES))
+            heapq.heappush(self._queue, (priority, self._sequence, time.time(), stage, future, fn, args, kwargs))
+            self._sequence += 1
+            self._note_queue_depth()
+            self._spawn_workers()
+            self._cond.notify()
+        return future
+
+    def _worker_loop(self) -> None:
+        self._local.is_worker = True
+        while True:
+            with self._cond:
+                while not self._closed and (not self._queue or self._busy >= self.capacity):
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                _, _, queued_at, stage, future, fn, args, kwargs = heapq.heappop(self._queue)
+                self._busy += 1
+                self._record_start(stage, queued_at)
+            started = time.time()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+            with self._cond:
+                self._busy -= 1
+                self._busy_seconds += time.time() - started
+                self._grant_async_slots()
+                self._mark_idle_if_done()
+                self._cond.notify()
+
+    def _grant_async_slots(self) -> None:
+        """Hand free slots to waiting coroutines, highest priority first (lock held)."""
+        while self._async_waiters and self._busy < self.capacity:
+            _, _, waiter = heapq.heappop(self._async_waiters)
+            if waiter.done():
+                continue
+            self._busy += 1
+            try:
+                on_waiter_loop = asyncio.get_running_loop() is waiter.get_loop()
+            except RuntimeError:
+                on_waiter_loop = False
+            if on_waiter_loop:
+                waiter.set_result(None)  # Resolve now so a later cancel still sees the granted slot
+            else:
+                waiter.get_loop().call_soon_threadsafe(_resolve_waiter, waiter)
+
+    async def run_async(self, stage: str, coroutine: Any) -> Any:
+        """Await a coroutine once the shared budget has a free slot, highest priority first."""
+        queued_at = time.time()
+        waiter: Optional[asyncio.Future] = None
+        with self._cond:
+            if self.capacity == 0:
+                self.capacity = 1
+            self._mark_active()
+            if self._busy < self.capacity and not self._async_waiters:
+                self._busy += 1
+            else:
+                waiter = asyncio.get_running_loop().create_future()
+                priority = STAGE_PRIORITIES.get(stage, len(STAGE_PRIORITIES))
+                heapq.heappush(self._async_waiters, (priority, self._sequence, waiter))
+                self._sequence += 1
+                self._note_queue_depth()
+        if waiter is not None:
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                coroutine.close()
+                with self._cond:
+                    if waiter.done() and not waiter.cancelled():
+                        self._busy -= 1  # The slot was granted just before the cancel
+                        self._grant_async_slots()
+                    self._async_waiters = [entry for entry in self._async_waiters if entry[2] is not waiter]
+                    heapq.heapify(self._async_waiters)
+                    self._mark_idle_if_done()
+                raise
+        with self._cond:
+            self._record_start(stage, queued_at)
+        started = time.time()
+        try:
+            return await coroutine
+        finally:
+            with self._cond:
+                self._busy -= 1
+                self._busy_seconds += time.time() - started
+                self._grant_async_slots()
+                self._mark_idle_if_done()
+                self._cond.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return tasks, queue waits and utilisation for the metrics summary."""
+        with self._cond:
+            capacity_seconds = self._capacity_seconds
+            if self._active_since is not None:
+                capacity_seconds += self.capacity * (time.time() - self._active_since)
+            return {
+                "capacity": self.capacity,
+                "tasks": sum(int(tasks) for tasks, _ in self._stage_stats.values()),
+                "peak_queue_depth": self.peak_queue_depth,
+                "utilisation": self._busy_seconds / capacity_seconds if capacity_seconds > 0 else 0.0,
+                "stages": {
+                    stage: {"tasks": int(tasks), "mean_wait": wait / tasks if tasks else 0.0}
+                    for stage, (tasks, wait) in self._stage_stats.items()
+                }
+            }
+
+    def close(self) -> None:
+        """Let the workers finish queued tasks and exit."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+# Global scheduler instance
+llm_scheduler = TaskScheduler()
+
+
+# ============================================================================
+# STAGE CALLS
+# Purpose: Describe each stage's LLM call once (prompts, request settings and
+# reply parser) so the thread and asyncio engines only differ in transport
+# ============================================================================
+
+@dataclass
+class StageCall:
+    """One pipeline stage LLM call, sent with send() or send_async()."""
+    stage: str
+    system_prompt: str
+    user_prompt: str
+    parse: Callable[[str], Tuple[Any, str]]  # Reply -> (result, text recorded as the stage output)
+    settings: Dict[str, Any]  # Further send_to_llm arguments (sampling, schema, response check, retries)
+
+    def _arguments(self, verbose: bool, models: Optional[PipelineModels]) -> Dict[str, Any]:
+        return {
+            "llm_user_prompt": self.user_prompt,
+            "llm_system_prompt": self.system_prompt,
+            "stage": self.stage,
+            "verbose": verbose,
+            "models": models,
+            **self.settings
+        }
+
+    def _finish(self, response: str, execution_time: float) -> Any:
+        result, output_text = self.parse(response)
+        track_llm_call(self.stage, self.system_prompt + "\n\n" + self.user_prompt, output_text, execution_time)
+        return result
+
+    def send(self, verbose: bool = False, models: Optional[PipelineModels] = None) -> Any:
+        """Send the call, parse the reply and record the stage metrics."""
+        llm_start_time = time.time()
+        response = send_to_llm(**self._arguments(verbose, models))
+        return self._finish(response, time.time() - llm_start_time)
+
+    async def send_async(self, verbose: bool = False, models: Optional[PipelineModels] = None) -> Any:
+        """Async counterpart of send()."""
+        llm_start_time = time.time()
+        response = await send_to_llm_async(**self._arguments(verbose, models))
+        return self._finish(response, time.time() - llm_start_time)
+
+
+def print_stage_banner(title: str, detail: str) -> None:
+    """Print the verbose header of a pipeline stage."""
+    print(f"\n{'='*80}")
+    print(title)
+    print(f"{'='*80}")
+    print(detail)
+
+
+# ============================================================================
+# PIPELINE STAGE 2: EXTRACT
+# Purpose: Convert full articles into structured article cards
+# ============================================================================
+
+EXTRACT_USER_PREFIX = "Extract the article card for the article below.\n\n"
+
+
+def build_extract_prompts(article_content: str, article_id: int) -> Tuple[str, str]:
+    """Build the (system, user) prompts for extracting one article card."""
+    extract_system_prompt = read_reference_file("prompts/pipeline_stage2_extract_system.md")
+
+    if prompt_layout.prefix_first:
+        extract_user_prompt = EXTRACT_USER_PREFIX + f"""<article>
+{article_content}
+</article>
+
+This is Article #{article_id}. Respond with only the JSON object."""
+        return extract_system_prompt, extract_user_prompt
+
+    extract_user_prompt = f"""Extract the article card for Article #{article_id}.
+
+<article>
+{article_content}
+</article>
+
+Respond with only the JSON object."""
+
+    return extract_system_prompt, extract_user_prompt
+
+
+def parse_article_card(response: str) -> Tuple[ArticleCard, str]:
+    """
+    Parse an EXTRACT response into an ArticleCard.
+
+    Raises:
+        json.JSONDecodeError: If the response is not valid JSON
+        ValueError: If a required field is missing
+
+    Returns:
+        Tuple of (ArticleCard, extracted JSON string)
+    """
+    # Extract JSON from response in one pass (reasoning blocks are always stripped)
+    json_str = extract_json_from_response(response)
+
+    # Parse and validate JSON
+    card_data = json.loads(json_str)
+
+    # Validate required fields
+    required_fields = [
+        "article_id", "headline_candidates", "opening_hook",
+        "core_argument", "key_points", "memorable_phrases",
+        "structural_approach", "evidence_used", "tone",
+        "target_audience_signals", "weaknesses"
+    ]
+
+    for field in required_fields:
+        if field not in card_data:
+            raise ValueError(f"Missing required field: {field}")
+
+    return ArticleCard(**card_data), json_str
+
+
+def build_extract_call(article_content: str, article_id: int, retry_count: int = 3) -> StageCall:
+    """Build the EXTRACT call for one article (unparseable cards are retried by the shared retry policy)."""
+    extract_system_prompt, extract_user_prompt = build_extract_prompts(article_content, article_id)
+    return StageCall("EXTRACT", extract_system_prompt, extract_user_prompt, parse_article_card, {
+        "response_check": parse_article_card,
+        "response_schema": extract_response_schema(),
+        "temperature": 0.3,  # Low temp for consistent extraction
+        "max_tokens": 4000,
+        "retry_count": retry_count
+    })
+
+
+def extract_article_card(
+    article_content: str,
+    article_id: int,
+    verbose: bool = False,
+    retry_count: int = 3,
+    models: Optional[PipelineModels] = None
+) -> ArticleCard:
+    """
+    Extract structured card from a single article.
+
+    Args:
+        article_content: Full article text
+        article_id: Unique identifier for this article
+        verbose: Enable progress logging
+        retry_count: Maximum attempts for the extraction call (unparseable cards are retried)
+        models: Presets per stage (default: the environment's pipeline model)
+
+    Returns:
+        ArticleCard with structured data
+    """
+    card = build_extract_call(article_content, article_id, retry_count).send(verbose, models)
+
+    if verbose:
+        print(f"  ✓ Extracted card for Article #{article_id}")
+
+    return card
+
+
+def extract_all_article_cards(
+    candidates: List[ArticleCandidate],
+    verbose: bool = False,
+    models: Optional[PipelineModels] = None
+) -> List[ArticleCard]:
+    """
+    Extract article cards from all candidates.
+
+    Args:
+        candidates: List of generated article candidates
+        verbose: Enable progress logging
+        models: Presets per stage (default: the environment's pipeline model)
+
+    Returns:
+        List of ArticleCard objects
+    """
+    if verbose:
+        print(f"\n{'='*80}")
+        print("PIPELINE STAGE 2: EXTRACT")
+        print(f"{'='*80}")
+        print(f"Extracting structured cards from {len(candidates)} articles...")
+
+    cards = []
+    for candidate in candidates:
+        try:
+            card = extract_article_card(
+                article_content=candidate.content,
+                article_id=candidate.article_id,
+                verbose=verbose,
+                models=models
+            )
+            cards.append(card)
+        except Exception as e:
+            if verbose:
+                print(f"  ✗ Failed to extract Article #{candidate.article_id}: {e}")
+            # Continue with other cards rather than failing entire pipeline
+    
+    if verbose:
+        print(f"✓ Successfully extracted {len(cards)}/{len(candidates)} article cards\n")
+    
+    return cards
+
+
+# ============================================================================
+# PARALLEL EXTRACTION INFRASTRUCTURE
+# ============================================================================
+
+class ThreadSafeExtractionMetrics:
+    """Thread-safe metrics tracking for parallel extraction operations."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._extraction_metrics = StageMetrics("EXTRACT")
+        
+    def track_extraction_call_safe(self, input_text: str, output_text: str, execution_time: float):
+        """Thread-safe version of extraction metrics tracking."""
+        with self._lock:
+            self._extraction_metrics.add_input(input_text)
+            self._extraction_metrics.add_output(output_text)
+            self._extraction_metrics.add_execution_time(execution_time)
+            self._extraction_metrics.llm_calls += 1
+
+
+class ThreadSafeProgressTracker:
+    """Thread-safe progress tracking for parallel operations."""
+    
+    def __init__(self, total_items: int, stage_name: str, verbose: bool = False):
+        self.total = total_items
+        self.completed = 0
+        self.stage_name = stage_name
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        
+    def update_progress(self, item_id: int, status: str = "completed"):
+        """Thread-safe progress updates."""
+        with self.lock:
+            self.completed += 1
+            if self.verbose and self.completed % max(1, self.total // 10) == 0:
+                percentage = (self.completed / self.total) * 100
+                print(f"[{self.stage_name}] Progress: {self.completed}/{self.total} ({percentage:.1f}%) - {status}")
+
+
+class ThreadSafeErrorCollector:
+    """Thread-safe error collection for parallel operations."""
+    
+    def __init__(self):
+        self.errors = []
+        self.lock = threading.Lock()
+        
+    def add_error(self, item_id: int, error: Exception):
+        """Thread-safe error collection."""
+        with self.lock:
+            self.errors.append({
+                'item_id': item_id,
+                'error': str(error),
+                'timestamp': time.time()
+            })
             
+    def get_errors(self) -> List[Dict]:
+        """Get all collected errors."""
+        with self.lock:
+            return self.errors.copy()
+
+
+def extract_single_card_worker(
+    candidate: ArticleCandidate,
+    retry_count: int,
+    verbose: bool,
+    models: Optional[PipelineModels] = None
+) -> ArticleCard:
+    """
+    Worker function for parallel card extraction.
+
+    Args:
+        candidate: ArticleCandidate to extract
+        retry_count: Number of retry attempts for failed extractions
+        verbose: Enable progress logging
+        models: Presets per stage (default: the environment's pipeline model)
+
+    Returns:
+        ArticleCard object
+    """
+    try:
+        card = extract_article_card(
+            article_content=candidate.content,
+            article_id=candidate.article_id,
+            verbose=False,  # Reduce verbosity in workers
+            retry_count=retry_count,
+            models=models
+        )
+        return card
+    except Exception as e:
+        raise RuntimeError(f"Failed to extract Article #{candidate.article_id}: {e}")
+
+
+def extract_all_article_cards_parallel(
+    candidates: List[ArticleCandidate],
+    max_concurrent: int = 5,
+    verbose: bool = False,
+    retry_count: int = 3,
+    models: Optional[PipelineModels] = None
+) -> List[ArticleCard]:
+    """
+    Extract article cards from all candidates in parallel on the shared task scheduler.
+
+    Args:
+        candidates: List of generated article candidates
+        max_concurrent: Maximum concurrent LLM requests
+        verbose: Enable progress logging
+        retry_count: Number of retry attempts for failed extractions
+        models: Presets per stage (default: the environment's pipeline model)
+
+    Returns:
+        List of ArticleCard objects
+    """
+    if verbose:
+        print(f"\n{'='*80}")
+        print("PARALLEL EXTRACTION STAGE")
+        print(f"{'='*80}")
+        print(f"Extracting {len(candidates)} cards with max {max_concurrent} concurrent requests...")
+
+    progress_tracker = ThreadSafeProgressTracker(len(candidates), "EXTRACT", verbose)
+    error_collector = ThreadSafeErrorCollector()
+
+    def worker_extract_card(candidate: ArticleCandidate) -> ArticleCard:
+        """Worker function for parallel extraction."""
+        try:
+            card = extract_article_card(
+                article_content=candidate.content,
+                article_id=candidate.article_id,
+                verbose=False,  # Reduce verbosity in workers
+                retry_count=retry_count,
+                models=models
+            )
+            progress_tracker.update_progress(candidate.article_id, "extracted")
+            return card
+        except Exception as e:
+            error_collector.add_error(candidate.article_id, e)
+            progress_tracker.update_progress(candidate.article_id, f"failed: {e}")
+            raise  # Re-raise to be handled by the collecting loop
+    
+    # Execute parallel extraction
+    cards = []
+    warm_prefix_cache("EXTRACT", verbose=verbose, models=models)
+
+    llm_scheduler.ensure_capacity(adaptive_concurrency.worker_count(max_concurrent))
+    future_to_candidate = {
+        llm_scheduler.submit("EXTRACT", worker_extract_card, candidate): candidate.article_id
+        for candidate in candidates
+    }
+
+    for future in as_completed(future_to_candidate):
+        candidate_id = future_to_candidate[future]
+        try:
+            card = future.result()
+            cards.append(card)
+        except Exception as e:
             if verbose:
-                print(f"  ✓ Extracted card for Article #{article_id}")
-            
-            return card
-            
-        except (json.JSONDecodeError, ValueError) as e:
+                print(f"  ✗ Failed to extract Article #{candidate_id}: {e}")
+            # Continue with other cards
+
+    # Restore candidate order so downstream prompts are stable across runs
+    cards.sort(key=lambda c: c.article_id)
+    
+    # Report final statistics
+    if verbose:
+        successful = len(cards)
+        failed = len(error_collector.get_errors())
+        print(f"✓ Parallel extraction complete: {successful}/{len(candidates)} cards extracted")
+        if failed > 0:
+            print(f"  Failed extractions: {failed}")
+            for error in error_collector.get_errors()[:3]:  # Show first 3
+                print(f"    - Article #{error['item_id']}: {error['error']}")
+        print()
+    
+    return cards
+
+
+# ============================================================================
+# PIPELINE STAGE 3: SCORE
+# Purpose: Evaluate article cards on quality dimensions with voting
+# ============================================================================
+
+def score_user_prefix(criteria: Dict[str, Dict[str, Any]]) -> str:
+    """Static opening of the SCORE user prompt in the prefix-cache layout (shared by every card)."""
+    return f"""Score the following article card against the provided criteria.
+
+## Scoring Criteria
+{json.dumps(criteria, indent=2)}
+
+"""
+
+
+def build_score_prompts(card: ArticleCard, criteria: Dict[str, Dict[str, Any]]) -> Tuple[str, str]:
+    """Build the (system, user) prompts for scoring one article card."""
+    score_system_prompt = read_reference_file("prompts/pipeline_stage3_score_system.md")
+
+    if prompt_layout.prefix_first:
+        score_user_prompt = score_user_prefix(criteria) + f"""## Article Card
+{json.dumps(card.__dict__, indent=2)}
+
+Respond with only the JSON object containing scores and justifications."""
+        return score_system_prompt, score_user_prompt
+
+    score_user_prompt = f"""Score the following article card against the provided criteria.
+
+## Article Card
+{json.dumps(card.__dict__, indent=2)}
+
+## Scoring Criteria
+{json.dumps(criteria, indent=2)}
+
+Respond with only the JSON object containing scores and justifications."""
+
+    return score_system_prompt, score_user_prompt
+
+
+def parse_article_score(
+    response: str,
+    criteria: Dict[str, Dict[str, Any]]
+) -> Tuple[ArticleScore, str]:
+    """
+    Parse a SCORE response and compute the weighted overall score.
+
+    Returns:
+        Tuple of (ArticleScore, extracted JSON string)
+    """
+    # Extract JSON from response in one pass (reasoning blocks are always stripped)
+    json_str = extract_json_from_response(response)
+    
+    score_data = json.loads(json_str)
+    
+    # Calculate weighted overall score
+    total_score = 0.0
+    for criterion_name, criterion_info in criteria.items():
+        if criterion_name in score_data["scores"]:
+            score_value = score_data["scores"][criterion_name]["score"]
+            weight = criterion_info["weight"]
+            total_score += score_value * weight
+    
+    score_data["overall_score"] = round(total_score, 2)
+
+    return ArticleScore(**score_data), json_str
+
+
+def build_score_call(card: ArticleCard, criteria: Dict[str, Dict[str, Any]]) -> StageCall:
+    """Build the SCORE call for one vote on one card."""
+    score_system_prompt, score_user_prompt = build_score_prompts(card, criteria)
+    parse = lambda r: parse_article_score(r, criteria)
+    return StageCall("SCORE", score_system_prompt, score_user_prompt, parse, {
+        "response_check": parse,
+        "response_schema": score_response_schema(criteria),
+        "temperature": 0.0,  # Zero temp for maximum consistency
+        "max_tokens": 4000,
+        "seed": 42  # Fixed seed for reproducible scoring
+    })
+
+
+def score_article_card(
+    card: ArticleCard,
+    criteria: Dict[str, Dict[str, Any]],
+    verbose: bool = False,
+    models: Optional[PipelineModels] = None
+) -> ArticleScore:
+    """
+    Score a single article card on all criteria.
+
+    Args:
+        card: ArticleCard to evaluate
+        criteria: Scoring criteria dictionary
+        verbose: Enable progress logging
+        models: Presets per stage (default: the environment's pipeline model)
+
+    Returns:
+        ArticleScore with scores and justifications
+    """
+    return build_score_call(card, criteria).send(verbose, models)
+
+
+def average_score_votes(votes: List[ArticleScore], verbose: bool = False, use_outlier_detection: bool = True) -> ArticleScore:
+    """
+    Average multiple scoring votes for the same article with outlier detection.
+
+    Uses median-based outlier detection to discard votes that deviate significantly
+    from the consensus, improving score stability.
+
+    Args:
+        votes: List of ArticleScore objects from multiple votes
+        verbose: If True, print warnings for high-variance criteria
+        use_outlier_detection: If True, discard outliers >2 std from median before averaging
+
+    Returns:
+        Averaged ArticleScore with improved stability
+    """
+    if not votes:
+        raise ValueError("No votes to average")
+
+    # Use first vote as template
+    averaged = votes[0]
+
+    # Track variance warnings and outlier removals
+    high_variance_criteria = []
+    outliers_removed = []
+
+    # Average numeric scores for each criterion with outlier detection
+    for criterion_name in averaged.scores.keys():
+        criterion_scores = [
+            vote.scores[criterion_name]["score"]
+            for vote in votes
+            if criterion_name in vote.scores
+        ]
+
+        if len(criterion_scores) == 0:
+            continue
+
+        # Calculate median for robust central tendency
+        median_score = statistics.median(criterion_scores)
+
+        # Apply outlier detection if enabled and we have enough votes
+        filtered_scores = criterion_scores
+        if use_outlier_detection and len(criterion_scores) >= 3:
+            std_dev = statistics.stdev(criterion_scores)
+            if std_dev > 0:
+                # Remove scores that deviate >2 std from median
+                filtered_scores = [
+                    s for s in criterion_scores
+                    if abs(s - median_score) <= 2 * std_dev
+                ]
+                # Track if outliers were removed
+                if len(filtered_scores) < len(criterion_scores):
+                    removed = [s for s in criterion_scores if s not in filtered_scores]
+                    outliers_removed.append((criterion_name, removed, criterion_scores))
+                # Ensure we keep at least half the votes
+                if len(filtered_scores) < len(criterion_scores) // 2 + 1:
+                    filtered_scores = criterion_scores  # Revert if too many removed
+
+        # Calculate final score using mean of filtered scores
+        final_score = sum(filtered_scores) / len(filtered_scores)
+        averaged.scores[criterion_name]["score"] = round(final_score, 1)
+
+        # Store median for reference
+        averaged.scores[criterion_name]["median"] = round(median_score, 1)
+
+        # Calculate standard deviation to detect high variance (on original scores)
+        if len(criterion_scores) > 1:
+            std_dev = statistics.stdev(criterion_scores)
+            if std_dev > 1.5:
+                high_variance_criteria.append((criterion_name, std_dev, criterion_scores))
+
+    # Report outlier removals
+    if verbose and outliers_removed:
+        print(f"    INFO: Outliers removed for Article #{averaged.article_id}:")
+        for criterion, removed, original in outliers_removed:
+            print(f"      - {criterion}: removed {removed} from {original}")
+
+    # Report high variance criteria
+    if verbose and high_variance_criteria:
+        print(f"    WARNING: High scoring variance detected for Article #{averaged.article_id}:")
+        for criterion, std_dev, scores in high_variance_criteria:
+            print(f"      - {criterion}: std_dev={std_dev:.2f}, votes={scores}")
+
+    # Average overall score using median for robustness
+    overall_scores = [vote.overall_score for vote in votes]
+    averaged.overall_score = round(
+        sum(overall_scores) / len(overall_scores), 2
+    )
+    # Also store median overall score
+    averaged_median_overall = statistics.median(overall_scores)
+
+    # Merge strengths and weaknesses (unique items only)
+    all_strengths = set()
+    all_weaknesses = set()
+    for vote in votes:
+        all_strengths.update(vote.standout_strengths)
+        all_weaknesses.update(vote.critical_weaknesses)
+
+    averaged.standout_strengths = list(all_strengths)
+    averaged.critical_weaknesses = list(all_weaknesses)
+
+    return averaged
+
+
+def average_card_votes(card: ArticleCard, card_votes: List[ArticleScore], verbose: bool = False) -> Optional[ArticleScore]:
+    """Average the votes one card received in a parallel fan-out, or None if every vote failed."""
+    if not card_votes:
+        if verbose:
+            print(f"  ✗ Failed to score Card #{card.article_id}: all votes failed")
+        return None
+    score = average_score_votes(card_votes, verbose=verbose)
+    if verbose:
+        print(f"  ✓ Card #{card.article_id} scored: {score.overall_score}")
+    return score
+
+
+def score_all_cards_with_voting(
+    cards: List[ArticleCard],
+    criteria: Dict[str, Dict[str, Any]] = SCORING_CRITERIA,
+    votes: int = 3,
+    verbose: bool = False,
+    models: Optional[PipelineModels] = None
+) -> List[ArticleScore]:
+    """
+    Score all cards with voting to reduce variance.
+
+    Args:
+        cards: List of ArticleCards to score
+        criteria: Scoring criteria dictionary
+        votes: Number of voting rounds per card (default: 3)
+        verbose: Enable progress logging
+        models: Presets per stage (default: the environment's pipeline model)
+
+    Returns:
+        List of averaged ArticleScore objects
+    """
+    if verbose:
+        print(f"\n{'='*80}")
+        print("PIPELINE STAGE 3: SCORE")
+        print(f"{'='*80}")
+        print(f"Scoring {len(cards)} cards with {votes} votes each...")
+
+    all_scores = []
+
+    for card in cards:
+        if verbose:
+            print(f"  Scoring Article #{card.article_id}...")
+
+        # Collect multiple votes
+        card_votes = []
+        for vote_num in range(votes):
+            try:
+                score = score_article_card(card, criteria, verbose=False, models=models)
+                card_votes.append(score)
+                if verbose:
+                    print(f"    Vote {vote_num + 1}/{votes}: Overall score = {score.overall_score}")
+            except Exception as e:
+                if verbose:
+                    print(f"    ⚠ Vote {vote_num + 1} failed: {e}")
+        
+        # Average the votes
+        if card_votes:
+            averaged_score = average_score_votes(card_votes, verbose=verbose)
+            all_scores.append(averaged_score)
             if verbose:
-                print(f"  ⚠ Extraction attempt {attempt + 1} failed: {e}")
-            if attempt == retry_count - 1:
-                raise RuntimeError(f"Failed to extract valid card after {retry_count} attempts")
+                print(f"  ✓ Average score: {averaged_score.overall_score}\n")
+    
+    if verbose:
+        scores_list = [s.overall_score for s in all_scores]
+        print(f"✓ Scoring complete. Range: {min(scores_list):.1f} - {max(scores_list):.1f}\n")
+    
+    return all_scores
+
+
+# ============================================================================
+# PARALLEL SCORING INFRASTRUCTURE
+# ============================================================================
+
+class ThreadSafeScoringMetrics:
+    """Thread-safe metrics tracking for parallel scoring operations."""
     
-    raise RuntimeError("Extraction failed unexpectedly")
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scoring_metrics = StageMetrics("SCORE")
+        
+    def track_scoring_call_safe(self, input_text: str, output_text: str, execution_time: float):
+        """Thread-safe version of scoring metrics tracking."""
+        with self._lock:
+            self._scoring_metrics.add_input(input_text)
+            self._scoring_metrics.add_output(output_text)
+            self._scoring_metrics.add_execution_time(execution_time)
+            self._scoring_metrics.llm_calls += 1
 
 
-def extract_all_article_cards(
-    candidates: List[ArticleCandidate],
+def score_single_vote_worker(
+    card: ArticleCard,
+    criteria: Dict[str, Dict[str, Any]],
+    vote_number: int,
+    verbose: bool,
+    models: Optional[PipelineModels] = None
+) -> ArticleScore:
+    """
+    Worker function for parallel single vote scoring.
+
+    Args:
+        card: ArticleCard to score
+        criteria: Scoring criteria dictionary
+        vote_number: Vote number (1-indexed)
+        verbose: Enable progress logging
+        models: Presets per stage (default: the environment's pipeline model)
+
+    Returns:
+        ArticleScore object
+    """
+    try:
+        score = score_article_card(card, criteria, verbose=False, models=models)
+        return score
+    except Exception as e:
+        raise RuntimeError(f"Failed to score vote {vote_number} for card {card.article_id}: {e}")
+
+
+def score_all_cards_with_voting_parallel(
+    cards: List[ArticleCard],
+    max_concurrent: int = 5,
+    votes: int = 3,
+    criteria: Dict[str, Dict[str, Any]] = SCORING_CRITERIA,
     verbose: bool = False,
-    filter_think: bool = True
-) -> List[ArticleCard]:
+    models: Optional[PipelineModels] = None
+) -> List[ArticleScore]:
     """
-    Extract article cards from all candidates.
+    Score all cards with voting in parallel, one scheduler task per card×vote.
 
     Args:
-        candidates: List of generated article candidates
+        cards: List of ArticleCards to score
+        max_concurrent: Maximum concurrent LLM requests
+        votes: Number of voting rounds per card
+        criteria: Scoring criteria dictionary
         verbose: Enable progress logging
-        filter_think: Whether to filter out think tags from LLM responses
+        models: Presets per stage (default: the environment's pipeline model)
 
     Returns:
-        List of ArticleCard objects
+        List of averaged ArticleScore objects
     """
     if verbose:
         print(f"\n{'='*80}")
-        print("PIPELINE STAGE 2: EXTRACT")
+        print("PARALLEL SCORING STAGE")
         print(f"{'='*80}")
-        print(f"Extracting structured cards from {len(candidates)} articles...")
+        print(f"Scoring {len(cards)} cards with {votes} votes each, max {max_concurrent} concurrent...")
 
-    cards = []
-    for candidate in candidates:
+    total_scoring_operations = len(cards) * votes
+    progress_tracker = ThreadSafeProgressTracker(total_scoring_operations, "SCORE", verbose)
+    error_collector = ThreadSafeErrorCollector()
+
+    def worker_score_single_vote(card: ArticleCard, vote_number: int) -> ArticleScore:
+        """Worker function for single vote scoring."""
         try:
-            card = extract_article_card(
-                article_content=candidate.content,
-                article_id=candidate.article_id,
-                verbose=verbose,
-                filter_think=filter_think
-            )
-            cards.append(card)
+            score = score_article_card(card, criteria, verbose=False, models=models)
+            progress_tracker.update_progress(f"{card.article_id}-{vote_number}", f"vote{vote_number}_completed")
+            return score
+        except Exception as e:
+            error_collector.add_error(f"{card.article_id}-{vote_number}", e)
+            progress_tracker.update_progress(f"{card.article_id}-{vote_number}", f"vote{vote_number}_failed: {e}")
+            raise
+
+    # Execute parallel scoring: one task per card×vote so every slot stays busy
+    all_scores = []
+    warm_prefix_cache("SCORE", criteria, verbose, models=models)
+
+    llm_scheduler.ensure_capacity(adaptive_concurrency.worker_count(max_concurrent))
+    future_to_vote = {
+        llm_scheduler.submit("SCORE", worker_score_single_vote, card, vote_num + 1): (card, vote_num + 1)
+        for card in cards
+        for vote_num in range(votes)
+    }
+
+    card_votes: Dict[int, List[ArticleScore]] = {card.article_id: [] for card in cards}
+    pending_votes = {card.article_id: votes for card in cards}
+    for future in as_completed(future_to_vote):
+        card, vote_number = future_to_vote[future]
+        try:
+            card_votes[card.article_id].append(future.result())
         except Exception as e:
             if verbose:
-                print(f"  ✗ Failed to extract Article #{candidate.article_id}: {e}")
-            # Continue with other cards rather than failing entire pipeline
+                print(f"    ⚠ Vote {vote_number} failed for card {card.article_id}: {e}")
+
+        pending_votes[card.article_id] -= 1
+        if pending_votes[card.article_id] > 0:
+            continue
+        # Last vote for this card is in - average it now
+        score = average_card_votes(card, card_votes[card.article_id], verbose)
+        if score is not None:
+            all_scores.append(score)
+
+    # Restore card order so downstream prompts are stable across runs
+    all_scores.sort(key=lambda s: s.article_id)
     
+    # Report final statistics
     if verbose:
-        print(f"✓ Successfully extracted {len(cards)}/{len(candidates)} article cards\n")
+        scores_list = [s.overall_score for s in all_scores]
+        print(f"✓ Parallel scoring complete: {len(all_scores)}/{len(cards)} cards scored")
+        if scores_list:
+            print(f"  Score range: {min(scores_list):.1f} - {max(scores_list):.1f}")
+        failed = len(error_collector.get_errors())
+        if failed > 0:
+            print(f"  Failed scoring operations: {failed}")
+        print()
     
-    return cards
+    return all_scores
 
 
 # ============================================================================
-# PARALLEL EXTRACTION INFRASTRUCTURE
+# PAIRWISE SCORING MODE
+# Purpose: Compare articles head-to-head for more stable rankings
 # ============================================================================
 
-class ThreadSafeExtractionMetrics:
-    """Thread-safe metrics tracking for parallel extraction operations."""
-    
-    def __init__(self):
-        self._lock = threading.Lock()
-        self._extraction_metrics = StageMetrics("EXTRACT")
-        
-    def track_extraction_call_safe(self, input_text: str, output_text: str, execution_time: float):
-        """Thread-safe version of extraction metrics tracking."""
-        with self._lock:
-            self._extraction_metrics.add_input(input_text)
-            self._extraction_metrics.add_output(output_text)
-            self._extraction_metrics.add_execution_time(execution_time)
-            self._extraction_metrics.llm_calls += 1
+@dataclass
+class PairwiseResult:
+    """Result of a single pairwise comparison."""
+    article_a_id: int
+    article_b_id: int
+    criterion: str
+    winner: str  # "A", "B", or "TIE"
+    justification: str
+    confidence: str
 
 
-class ThreadSafeProgressTracker:
-    """Thread-safe progress tracking for parallel operations."""
-    
-    def __init__(self, total_items: int, stage_name: str, verbose: bool = False):
-        self.total = total_items
-        self.completed = 0
-        self.stage_name = stage_name
-        self.verbose = verbose
-        self.lock = threading.Lock()
-        
-    def update_progress(self, item_id: int, status: str = "completed"):
-        """Thread-safe progress updates."""
-        with self.lock:
-            self.completed += 1
-            if self.verbose and self.completed % max(1, self.total // 10) == 0:
-                percentage = (self.completed / self.total) * 100
-                print(f"[{self.stage_name}] Progress: {self.completed}/{self.total} ({percentage:.1f}%) - {status}")
+PAIRWISE_USER_PREFIX = "Compare these two articles on the criterion named at the end.\n\n## Criterion Definitions\n" + "\n".join(
+    f"- {name}: {info['description']}" for name, info in SCORING_CRITERIA.items()
+) + "\n\n"
 
 
-class ThreadSafeErrorCollector:
-    """Thread-safe error collection for parallel operations."""
-    
-    def __init__(self):
-        self.errors = []
-        self.lock = threading.Lock()
-        
-    def add_error(self, item_id: int, error: Exception):
-        """Thread-safe error collection."""
-        with self.lock:
-            self.errors.append({
-                'item_id': item_id,
-                'error': str(error),
-                'timestamp': time.time()
-            })
-            
-    def get_errors(self) -> List[Dict]:
-        """Get all collected errors."""
-        with self.lock:
-            return self.errors.copy()
+def build_pairwise_prompts(
+    card_a: ArticleCard,
+    card_b: ArticleCard,
+    criterion: str,
+    criterion_description: str
+) -> Tuple[str, str]:
+    """Build the (system, user) prompts for one pairwise comparison."""
+    pairwise_system_prompt = read_reference_file("prompts/pipeline_stage3_pairwise_system.md")
 
+    # Build comparison prompt with relevant card excerpts
+    card_a_excerpt = {
+        "article_id": card_a.article_id,
+        "opening_hook": card_a.opening_hook,
+        "core_argument": card_a.core_argument,
+        "key_points": card_a.key_points,
+        "memorable_phrases": card_a.memorable_phrases,
+        "structural_approach": card_a.structural_approach,
+        "evidence_used": card_a.evidence_used,
+    }
 
-def extract_single_card_worker(
-    candidate: ArticleCandidate,
-    retry_count: int,
-    verbose: bool,
-    filter_think: bool = True
-) -> ArticleCard:
-    """
-    Worker function for parallel card extraction.
+    card_b_excerpt = {
+        "article_id": card_b.article_id,
+        "opening_hook": card_b.opening_hook,
+        "core_argument": card_b.core_argument,
+        "key_points": card_b.key_points,
+        "memorable_phrases": card_b.memorable_phrases,
+        "structural_approach": card_b.structural_approach,
+        "evidence_used": card_b.evidence_used,
+    }
 
-    Args:
-        candidate: ArticleCandidate to extract
-        retry_count: Number of retry attempts for failed extractions
-        verbose: Enable progress logging
-        filter_think: Whether to filter out think tags from LLM responses
+    if prompt_layout.prefix_first:
+        # Static definitions first, then the pair, then the per-call criterion name,
+        # so the seven comparisons of one pair share everything up to the last line
+        criterion_note = "" if criterion in SCORING_CRITERIA else f" ({criterion_description})"
+        pairwise_user_prompt = PAIRWISE_USER_PREFIX + f"""## Article A (ID: {card_a.article_id})
+{json.dumps(card_a_excerpt, indent=2)}
 
-    Returns:
-        ArticleCard object
-    """
-    try:
-        card = extract_article_card(
-            article_content=candidate.content,
-            article_id=candidate.article_id,
-            verbose=False,  # Reduce verbosity in workers
-            retry_count=retry_count,
-            filter_think=filter_think
-        )
-        return card
-    except Exception as e:
-        raise RuntimeError(f"Failed to extract Article #{candidate.article_id}: {e}")
+## Article B (ID: {card_b.article_id})
+{json.dumps(card_b_excerpt, indent=2)}
 
+Criterion: {criterion}{criterion_note}
+Which article is better on {criterion}? Respond with only the JSON object."""
+        return pairwise_system_prompt, pairwise_user_prompt
 
-def extract_all_article_cards_parallel(
-    candidates: List[ArticleCandidate],
-    max_concurrent: int = 5,
-    verbose: bool = False,
-    retry_count: int = 3,
-    filter_think: bool = True
-) -> List[ArticleCard]:
-    """
-    Extract article cards from all candidates in parallel using ThreadPoolExecutor.
+    pairwise_user_prompt = f"""Compare these two articles on the criterion: {criterion}
 
-    Args:
-        candidates: List of generated article candidates
-        max_concurrent: Maximum concurrent LLM requests
-        verbose: Enable progress logging
-        retry_count: Number of retry attempts for failed extractions
-        filter_think: Whether to filter out think tags from LLM responses
+## Criterion Definition
+{criterion_description}
+
+## Article A (ID: {card_a.article_id})
+{json.dumps(card_a_excerpt, indent=2)}
+
+## Article B (ID: {card_b.article_id})
+{json.dumps(card_b_excerpt, indent=2)}
+
+Which article is better on {criterion}? Respond with only the JSON object."""
+
+    return pairwise_system_prompt, pairwise_user_prompt
+
+
+def parse_pairwise_result(
+    response: str,
+    card_a: ArticleCard,
+    card_b: ArticleCard,
+    criterion: str
+) -> Tuple[PairwiseResult, str]:
+    """
+    Parse a pairwise comparison response.
 
     Returns:
-        List of ArticleCard objects
+        Tuple of (PairwiseResult, extracted JSON string)
     """
-    if verbose:
-        print(f"\n{'='*80}")
-        print("PARALLEL EXTRACTION STAGE")
-        print(f"{'='*80}")
-        print(f"Extracting {len(candidates)} cards with max {max_concurrent} concurrent requests...")
+    # Extract JSON from response in one pass (reasoning blocks are always stripped)
+    json_str = extract_json_from_response(response)
+    result_data = json.loads(json_str)
 
-    progress_tracker = ThreadSafeProgressTracker(len(candidates), "EXTRACT", verbose)
-    error_collector = ThreadSafeErrorCollector()
+    result = PairwiseResult(
+        article_a_id=card_a.article_id,
+        article_b_id=card_b.article_id,
+        criterion=criterion,
+        winner=result_data.get("winner", "TIE"),
+        justification=result_data.get("justification", ""),
+        confidence=result_data.get("confidence", "medium")
+    )
+    return result, json_str
 
-    def worker_extract_card(candidate: ArticleCandidate) -> ArticleCard:
-        """Worker function for parallel extraction."""
-        try:
-            card = extract_article_card(
-                article_content=candidate.content,
-                article_id=candidate.article_id,
-                verbose=False,  # Reduce verbosity in workers
-                retry_count=retry_count,
-                filter_think=filter_think
-            )
-            progress_tracker.update_progress(candidate.article_id, "extracted")
-            return card
-        except Exception as e:
-            error_collector.add_error(candidate.article_id, e)
-            progress_tracker.update_progress(candidate.article_id, f"failed: {e}")
-            raise  # Re-raise to be handled by ThreadPoolExecutor
-    
-    # Execute parallel extraction
-    cards = []
-    with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
-        future_to_candidate = {
-            executor.submit(worker_extract_card, candidate): candidate.article_id
-            for candidate in candidates
-        }
-        
-        for future in as_completed(future_to_candidate):
-            candidate_id = future_to_candidate[future]
-            try:
-                card = future.result()
-                cards.append(card)
-            except Exception as e:
-                if verbose:
-                    print(f"  ✗ Failed to extract Article #{candidate_id}: {e}")
-                # Continue with other cards
-    
-    # Report final statistics
-    if verbose:
-        successful = len(cards)
-        failed = len(error_collector.get_errors())
-        print(f"✓ Parallel extraction complete: {successful}/{len(candidates)} cards extracted")
-        if failed > 0:
-            print(f"  Failed extractions: {failed}")
-            for error in error_collector.get_errors()[:3]:  # Show first 3
-                print(f"    - Article #{error['item_id']}: {error['error']}")
-        print()
-    
-    return cards
 
+def build_pairwise_call(
+    card_a: ArticleCard,
+    card_b: ArticleCard,
+    criterion: str,
+    criterion_description: str
+) -> StageCall:
+    """Build the call comparing two cards on one criterion (recorded as SCORE)."""
+    pairwise_system_prompt, pairwise_user_prompt = build_pairwise_prompts(
+        card_a, card_b, criterion, criterion_description
+    )
+    parse = lambda r: parse_pairwise_result(r, card_a, card_b, criterion)
+    return StageCall("SCORE", pairwise_system_prompt, pairwise_user_prompt, parse, {
+        "response_check": parse,
+        "response_schema": pairwise_response_schema(),
+        "temperature": 0.0,  # Zero temp for maximum consistency
+        "max_tokens": 500,
+        "seed": 42,  # Fixed seed for reproducibility
+        "output_kind": "PAIRWISE"  # Short verdicts; keep them out of the absolute SCORE histogram
+    })
 
-# ============================================================================
-# PIPELINE STAGE 3: SCORE
-# Purpose: Evaluate article cards on quality dimensions with voting
-# ============================================================================
 
-def score_article_card(
-    card: ArticleCard,
-    criteria: Dict[str, Dict[str, Any]],
+def pairwise_compare_articles(
+    card_a: ArticleCard,
+    card_b: ArticleCard,
+    criterion: str,
+    criterion_description: str,
     verbose: bool = False,
-    filter_think: bool = True
-) -> ArticleScore:
+    models: Optional[PipelineModels] = None
+) -> PairwiseResult:
     """
-    Score a single article card on all criteria.
+    Compare two article cards on a specific criterion.
 
     Args:
-        card: ArticleCard to evaluate
-        criteria: Scoring criteria dictionary
+        card_a: First ArticleCard
+        card_b: Second ArticleCard
+        criterion: Name of criterion to compare
+        criterion_description: Description of the criterion
         verbose: Enable progress logging
-        filter_think: Whether to filter out think tags from LLM responses
+        models: Presets per stage (default: the environment's pipeline model)
 
     Returns:
-        ArticleScore with scores and justifications
+        PairwiseResult with winner and justification
     """
-    score_system_prompt = read_reference_file("prompts/pipeline_stage3_score_system.md")
-
-    score_user_prompt = f"""Score the following article card against the provided criteria.
-
-## Article Card
-{json.dumps(card.__dict__, indent=2)}
-
-## Scoring Criteria
-{json.dumps(criteria, indent=2)}
-
-Respond with only the JSON object containing scores and justifications."""
-
-    # Prepare input text for metrics tracking
-    input_text = score_system_prompt + "\n\n" + score_user_prompt
-
-    # Send to LLM with timing
-    llm_start_time = time.time()
-    response = send_to_llm(
-        llm_user_prompt=score_user_prompt,
-        llm_system_prompt=score_system_prompt,
-        temperature=0.0,  # Zero temp for maximum consistency
-        max_tokens=4000,
-        verbose=verbose,
-        seed=42  # Fixed seed for reproducible scoring
-    )
-    llm_end_time = time.time()
-    execution_time = llm_end_time - llm_start_time
-
-    # Filter out think tags if requested
-    if filter_think:
-        response = filter_think_tags(response)
-
-    # Extract JSON from response (handles markdown code blocks and think tags)
-    json_str = extract_json_from_response(response)
-    
-    score_data = json.loads(json_str)
-    
-    # Calculate weighted overall score
-    total_score = 0.0
-    for criterion_name, criterion_info in criteria.items():
-        if criterion_name in score_data["scores"]:
-            score_value = score_data["scores"][criterion_name]["score"]
-            weight = criterion_info["weight"]
-            total_score += score_value * weight
-    
-    score_data["overall_score"] = round(total_score, 2)
-    
-    # Track LLM call metrics
-    track_llm_call("SCORE", input_text, json_str, execution_time)
-    
-    return ArticleScore(**score_data)
+    return build_pairwise_call(card_a, card_b, criterion, criterion_description).send(verbose, models)
 
 
-def average_score_votes(votes: List[ArticleScore], verbose: bool = False, use_outlier_detection: bool = True) -> ArticleScore:
+def wins_to_score(wins: float, max_possible_wins: int) -> float:
     """
-    Average multiple scoring votes for the same article with outlier detection.
-
-    Uses median-based outlier detection to discard votes that deviate significantly
-    from the consensus, improving score stability.
+    Convert win count to 1-10 scale.
 
     Args:
-        votes: List of ArticleScore objects from multiple votes
-        verbose: If True, print warnings for high-variance criteria
-        use_outlier_detection: If True, discard outliers >2 std from median before averaging
+        wins: Number of wins (can be fractional due to ties)
+        max_possible_wins: Maximum possible wins (n-1 for n articles)
 
     Returns:
-        Averaged ArticleScore with improved stability
+        Score on 1-10 scale
     """
-    if not votes:
-        raise ValueError("No votes to average")
+    if max_possible_wins == 0:
+        return 5.5  # Default middle score if only one article
+    # 0 wins = 1, all wins = 10
+    return 1 + (wins / max_possible_wins) * 9
 
-    # Use first vote as template
-    averaged = votes[0]
 
-    # Track variance warnings and outlier removals
-    high_variance_criteria = []
-    outliers_removed = []
+def pairwise_tasks(
+    cards: List[ArticleCard],
+    criteria: Dict[str, Dict[str, Any]]
+) -> List[Tuple[ArticleCard, ArticleCard, str, str]]:
+    """Return (card_a, card_b, criterion, description) for every pair of cards on every criterion."""
+    pairs = [(cards[i], cards[j]) for i in range(len(cards)) for j in range(i + 1, len(cards))]
+    return [(card_a, card_b, crit_name, crit_info["description"])
+            for card_a, card_b in pairs
+            for crit_name, crit_info in criteria.items()]
 
-    # Average numeric scores for each criterion with outlier detection
-    for criterion_name in averaged.scores.keys():
-        criterion_scores = [
-            vote.scores[criterion_name]["score"]
-            for vote in votes
-            if criterion_name in vote.scores
-        ]
 
-        if len(criterion_scores) == 0:
-            continue
+def record_pairwise_win(win_counts: Dict[int, Dict[str, float]], result: PairwiseResult) -> None:
+    """Add one comparison to the win counts; a tie is half a win for each article."""
+    if result.winner == "A":
+        win_counts[result.article_a_id][result.criterion] += 1.0
+    elif result.winner == "B":
+        win_counts[result.article_b_id][result.criterion] += 1.0
+    else:  # TIE
+        win_counts[result.article_a_id][result.criterion] += 0.5
+        win_counts[result.article_b_id][result.criterion] += 0.5
 
-        # Calculate median for robust central tendency
-        median_score = statistics.median(criterion_scores)
 
-        # Apply outlier detection if enabled and we have enough votes
-        filtered_scores = criterion_scores
-        if use_outlier_detection and len(criterion_scores) >= 3:
-            std_dev = statistics.stdev(criterion_scores)
-            if std_dev > 0:
-                # Remove scores that deviate >2 std from median
-                filtered_scores = [
-                    s for s in criterion_scores
-                    if abs(s - median_score) <= 2 * std_dev
-                ]
-                # Track if outliers were removed
-                if len(filtered_scores) < len(criterion_scores):
-                    removed = [s for s in criterion_scores if s not in filtered_scores]
-                    outliers_removed.append((criterion_name, removed, criterion_scores))
-                # Ensure we keep at least half the votes
-                if len(filtered_scores) < len(criterion_scores) // 2 + 1:
-                    filtered_scores = criterion_scores  # Revert if too many removed
+def report_pairwise_scores(title: str, all_scores: List[ArticleScore], failed: int = 0) -> None:
+    """Print the verbose summary of a pairwise scoring run."""
+    print(f"\n✓ {title} complete")
+    if failed > 0:
+        print(f"  Failed comparisons: {failed}")
+    for score in all_scores:
+        print(f"  Article #{score.article_id}: {score.overall_score:.2f}")
+    print()
 
-        # Calculate final score using mean of filtered scores
-        final_score = sum(filtered_scores) / len(filtered_scores)
-        averaged.scores[criterion_name]["score"] = round(final_score, 1)
 
-        # Store median for reference
-        averaged.scores[criterion_name]["median"] = round(median_score, 1)
+def win_counts_to_scores(
+    cards: List[ArticleCard],
+    criteria: Dict[str, Dict[str, Any]],
+    win_counts: Dict[int, Dict[str, float]]
+) -> List[ArticleScore]:
+    """
+    Convert pairwise win counts into ArticleScore objects.
 
-        # Calculate standard deviation to detect high variance (on original scores)
-        if len(criterion_scores) > 1:
-            std_dev = statistics.stdev(criterion_scores)
-            if std_dev > 1.5:
-                high_variance_criteria.append((criterion_name, std_dev, criterion_scores))
+    Args:
+        cards: List of ArticleCards that were compared
+        criteria: Scoring criteria dictionary
+        win_counts: win_counts[article_id][criterion] = number of wins
 
-    # Report outlier removals
-    if verbose and outliers_removed:
-        print(f"    INFO: Outliers removed for Article #{averaged.article_id}:")
-        for criterion, removed, original in outliers_removed:
-            print(f"      - {criterion}: removed {removed} from {original}")
+    Returns:
+        List of ArticleScore objects in card order
+    """
+    max_wins = len(cards) - 1  # Maximum wins possible per criterion
+    all_scores = []
 
-    # Report high variance criteria
-    if verbose and high_variance_criteria:
-        print(f"    WARNING: High scoring variance detected for Article #{averaged.article_id}:")
-        for criterion, std_dev, scores in high_variance_criteria:
-            print(f"      - {criterion}: std_dev={std_dev:.2f}, votes={scores}")
+    for card in cards:
+        scores_dict = {}
+        total_weighted_score = 0.0
 
-    # Average overall score using median for robustness
-    overall_scores = [vote.overall_score for vote in votes]
-    averaged.overall_score = round(
-        sum(overall_scores) / len(overall_scores), 2
-    )
-    # Also store median overall score
-    averaged_median_overall = statistics.median(overall_scores)
+        for criterion_name, criterion_info in criteria.items():
+            wins = win_counts[card.article_id][criterion_name]
+            score = wins_to_score(wins, max_wins)
+            scores_dict[criterion_name] = {
+                "score": round(score, 1),
+                "justification": f"Won {wins}/{max_wins} pairwise comparisons",
+                "wins": wins,
+                "median": round(score, 1)  # For consistency with absolute mode
+            }
+            total_weighted_score += score * criterion_info["weight"]
 
-    # Merge strengths and weaknesses (unique items only)
-    all_strengths = set()
-    all_weaknesses = set()
-    for vote in votes:
-        all_strengths.update(vote.standout_strengths)
-        all_weaknesses.update(vote.critical_weaknesses)
+        # Determine strengths and weaknesses based on relative performance
+        criterion_scores = [(name, scores_dict[name]["score"]) for name in criteria.keys()]
+        criterion_scores.sort(key=lambda x: x[1], reverse=True)
 
-    averaged.standout_strengths = list(all_strengths)
-    averaged.critical_weaknesses = list(all_weaknesses)
+        strengths = [f"Strong {name} ({score:.1f})" for name, score in criterion_scores[:2] if score >= 7]
+        weaknesses = [f"Weak {name} ({score:.1f})" for name, score in criterion_scores[-2:] if score < 6]
 
-    return averaged
+        article_score = ArticleScore(
+            article_id=card.article_id,
+            scores=scores_dict,
+            overall_score=round(total_weighted_score, 2),
+            standout_strengths=strengths,
+            critical_weaknesses=weaknesses
+        )
+        all_scores.append(article_score)
+
+    return all_scores
 
 
-def score_all_cards_with_voting(
+def score_all_cards_pairwise(
     cards: List[ArticleCard],
     criteria: Dict[str, Dict[str, Any]] = SCORING_CRITERIA,
-    votes: int = 3,
     verbose: bool = False,
-    filter_think: bool = True
+    models: Optional[PipelineModels] = None
 ) -> List[ArticleScore]:
     """
-    Score all cards with voting to reduce variance.
+    Score all cards using pairwise comparison for more stable rankings.
+
+    For each criterion, compares all pairs of articles and counts wins.
+    Converts win counts to 1-10 scores for compatibility with existing pipeline.
 
     Args:
         cards: List of ArticleCards to score
         criteria: Scoring criteria dictionary
-        votes: Number of voting rounds per card (default: 3)
         verbose: Enable progress logging
-        filter_think: Whether to filter out think tags from LLM responses
+        models: Presets per stage (default: the environment's pipeline model)
 
     Returns:
-        List of averaged ArticleScore objects
+        List of ArticleScore objects with scores derived from pairwise rankings
     """
     if verbose:
         print(f"\n{'='*80}")
-        print("PIPELINE STAGE 3: SCORE")
+        print("PAIRWISE SCORING MODE")
         print(f"{'='*80}")
-        print(f"Scoring {len(cards)} cards with {votes} votes each...")
+        n_cards = len(cards)
+        n_pairs = n_cards * (n_cards - 1) // 2
+        n_criteria = len(criteria)
+        print(f"Comparing {n_cards} articles ({n_pairs} pairs × {n_criteria} criteria = {n_pairs * n_criteria} comparisons)...")
 
-    all_scores = []
+    # Initialize win counters for each article and criterion
+    # win_counts[article_id][criterion] = number of wins
+    win_counts: Dict[int, Dict[str, float]] = {
+        card.article_id: {crit: 0.0 for crit in criteria.keys()}
+        for card in cards
+    }
 
-    for card in cards:
-        if verbose:
-            print(f"  Scoring Article #{card.article_id}...")
+    # Track all pairwise results for analysis
+    all_results: List[PairwiseResult] = []
 
-        # Collect multiple votes
-        card_votes = []
-        for vote_num in range(votes):
-            try:
-                score = score_article_card(card, criteria, verbose=False, filter_think=filter_think)
-                card_votes.append(score)
-                if verbose:
-                    print(f"    Vote {vote_num + 1}/{votes}: Overall score = {score.overall_score}")
-            except Exception as e:
-                if verbose:
-                    print(f"    ⚠ Vote {vote_num + 1} failed: {e}")
-        
-        # Average the votes
-        if card_votes:
-            averaged_score = average_score_votes(card_votes, verbose=verbose)
-            all_scores.append(averaged_score)
-            if verbose:
-                print(f"  ✓ Average score: {averaged_score.overall_score}\n")
-    
-    if verbose:
-        scores_list = [s.overall_score for s in all_scores]
-        print(f"✓ Scoring complete. Range: {min(scores_list):.1f} - {max(scores_list):.1f}\n")
-    
-    return all_scores
+    # Generate all pairs
+    pairs = [(cards[i], cards[j]) for i in range(len(cards)) for j in range(i + 1, len(cards))]
 
+    total_comparisons = len(pairs) * len(criteria)
+    completed = 0
 
-# ============================================================================
-# PARALLEL SCORING INFRASTRUCTURE
-# ============================================================================
+    # Compare each pair on each criterion
+    for card_a, card_b in pairs:
+        for criterion_name, criterion_info in criteria.items():
+            try:
+                result = pairwise_compare_articles(
+                    card_a=card_a,
+                    card_b=card_b,
+                    criterion=criterion_name,
+                    criterion_description=criterion_info["description"],
+                    verbose=False,
+                    models=models
+                )
+                all_results.append(result)
+                record_pairwise_win(win_counts, result)
 
-class ThreadSafeScoringMetrics:
-    """Thread-safe metrics tracking for parallel scoring operations."""
-    
-    def __init__(self):
-        self._lock = threading.Lock()
-        self._scoring_metrics = StageMetrics("SCORE")
-        
-    def track_scoring_call_safe(self, input_text: str, output_text: str, execution_time: float):
-        """Thread-safe version of scoring metrics tracking."""
-        with self._lock:
-            self._scoring_metrics.add_input(input_text)
-            self._scoring_metrics.add_output(output_text)
-            self._scoring_metrics.add_execution_time(execution_time)
-            self._scoring_metrics.llm_calls += 1
+                completed += 1
+                if verbose and completed % 10 == 0:
+                    print(f"  Progress: {completed}/{total_comparisons} comparisons...")
 
+            except Exception as e:
+                if verbose:
+                    print(f"  ⚠ Comparison failed ({card_a.article_id} vs {card_b.article_id} on {criterion_name}): {e}")
 
-def score_single_vote_worker(
-    card: ArticleCard,
-    criteria: Dict[str, Dict[str, Any]],
-    vote_number: int,
-    verbose: bool,
-    filter_think: bool = True
-) -> ArticleScore:
-    """
-    Worker function for parallel single vote scoring.
+    # Convert win counts to ArticleScore objects
+    all_scores = win_counts_to_scores(cards, criteria, win_counts)
 
-    Args:
-        card: ArticleCard to score
-        criteria: Scoring criteria dictionary
-        vote_number: Vote number (1-indexed)
-        verbose: Enable progress logging
-        filter_think: Whether to filter out think tags from LLM responses
+    if verbose:
+        report_pairwise_scores("Pairwise scoring", all_scores)
 
-    Returns:
-        ArticleScore object
-    """
-    try:
-        score = score_article_card(card, criteria, verbose=False, filter_think=filter_think)
-        return score
-    except Exception as e:
-        raise RuntimeError(f"Failed to score vote {vote_number} for card {card.article_id}: {e}")
+    return all_scores
 
 
-def score_all_cards_with_voting_parallel(
+def score_all_cards_pairwise_parallel(
     cards: List[ArticleCard],
     max_concurrent: int = 5,
-    votes: int = 3,
     criteria: Dict[str, Dict[str, Any]] = SCORING_CRITERIA,
     verbose: bool = False,
-    filter_think: bool = True
+    models: Optional[PipelineModels] = None
 ) -> List[ArticleScore]:
     """
-    Score all cards with voting in parallel using ThreadPoolExecutor.
+    Score all cards using pairwise comparison with parallel execution.
 
     Args:
         cards: List of ArticleCards to score
         max_concurrent: Maximum concurrent LLM requests
-        votes: Number of voting rounds per card
         criteria: Scoring criteria dictionary
         verbose: Enable progress logging
-        filter_think: Whether to filter out think tags from LLM responses
+        models: Presets per stage (default: the environment's pipeline model)
 
     Returns:
-        List of averaged ArticleScore objects
+        List of ArticleScore objects with scores derived from pairwise rankings
     """
     if verbose:
         print(f"\n{'='*80}")
-        print("PARALLEL SCORING STAGE")
+        print("PARALLEL PAIRWISE SCORING MODE")
         print(f"{'='*80}")
-        print(f"Scoring {len(cards)} cards with {votes} votes each, max {max_concurrent} concurrent...")
+        n_cards = len(cards)
+        n_pairs = n_cards * (n_cards - 1) // 2
+        n_criteria = len(criteria)
+        total_comparisons = n_pairs * n_criteria
+        print(f"Comparing {n_cards} articles ({n_pairs} pairs × {n_criteria} criteria = {total_comparisons} comparisons)...")
+        print(f"Using {max_concurrent} concurrent requests...")
 
-    total_scoring_operations = len(cards) * votes
-    progress_tracker = ThreadSafeProgressTracker(total_scoring_operations, "SCORE", verbose)
+    # Initialize win counters
+    win_counts: Dict[int, Dict[str, float]] = {
+        card.article_id: {crit: 0.0 for crit in criteria.keys()}
+        for card in cards
+    }
+
+    # Lock for thread-safe updates
+    win_lock = threading.Lock()
+
+    # Generate all comparison tasks
+    tasks = pairwise_tasks(cards, criteria)
+
+    progress_tracker = ThreadSafeProgressTracker(len(tasks), "PAIRWISE", verbose)
     error_collector = ThreadSafeErrorCollector()
 
-    def worker_score_single_vote(card: ArticleCard, vote_number: int) -> ArticleScore:
-        """Worker function for single vote scoring."""
+    def worker_compare(task_tuple):
+        """Worker function for parallel pairwise comparison."""
+        card_a, card_b, criterion_name, criterion_desc = task_tuple
         try:
-            score = score_article_card(card, criteria, verbose=False, filter_think=filter_think)
-            progress_tracker.update_progress(f"{card.article_id}-{vote_number}", f"vote{vote_number}_completed")
-            return score
+            result = pairwise_compare_articles(
+                card_a=card_a,
+                card_b=card_b,
+                criterion=criterion_name,
+                criterion_description=criterion_desc,
+                verbose=False,
+                models=models
+            )
+
+            # Thread-safe win count update
+            with win_lock:
+                record_pairwise_win(win_counts, result)
+
+            progress_tracker.update_progress(
+                f"{card_a.article_id}-{card_b.article_id}-{criterion_name}",
+                "compared"
+            )
+            return result
+
         except Exception as e:
-            error_collector.add_error(f"{card.article_id}-{vote_number}", e)
-            progress_tracker.update_progress(f"{card.article_id}-{vote_number}", f"vote{vote_number}_failed: {e}")
+            error_collector.add_error(
+                f"{card_a.article_id}-{card_b.article_id}-{criterion_name}",
+                e
+            )
             raise
 
-    def worker_score_all_votes_for_card(card: ArticleCard) -> ArticleScore:
-        """Worker function to score one card with all votes."""
-        card_votes = []
-        for vote_num in range(votes):
-            try:
-                vote_score = worker_score_single_vote(card, vote_num + 1)
-                card_votes.append(vote_score)
-            except Exception as e:
-                if verbose:
-                    print(f"    ⚠ Vote {vote_num + 1} failed for card {card.article_id}: {e}")
-        
-        if card_votes:
-            return average_score_votes(card_votes, verbose=verbose)
-        else:
-            raise RuntimeError(f"All votes failed for card {card.article_id}")
+    # Execute comparisons in parallel
+    warm_prefix_cache("PAIRWISE", verbose=verbose, models=models)
+
+    llm_scheduler.ensure_capacity(adaptive_concurrency.worker_count(max_concurrent))
+    futures = {llm_scheduler.submit("PAIRWISE", worker_compare, task): task for task in tasks}
+    for future in as_completed(futures):
+        try:
+            future.result()
+        except Exception:
+            pass  # Errors already collected
+
+    # Convert win counts to ArticleScore objects
+    all_scores = win_counts_to_scores(cards, criteria, win_counts)
+
+    if verbose:
+        report_pairwise_scores("Parallel pairwise scoring", all_scores, len(error_collector.get_errors()))
+
+    return all_scores
+
+
+# ============================================================================
+# PIPELINE STAGE 4: SELECT
+# Purpose: Analyze scores and select best elements for synthesis
+# ============================================================================
+
+def build_select_prompts(cards: List[ArticleCard], scores: List[ArticleScore]) -> Tuple[str, str]:
+    """Build the (system, user) prompts for the SELECT stage."""
+    # Build analysis input (compressed view)
+    analysis_input = []
+    for card, score in zip(cards, scores):
+        analysis_input.append({
+            "article_id": card.article_id,
+            "headline_candidates": card.headline_candidates,
+            "opening_hook": card.opening_hook[:200] + "...",  # Truncate for context
+            "core_argument": card.core_argument,
+            "key_points": card.key_points,
+            "structural_approach": card.structural_approach,
+            "memorable_phrases": card.memorable_phrases,
+            "scores": {k: v["score"] for k, v in score.scores.items()},
+            "overall_score": score.overall_score
+        })
+
+    select_system_prompt = read_reference_file("prompts/pipeline_stage4_select_system.md")
+
+    select_user_prompt = f"""Analyze these {len(cards)} article drafts and create a synthesis blueprint.
+
+## Article Summaries and Scores
+{json.dumps(analysis_input, indent=2)}
+
+Create a synthesis blueprint that combines the best elements into one superior article.
+
+Respond with only the JSON object."""
+
+    return select_system_prompt, select_user_prompt
+
+
+def parse_synthesis_blueprint(
+    response: str,
+    verbose: bool = False
+) -> Tuple[SynthesisBlueprint, str]:
+    """
+    Parse a SELECT response into a SynthesisBlueprint.
+
+    Returns:
+        Tuple of (SynthesisBlueprint, extracted JSON string)
+    """
+    # Extract JSON from response in one pass (reasoning blocks are always stripped)
+    json_str = extract_json_from_response(response)
     
-    # Execute parallel scoring
-    all_scores = []
-    with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
-        future_to_card = {
-            executor.submit(worker_score_all_votes_for_card, card): card.article_id
-            for card in cards
-        }
-        
-        for future in as_completed(future_to_card):
-            card_id = future_to_card[future]
-            try:
-                score = future.result()
-                all_scores.append(score)
-                if verbose:
-                    print(f"  ✓ Card #{card_id} scored: {score.overall_score}")
-            except Exception as e:
-                if verbose:
-                    print(f"  ✗ Failed to score Card #{card_id}: {e}")
+    # Debug: Check if response is empty after extraction
+    if not json_str or json_str.isspace():
+        raise ValueError("Empty response after filtering. LLM may have only returned thinking content or invalid format.")
     
-    # Report final statistics
-    if verbose:
-        scores_list = [s.overall_score for s in all_scores]
-        print(f"✓ Parallel scoring complete: {len(all_scores)}/{len(cards)} cards scored")
-        if scores_list:
-            print(f"  Score range: {min(scores_list):.1f} - {max(scores_list):.1f}")
-        failed = len(error_collector.get_errors())
-        if failed > 0:
-            print(f"  Failed scoring operations: {failed}")
-        print()
+    try:
+        blueprint_data = json.loads(json_str)
+    except json.JSONDecodeError as e:
+        # Provide more context in error message
+        if verbose:
+            print("\nFailed to parse JSON response:")
+            print(f"Extracted JSON preview: {json_str[:500]}")
+        raise ValueError(f"Invalid JSON response from LLM: {e}. JSON preview: {json_str[:200]}")
     
-    return all_scores
+    # Create blueprint with all required fields including confidence
+    blueprint_dict = blueprint_data["synthesis_blueprint"].copy()
+    blueprint_dict["confidence"] = blueprint_data["confidence"]
+    if not isinstance(blueprint_dict["confidence"], dict) or "level" not in blueprint_dict["confidence"]:
+        raise ValueError("Blueprint confidence is missing its 'level'")
+    
+    blueprint = SynthesisBlueprint(**blueprint_dict)
 
+    return blueprint, json_str
 
-# ============================================================================
-# PAIRWISE SCORING MODE
-# Purpose: Compare articles head-to-head for more stable rankings
-# ============================================================================
 
-@dataclass
-class PairwiseResult:
-    """Result of a single pairwise comparison."""
-    article_a_id: int
-    article_b_id: int
-    criterion: str
-    winner: str  # "A", "B", or "TIE"
-    justification: str
-    confidence: str
+def build_select_call(cards: List[ArticleCard], scores: List[ArticleScore], verbose: bool = False) -> StageCall:
+    """Build the SELECT call that turns the scored cards into a synthesis blueprint."""
+    select_system_prompt, select_user_prompt = build_select_prompts(cards, scores)
+    return StageCall("SELECT", select_system_prompt, select_user_prompt, lambda r: parse_synthesis_blueprint(r, verbose), {
+        "response_check": parse_synthesis_blueprint,
+        "response_schema": select_response_schema(),
+        "temperature": 0.4,  # Some analytical creativity
+        "max_tokens": 6000
+    })
 
 
-def pairwise_compare_articles(
-    card_a: ArticleCard,
-    card_b: ArticleCard,
-    criterion: str,
-    criterion_description: str,
+def select_best_elements(
+    cards: List[ArticleCard],
+    scores: List[ArticleScore],
     verbose: bool = False,
-    filter_think: bool = True
-) -> PairwiseResult:
+    models: Optional[PipelineModels] = None
+) -> SynthesisBlueprint:
     """
-    Compare two article cards on a specific criterion.
+    Analyze all cards and scores to select best elements for synthesis.
 
     Args:
-        card_a: First ArticleCard
-        card_b: Second ArticleCard
-        criterion: Name of criterion to compare
-        criterion_description: Description of the criterion
+        cards: List of ArticleCards
+        scores: List of corresponding ArticleScore objects
         verbose: Enable progress logging
-        filter_think: Whether to filter out think tags from LLM responses
+        models: Presets per stage (default: the environment's pipeline model)
 
     Returns:
-        PairwiseResult with winner and justification
+        SynthesisBlueprint specifying how to combine elements
     """
-    pairwise_system_prompt = read_reference_file("prompts/pipeline_stage3_pairwise_system.md")
+    if verbose:
+        print_stage_banner("PIPELINE STAGE 4: SELECT", f"Analyzing {len(cards)} articles to select best elements...")
 
-    # Build comparison prompt with relevant card excerpts
-    card_a_excerpt = {
-        "article_id": card_a.article_id,
-        "opening_hook": card_a.opening_hook,
-        "core_argument": card_a.core_argument,
-        "key_points": card_a.key_points,
-        "memorable_phrases": card_a.memorable_phrases,
-        "structural_approach": card_a.structural_approach,
-        "evidence_used": card_a.evidence_used,
-    }
+    blueprint = build_select_call(cards, scores, verbose).send(verbose, models)
 
-    card_b_excerpt = {
-        "article_id": card_b.article_id,
-        "opening_hook": card_b.opening_hook,
-        "core_argument": card_b.core_argument,
-        "key_points": card_b.key_points,
-        "memorable_phrases": card_b.memorable_phrases,
-        "structural_approach": card_b.structural_approach,
-        "evidence_used": card_b.evidence_used,
-    }
+    if verbose:
+        print(f"✓ Blueprint created. Confidence: {blueprint.confidence['level']}\n")
 
-    pairwise_user_prompt = f"""Compare these two articles on the criterion: {criterion}
+    return blueprint
 
-## Criterion Definition
-{criterion_description}
 
-## Article A (ID: {card_a.article_id})
-{json.dumps(card_a_excerpt, indent=2)}
+# ============================================================================
+# PIPELINE STAGE 5: SYNTHESIZE
+# Purpose: Generate final article from synthesis blueprint
+# ============================================================================
 
-## Article B (ID: {card_b.article_id})
-{json.dumps(card_b_excerpt, indent=2)}
+def build_synthesize_prompts(
+    blueprint: SynthesisBlueprint,
+    original_user_prompt: str,
+    brand_guidelines: str,
+    target_word_count: int
+) -> Tuple[str, str]:
+    """Build the (system, user) prompts for the SYNTHESIZE stage."""
+    # Load prompt template and substitute variables
+    prompt_template = read_reference_file("prompts/pipeline_stage5_synthesize_system.md")
+    writing_style_content = read_reference_file("reference_context/writing_style-enhanced.md")
 
-Which article is better on {criterion}? Respond with only the JSON object."""
+    synthesize_system_prompt = prompt_template.format(
+        brand_guidelines=brand_guidelines,
+        writing_style_content = writing_style_content,
+        target_word_count=target_word_count
+    )
 
-    # Prepare input text for metrics tracking
-    input_text = pairwise_system_prompt + "\n\n" + pairwise_user_prompt
+    synthesize_user_prompt = f"""Write a marketing blog article following this synthesis blueprint.
+## Original Brief
+{original_user_prompt}
 
-    # Send to LLM with timing
-    llm_start_time = time.time()
-    response = send_to_llm(
-        llm_user_prompt=pairwise_user_prompt,
-        llm_system_prompt=pairwise_system_prompt,
-        temperature=0.0,  # Zero temp for maximum consistency
-        max_tokens=500,
-        verbose=verbose,
-        seed=42  # Fixed seed for reproducibility
-    )
-    llm_end_time = time.time()
-    execution_time = llm_end_time - llm_start_time
+## Synthesis Blueprint
+{json.dumps(blueprint.__dict__, indent=2)}
 
-    # Filter out think tags if requested
-    if filter_think:
-        response = filter_think_tags(response)
+Write the complete article now. Start directly with the headline."""
 
-    # Extract JSON from response
-    json_str = extract_json_from_response(response)
-    result_data = json.loads(json_str)
+    return synthesize_system_prompt, synthesize_user_prompt
 
-    # Track LLM call metrics
-    track_llm_call("SCORE", input_text, json_str, execution_time)
 
-    return PairwiseResult(
-        article_a_id=card_a.article_id,
-        article_b_id=card_b.article_id,
-        criterion=criterion,
-        winner=result_data.get("winner", "TIE"),
-        justification=result_data.get("justification", ""),
-        confidence=result_data.get("confidence", "medium")
+def build_synthesize_call(
+    blueprint: SynthesisBlueprint,
+    original_user_prompt: str,
+    brand_guidelines: str,
+    target_word_count: int,
+    filter_think: bool = True
+) -> StageCall:
+    """Build the SYNTHESIZE call; the reply is the article (reasoning removed when filter_think is set)."""
+    synthesize_system_prompt, synthesize_user_prompt = build_synthesize_prompts(
+        blueprint, original_user_prompt, brand_guidelines, target_word_count
     )
 
+    def parse(article: str) -> Tuple[str, str]:
+        if filter_think:
+            article = filter_think_tags(article)
+        return article, article
 
-def wins_to_score(wins: float, max_possible_wins: int) -> float:
-    """
-    Convert win count to 1-10 scale.
+    return StageCall("SYNTHESIZE", synthesize_system_prompt, synthesize_user_prompt, parse, {
+        "stream_name": "synthesis",
+        "temperature": 0.7,  # Higher temp for creative writing
+        "max_tokens": 8000
+    })
 
-    Args:
-        wins: Number of wins (can be fractional due to ties)
-        max_possible_wins: Maximum possible wins (n-1 for n articles)
 
-    Returns:
-        Score on 1-10 scale
-    """
-    if max_possible_wins == 0:
-        return 5.5  # Default middle score if only one article
-    # 0 wins = 1, all wins = 10
-    return 1 + (wins / max_possible_wins) * 9
+def report_synthesized_article(article: str) -> None:
+    """Print the verbose result of the SYNTHESIZE stage."""
+    print(f"✓ Synthesized article generated ({len(article.split())} words)\n")
 
 
-def score_all_cards_pairwise(
-    cards: List[ArticleCard],
-    criteria: Dict[str, Dict[str, Any]] = SCORING_CRITERIA,
+def synthesize_final_article(
+    blueprint: SynthesisBlueprint,
+    original_user_prompt: str,
+    brand_guidelines: str,
+    target_word_count: int = 1500,
     verbose: bool = False,
-    filter_think: bool = True
-) -> List[ArticleScore]:
+    filter_think: bool = True,
+    models: Optional[PipelineModels] = None
+) -> str:
     """
-    Score all cards using pairwise comparison for more stable rankings.
-
-    For each criterion, compares all pairs of articles and counts wins.
-    Converts win counts to 1-10 scores for compatibility with existing pipeline.
+    Generate final article from synthesis blueprint.
 
     Args:
-        cards: List of ArticleCards to score
-        criteria: Scoring criteria dictionary
+        blueprint: SynthesisBlueprint with specifications
+        original_user_prompt: The original topic/brief
+        brand_guidelines: Company brand guidelines (from existing system prompt)
+        target_word_count: Desired article length
         verbose: Enable progress logging
         filter_think: Whether to filter out think tags from LLM responses
+        models: Presets per stage (default: the environment's pipeline model)
 
     Returns:
-        List of ArticleScore objects with scores derived from pairwise rankings
+        Final synthesized article text
     """
     if verbose:
-        print(f"\n{'='*80}")
-        print("PAIRWISE SCORING MODE")
-        print(f"{'='*80}")
-        n_cards = len(cards)
-        n_pairs = n_cards * (n_cards - 1) // 2
-        n_criteria = len(criteria)
-        print(f"Comparing {n_cards} articles ({n_pairs} pairs × {n_criteria} criteria = {n_pairs * n_criteria} comparisons)...")
+        print_stage_banner("PIPELINE STAGE 5: SYNTHESIZE", "Generating final article from blueprint...")
+
+    call = build_synthesize_call(blueprint, original_user_prompt, brand_guidelines, target_word_count, filter_think)
+    article = call.send(verbose, models)
+
+    if verbose:
+        report_synthesized_article(article)
+
+    return article
+
+
+# ============================================================================
+# PIPELINE STAGE 6: VALIDATE
+# Purpose: Verify synthesized article meets quality standards
+# ============================================================================
+
+def build_validate_prompts(
+    article: str,
+    blueprint: SynthesisBlueprint,
+    original_scores: List[ArticleScore]
+) -> Tuple[str, str, float]:
+    """Build the (system, user) prompts and target threshold for the VALIDATE stage."""
+    # Calculate target threshold (should beat average of sources)
+    avg_source_score = sum(s.overall_score for s in original_scores) / len(original_scores)
+    target_threshold = avg_source_score + 0.5
+
+    # The per-run threshold stays out of the system prompt in the prefix-cache layout
+    threshold_field = "<float, the target threshold given in the request>" if prompt_layout.prefix_first else target_threshold
+
+    validate_system_prompt = f"""You are a content quality assurance agent. You will receive:
+1. A synthesized article
+2. The blueprint it was supposed to follow
+3. A target quality threshold
+
+Your job is to verify the article meets requirements and identify any issues.
+
+You must respond with ONLY a valid JSON object.
+
+## Validation Checks
+
+1. BLUEPRINT COMPLIANCE
+   - Does the article use the specified headline?
+   - Does it follow the specified structure?
+   - Does it include the core argument?
+   - Are the supporting points present?
+   - Is the evidence included where specified?
+   - Are the memorable phrases preserved verbatim?
+   - Does it avoid the listed weaknesses?
+
+2. QUALITY ASSESSMENT
+   - Score the final article on the same criteria used for source articles
+   - Compare to target threshold
+
+3. COHERENCE CHECK
+   - Does the article flow naturally?
+   - Are transitions smooth?
+   - Is the tone consistent?
+   - Does it feel like one coherent piece (not Frankenstein'd together)?
+
+## Output Schema
+
+{{
+  "passed": <boolean>,
+  "blueprint_compliance": {{
+    "headline_used": <boolean>,
+    "structure_followed": <boolean>,
+    "core_argument_present": <boolean>,
+    "supporting_points_included": <float 0-1, what percentage>,
+    "evidence_included": <float 0-1>,
+    "phrases_preserved": <float 0-1>,
+    "weaknesses_avoided": <boolean>,
+    "compliance_score": <float 0-1>
+  }},
+  "quality_scores": {{
+    "hook_strength": <1-10>,
+    "argument_clarity": <1-10>,
+    "evidence_quality": <1-10>,
+    "structural_coherence": <1-10>,
+    "originality": <1-10>,
+    "memorability": <1-10>,
+    "actionability": <1-10>,
+    "overall": <float>
+  }},
+  "coherence_assessment": {{
+    "flow_natural": <boolean>,
+    "transitions_smooth": <boolean>,
+    "tone_consistent": <boolean>,
+    "feels_unified": <boolean>
+  }},
+  "issues": [
+    "<specific issue 1>",
+    "<specific issue 2>"
+  ],
+  "improvement_suggestions": [
+    "<specific suggestion if failed>"
+  ],
+  "target_threshold": {threshold_field},
+  "threshold_met": <boolean>
+}}"""
+
+    validate_user_prompt = f"""Validate this synthesized article against its blueprint.
+
+## Synthesized Article
+{article}
 
-    # Initialize win counters for each article and criterion
-    # win_counts[article_id][criterion] = number of wins
-    win_counts: Dict[int, Dict[str, float]] = {
-        card.article_id: {crit: 0.0 for crit in criteria.keys()}
-        for card in cards
-    }
+## Blueprint It Should Follow
+{json.dumps(blueprint.__dict__, indent=2)}
 
-    # Track all pairwise results for analysis
-    all_results: List[PairwiseResult] = []
+## Target Quality Threshold
+The article should achieve an overall score of at least {target_threshold:.1f}
 
-    # Generate all pairs
-    pairs = [(cards[i], cards[j]) for i in range(len(cards)) for j in range(i + 1, len(cards))]
+Evaluate and respond with the validation JSON."""
 
-    total_comparisons = len(pairs) * len(criteria)
-    completed = 0
+    return validate_system_prompt, validate_user_prompt, target_threshold
 
-    # Compare each pair on each criterion
-    for card_a, card_b in pairs:
-        for criterion_name, criterion_info in criteria.items():
-            try:
-                result = pairwise_compare_articles(
-                    card_a=card_a,
-                    card_b=card_b,
-                    criterion=criterion_name,
-                    criterion_description=criterion_info["description"],
-                    verbose=False,
-                    filter_think=filter_think
-                )
-                all_results.append(result)
 
-                # Update win counts
-                if result.winner == "A":
-                    win_counts[card_a.article_id][criterion_name] += 1.0
-                elif result.winner == "B":
-                    win_counts[card_b.article_id][criterion_name] += 1.0
-                else:  # TIE
-                    win_counts[card_a.article_id][criterion_name] += 0.5
-                    win_counts[card_b.article_id][criterion_name] += 0.5
+def parse_validation_result(response: str) -> Tuple[ValidationResult, str]:
+    """
+    Parse a VALIDATE response into a ValidationResult.
 
-                completed += 1
-                if verbose and completed % 10 == 0:
-                    print(f"  Progress: {completed}/{total_comparisons} comparisons...")
+    Returns:
+        Tuple of (ValidationResult, extracted JSON string)
+    """
+    # Extract JSON from response in one pass (reasoning blocks are always stripped)
+    json_str = extract_json_from_response(response)
 
-            except Exception as e:
-                if verbose:
-                    print(f"  ⚠ Comparison failed ({card_a.article_id} vs {card_b.article_id} on {criterion_name}): {e}")
+    validation_data = json.loads(json_str)
 
-    # Convert win counts to ArticleScore objects
-    max_wins = len(cards) - 1  # Maximum wins possible per criterion
-    all_scores = []
+    # Handle field name mismatch between LLM output and dataclass
+    # LLM may return 'quality_score' but dataclass expects 'quality_scores'
+    if 'quality_score' in validation_data and 'quality_scores' not in validation_data:
+        validation_data['quality_scores'] = validation_data.pop('quality_score')
 
-    for card in cards:
-        scores_dict = {}
-        total_weighted_score = 0.0
+    result = ValidationResult(**validation_data)
+    if not isinstance(result.quality_scores, dict) or "overall" not in result.quality_scores:
+        raise ValueError("Validation quality_scores is missing 'overall'")
 
-        for criterion_name, criterion_info in criteria.items():
-            wins = win_counts[card.article_id][criterion_name]
-            score = wins_to_score(wins, max_wins)
-            scores_dict[criterion_name] = {
-                "score": round(score, 1),
-                "justification": f"Won {wins}/{max_wins} pairwise comparisons",
-                "wins": wins,
-                "median": round(score, 1)  # For consistency with absolute mode
-            }
-            total_weighted_score += score * criterion_info["weight"]
+    return result, json_str
 
-        # Determine strengths and weaknesses based on relative performance
-        criterion_scores = [(name, scores_dict[name]["score"]) for name in criteria.keys()]
-        criterion_scores.sort(key=lambda x: x[1], reverse=True)
 
-        strengths = [f"Strong {name} ({score:.1f})" for name, score in criterion_scores[:2] if score >= 7]
-        weaknesses = [f"Weak {name} ({score:.1f})" for name, score in criterion_scores[-2:] if score < 6]
+def build_validate_call(
+    article: str,
+    blueprint: SynthesisBlueprint,
+    original_scores: List[ArticleScore],
+    retry_count: int = 3,
+    retry_delay: float = 2.0
+) -> Tuple[StageCall, float]:
+    """Build the VALIDATE call (unparseable verdicts are retried) and return it with the target threshold."""
+    validate_system_prompt, validate_user_prompt, target_threshold = build_validate_prompts(
+        article, blueprint, original_scores
+    )
+    call = StageCall("VALIDATE", validate_system_prompt, validate_user_prompt, parse_validation_result, {
+        "response_check": parse_validation_result,
+        "response_schema": validate_response_schema(),
+        "temperature": 0.2,  # Low temp for consistent judgment
+        "max_tokens": 4000,
+        "retry_count": retry_count,
+        "retry_delay": retry_delay
+    })
+    return call, target_threshold
 
-        article_score = ArticleScore(
-            article_id=card.article_id,
-            scores=scores_dict,
-            overall_score=round(total_weighted_score, 2),
-            standout_strengths=strengths,
-            critical_weaknesses=weaknesses
-        )
-        all_scores.append(article_score)
 
-    if verbose:
-        print(f"\n✓ Pairwise scoring complete")
-        for score in all_scores:
-            print(f"  Article #{score.article_id}: {score.overall_score:.2f}")
-        print()
+def report_validation(result: ValidationResult, target_threshold: float) -> None:
+    """Print the verbose verdict of the VALIDATE stage."""
+    status = "✓ PASSED" if result.passed else "✗ FAILED"
+    print(f"{status} - Overall score: {result.quality_scores['overall']:.1f} (threshold: {target_threshold:.1f})")
+    if not result.passed and result.issues:
+        print(f"  Issues identified: {len(result.issues)}")
+        for issue in result.issues[:3]:  # Show first 3
+            print(f"    - {issue}")
+    print()
 
-    return all_scores
 
+def add_validation_feedback(blueprint: SynthesisBlueprint, validation: ValidationResult) -> None:
+    """Append a failed validation's top issues to the blueprint notes for the next synthesis attempt."""
+    blueprint.synthesis_notes += f"\n\nPREVIOUS ATTEMPT FAILED. Issues: {', '.join(validation.issues[:3])}"
 
-def score_all_cards_pairwise_parallel(
-    cards: List[ArticleCard],
-    max_concurrent: int = 5,
-    criteria: Dict[str, Dict[str, Any]] = SCORING_CRITERIA,
+
+def validate_synthesized_article(
+    article: str,
+    blueprint: SynthesisBlueprint,
+    original_scores: List[ArticleScore],
     verbose: bool = False,
-    filter_think: bool = True
-) -> List[ArticleScore]:
+    validation_retry_count: int = 3,
+    validation_retry_delay: float = 2.0,
+    models: Optional[PipelineModels] = None
+) -> ValidationResult:
     """
-    Score all cards using pairwise comparison with parallel execution.
+    Validate that synthesized article meets quality standards.
 
     Args:
-        cards: List of ArticleCards to score
-        max_concurrent: Maximum concurrent LLM requests
-        criteria: Scoring criteria dictionary
+        article: Synthesized article text
+        blueprint: SynthesisBlueprint it should follow
+        original_scores: Scores from source articles
         verbose: Enable progress logging
-        filter_think: Whether to filter out think tags from LLM responses
+        validation_retry_count: Maximum attempts for the validation call (default: 3)
+        validation_retry_delay: Base backoff delay for validation retries in seconds (default: 2.0)
+        models: Presets per stage (default: the environment's pipeline model)
 
     Returns:
-        List of ArticleScore objects with scores derived from pairwise rankings
+        ValidationResult with pass/fail and detailed feedback
     """
     if verbose:
-        print(f"\n{'='*80}")
-        print("PARALLEL PAIRWISE SCORING MODE")
-        print(f"{'='*80}")
-        n_cards = len(cards)
-        n_pairs = n_cards * (n_cards - 1) // 2
-        n_criteria = len(criteria)
-        total_comparisons = n_pairs * n_criteria
-        print(f"Comparing {n_cards} articles ({n_pairs} pairs × {n_criteria} criteria = {total_comparisons} comparisons)...")
-        print(f"Using {max_concurrent} concurrent requests...")
+        print_stage_banner("PIPELINE STAGE 6: VALIDATE", "Validating synthesized article...")
 
-    # Initialize win counters
-    win_counts: Dict[int, Dict[str, float]] = {
-        card.article_id: {crit: 0.0 for crit in criteria.keys()}
-        for card in cards
-    }
+    call, target_threshold = build_validate_call(
+        article, blueprint, original_scores, validation_retry_count, validation_retry_delay
+    )
+    result = call.send(verbose, models)
 
-    # Lock for thread-safe updates
-    win_lock = threading.Lock()
+    if verbose:
+        report_validation(result, target_threshold)
 
-    # Generate all comparison tasks
-    pairs = [(cards[i], cards[j]) for i in range(len(cards)) for j in range(i + 1, len(cards))]
-    tasks = [(card_a, card_b, crit_name, crit_info["description"])
-             for card_a, card_b in pairs
-             for crit_name, crit_info in criteria.items()]
+    return result
 
-    progress_tracker = ThreadSafeProgressTracker(len(tasks), "PAIRWISE", verbose)
-    error_collector = ThreadSafeErrorCollector()
 
-    def worker_compare(task_tuple):
-        """Worker function for parallel pairwise comparison."""
-        card_a, card_b, criterion_name, criterion_desc = task_tuple
-        try:
-            result = pairwise_compare_articles(
-                card_a=card_a,
-                card_b=card_b,
-                criterion=criterion_name,
-                criterion_description=criterion_desc,
-                verbose=False,
-                filter_think=filter_think
-            )
+def synthesize_with_validation_loop(
+    blueprint: SynthesisBlueprint,
+    original_user_prompt: str,
+    brand_guidelines: str,
+    original_scores: List[ArticleScore],
+    target_word_count: int = 1500,
+    max_retries: int = 3,
+    verbose: bool = False,
+    filter_think: bool = True,
+    models: Optional[PipelineModels] = None
+) -> tuple[str, ValidationResult | None]:
+    """
+    Synthesize article with validation retry loop.
 
-            # Thread-safe win count update
-            with win_lock:
-                if result.winner == "A":
-                    win_counts[card_a.article_id][criterion_name] += 1.0
-                elif result.winner == "B":
-                    win_counts[card_b.article_id][criterion_name] += 1.0
-                else:  # TIE
-                    win_counts[card_a.article_id][criterion_name] += 0.5
-                    win_counts[card_b.article_id][criterion_name] += 0.5
+    Args:
+        blueprint: SynthesisBlueprint
+        original_user_prompt: Original topic/brief
+        brand_guidelines: Company brand guidelines
+        original_scores: Scores from source articles
+        target_word_count: Desired article length
+        max_retries: Maximum synthesis attempts
+        verbose: Enable progress logging
+        filter_think: Whether to filter out think tags from LLM responses
+        models: Presets per stage (default: the environment's pipeline model)
 
-            progress_tracker.update_progress(
-                f"{card_a.article_id}-{card_b.article_id}-{criterion_name}",
-                "compared"
-            )
-            return result
+    Returns:
+        Tuple of (final_article, validation_result)
+    """
+    article = ""
+    validation = None
 
-        except Exception as e:
-            error_collector.add_error(
-                f"{card_a.article_id}-{card_b.article_id}-{criterion_name}",
-                e
-            )
-            raise
+    for attempt in range(1, max_retries + 1):
+        if verbose and attempt > 1:
+            print(f"  Retry attempt {attempt}/{max_retries}...")
 
-    # Execute comparisons in parallel
-    with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
-        futures = {executor.submit(worker_compare, task): task for task in tasks}
-        for future in as_completed(futures):
-            try:
-                future.result()
-            except Exception:
-                pass  # Errors already collected
+        # Generate article
+        article = synthesize_final_article(
+            blueprint=blueprint,
+            original_user_prompt=original_user_prompt,
+            brand_guidelines=brand_guidelines,
+            target_word_count=target_word_count,
+            verbose=verbose,
+            filter_think=filter_think,
+            models=models
+        )
 
-    # Convert win counts to ArticleScore objects
-    max_wins = len(cards) - 1
-    all_scores = []
+        # Validate
+        validation = validate_synthesized_article(
+            article=article,
+            blueprint=blueprint,
+            original_scores=original_scores,
+            verbose=verbose,
+            validation_retry_count=3,
+            validation_retry_delay=2.0,
+            models=models
+        )
+        
+        if validation.passed:
+            if verbose:
+                print(f"✓ Validation passed on attempt {attempt}")
+            break
+        
+        # Add feedback to blueprint for next attempt
+        if attempt < max_retries:
+            add_validation_feedback(blueprint, validation)
+    
+    return article, validation
 
-    for card in cards:
-        scores_dict = {}
-        total_weighted_score = 0.0
 
-        for criterion_name, criterion_info in criteria.items():
-            wins = win_counts[card.article_id][criterion_name]
-            score = wins_to_score(wins, max_wins)
-            scores_dict[criterion_name] = {
-                "score": round(score, 1),
-                "justification": f"Won {wins}/{max_wins} pairwise comparisons",
-                "wins": wins,
-                "median": round(score, 1)
-            }
-            total_weighted_score += score * criterion_info["weight"]
+# ============================================================================
+# ASYNCIO EXECUTION ENGINE
+# Purpose: Run every stage on a single event loop with AsyncOpenAI so
+# thousands of requests can be in flight without a thread per request
+# ============================================================================
 
-        criterion_scores = [(name, scores_dict[name]["score"]) for name in criteria.keys()]
-        criterion_scores.sort(key=lambda x: x[1], reverse=True)
+async def _gather_bounded(coroutines: List[Any], max_concurrent: int, stage: str) -> List[Any]:
+    """
+    Await coroutines on slots of the shared task scheduler (at least max_concurrent of them).
 
-        strengths = [f"Strong {name} ({score:.1f})" for name, score in criterion_scores[:2] if score >= 7]
-        weaknesses = [f"Weak {name} ({score:.1f})" for name, score in criterion_scores[-2:] if score < 6]
+    Args:
+        coroutines: One coroutine per LLM call
+        max_concurrent: Concurrency budget requested by this fan-out
+        stage: Pipeline stage, which sets the priority of queued coroutines
 
-        article_score = ArticleScore(
-            article_id=card.article_id,
-            scores=scores_dict,
-            overall_score=round(total_weighted_score, 2),
-            standout_strengths=strengths,
-            critical_weaknesses=weaknesses
-        )
-        all_scores.append(article_score)
+    Returns:
+        Results in input order; failed coroutines yield their exception
+    """
+    llm_scheduler.ensure_capacity(max(1, adaptive_concurrency.worker_count(max_concurrent)))
+    return await asyncio.gather(*(llm_scheduler.run_async(stage, c) for c in coroutines), return_exceptions=True)
 
-    if verbose:
-        failed = len(error_collector.get_errors())
-        print(f"\n✓ Parallel pairwise scoring complete")
-        if failed > 0:
-            print(f"  Failed comparisons: {failed}")
-        for score in all_scores:
-            print(f"  Article #{score.article_id}: {score.overall_score:.2f}")
-        print()
 
-    return all_scores
+def run_coroutine(coroutine) -> Any:
+    """Run a coroutine on a fresh event loop and close its pooled async clients."""
+    async def runner():
+        try:
+            return await coroutine
+        finally:
+            await llm_client_registry.aclose()
 
+    return asyncio.run(runner())
 
-# ============================================================================
-# PIPELINE STAGE 4: SELECT
-# Purpose: Analyze scores and select best elements for synthesis
-# ============================================================================
 
-def select_best_elements(
-    cards: List[ArticleCard],
-    scores: List[ArticleScore],
+async def extract_article_card_async(
+    article_content: str,
+    article_id: int,
+    verbose: bool = False,
+    retry_count: int = 3,
+    models: Optional[PipelineModels] = None
+) -> ArticleCard:
+    """Async version of extract_article_card."""
+    return await build_extract_call(article_content, article_id, retry_count).send_async(verbose, models)
+
+
+async def extract_all_article_cards_async(
+    candidates: List[ArticleCandidate],
+    max_concurrent: int = 5,
     verbose: bool = False,
-    filter_think: bool = True
-) -> SynthesisBlueprint:
+    retry_count: int = 3,
+    models: Optional[PipelineModels] = None
+) -> List[ArticleCard]:
     """
-    Analyze all cards and scores to select best elements for synthesis.
+    Extract article cards from all candidates concurrently on the event loop.
 
     Args:
-        cards: List of ArticleCards
-        scores: List of corresponding ArticleScore objects
+        candidates: List of generated article candidates
+        max_concurrent: Maximum in-flight LLM requests
         verbose: Enable progress logging
-        filter_think: Whether to filter out think tags from LLM responses
+        retry_count: Number of retry attempts for failed extractions
+        models: Presets per stage (default: the environment's pipeline model)
 
     Returns:
-        SynthesisBlueprint specifying how to combine elements
+        List of ArticleCard objects in candidate order
     """
     if verbose:
         print(f"\n{'='*80}")
-        print("PIPELINE STAGE 4: SELECT")
+        print("ASYNC EXTRACTION STAGE")
         print(f"{'='*80}")
-        print(f"Analyzing {len(cards)} articles to select best elements...")
-
-    # Build analysis input (compressed view)
-    analysis_input = []
-    for card, score in zip(cards, scores):
-        analysis_input.append({
-            "article_id": card.article_id,
-            "headline_candidates": card.headline_candidates,
-            "opening_hook": card.opening_hook[:200] + "...",  # Truncate for context
-            "core_argument": card.core_argument,
-            "key_points": card.key_points,
-            "structural_approach": card.structural_approach,
-            "memorable_phrases": card.memorable_phrases,
-            "scores": {k: v["score"] for k, v in score.scores.items()},
-            "overall_score": score.overall_score
-        })
-
-    select_system_prompt = read_reference_file("prompts/pipeline_stage4_select_system.md")
-
-    select_user_prompt = f"""Analyze these {len(cards)} article drafts and create a synthesis blueprint.
-
-## Article Summaries and Scores
-{json.dumps(analysis_input, indent=2)}
-
-Create a synthesis blueprint that combines the best elements into one superior article.
-
-Respond with only the JSON object."""
+        print(f"Extracting {len(candidates)} cards with max {max_concurrent} in-flight requests...")
 
-    # Prepare input text for metrics tracking
-    input_text = select_system_prompt + "\n\n" + select_user_prompt
+    await warm_prefix_cache_async("EXTRACT", verbose=verbose, models=models)
 
-    # Send to LLM with timing
-    llm_start_time = time.time()
-    response = send_to_llm(
-        llm_user_prompt=select_user_prompt,
-        llm_system_prompt=select_system_prompt,
-        temperature=0.4,  # Some analytical creativity
-        max_tokens=6000,
-        verbose=verbose
+    results = await _gather_bounded(
+        [
+            extract_article_card_async(
+                article_content=candidate.content,
+                article_id=candidate.article_id,
+                retry_count=retry_count,
+                models=models
+            )
+            for candidate in candidates
+        ],
+        max_concurrent,
+        stage="EXTRACT"
     )
-    llm_end_time = time.time()
-    execution_time = llm_end_time - llm_start_time
 
-    # Filter out think tags if requested
-    if filter_think:
-        response = filter_think_tags(response)
+    cards = []
+    for candidate, result in zip(candidates, results):
+        if isinstance(result, BaseException):
+            if verbose:
+                print(f"  ✗ Failed to extract Article #{candidate.article_id}: {result}")
+        else:
+            cards.append(result)
 
-    # Extract JSON from response (handles markdown code blocks and think tags)
-    json_str = extract_json_from_response(response)
-    
-    # Debug: Check if response is empty after extraction
-    if not json_str or json_str.isspace():
-        raise ValueError("Empty response after filtering. LLM may have only returned thinking content or invalid format.")
-    
-    try:
-        blueprint_data = json.loads(json_str)
-    except json.JSONDecodeError as e:
-        # Provide more context in error message
-        if verbose:
-            print(f"\nFailed to parse JSON response:")
-            print(f"Extracted JSON preview: {json_str[:500]}")
-        raise ValueError(f"Invalid JSON response from LLM: {e}. JSON preview: {json_str[:200]}")
-    
-    # Create blueprint with all required fields including confidence
-    blueprint_dict = blueprint_data["synthesis_blueprint"].copy()
-    blueprint_dict["confidence"] = blueprint_data["confidence"]
-    
-    blueprint = SynthesisBlueprint(**blueprint_dict)
-    
-    # Track LLM call metrics
-    track_llm_call("SELECT", input_text, json_str, execution_time)
-    
     if verbose:
-        print(f"✓ Blueprint created. Confidence: {blueprint.confidence['level']}\n")
-    
-    return blueprint
+        print(f"✓ Async extraction complete: {len(cards)}/{len(candidates)} cards extracted\n")
 
+    return cards
 
-# ============================================================================
-# PIPELINE STAGE 5: SYNTHESIZE
-# Purpose: Generate final article from synthesis blueprint
-# ============================================================================
 
-def synthesize_final_article(
-    blueprint: SynthesisBlueprint,
-    original_user_prompt: str,
-    brand_guidelines: str,
-    target_word_count: int = 1500,
+async def score_article_card_async(
+    card: ArticleCard,
+    criteria: Dict[str, Dict[str, Any]],
     verbose: bool = False,
-    filter_think: bool = True
-) -> str:
+    models: Optional[PipelineModels] = None
+) -> ArticleScore:
+    """Async version of score_article_card."""
+    return await build_score_call(card, criteria).send_async(verbose, models)
+
+
+async def score_all_cards_with_voting_async(
+    cards: List[ArticleCard],
+    max_concurrent: int = 5,
+    votes: int = 3,
+    criteria: Dict[str, Dict[str, Any]] = SCORING_CRITERIA,
+    verbose: bool = False,
+    models: Optional[PipelineModels] = None
+) -> List[ArticleScore]:
     """
-    Generate final article from synthesis blueprint.
+    Score all cards with voting, issuing every card×vote request concurrently.
 
     Args:
-        blueprint: SynthesisBlueprint with specifications
-        original_user_prompt: The original topic/brief
-        brand_guidelines: Company brand guidelines (from existing system prompt)
-        target_word_count: Desired article length
+        cards: List of ArticleCards to score
+        max_concurrent: Maximum in-flight LLM requests
+        votes: Number of voting rounds per card
+        criteria: Scoring criteria dictionary
         verbose: Enable progress logging
-        filter_think: Whether to filter out think tags from LLM responses
+        models: Presets per stage (default: the environment's pipeline model)
 
     Returns:
-        Final synthesized article text
+        List of averaged ArticleScore objects in card order
     """
     if verbose:
         print(f"\n{'='*80}")
-        print("PIPELINE STAGE 5: SYNTHESIZE")
+        print("ASYNC SCORING STAGE")
         print(f"{'='*80}")
-        print(f"Generating final article from blueprint...")
+        print(f"Scoring {len(cards)} cards with {votes} votes each, max {max_concurrent} in-flight...")
 
-    # Load prompt template and substitute variables
-    prompt_template = read_reference_file("prompts/pipeline_stage5_synthesize_system.md")
-    writing_style_content = read_reference_file("reference_context/writing_style-enhanced.md")
+    await warm_prefix_cache_async("SCORE", criteria, verbose, models=models)
 
-    synthesize_system_prompt = prompt_template.format(
-        brand_guidelines=brand_guidelines,
-        writing_style_content = writing_style_content,
-        target_word_count=target_word_count
+    results = await _gather_bounded(
+        [
+            score_article_card_async(card, criteria, models=models)
+            for card in cards
+            for _ in range(votes)
+        ],
+        max_concurrent,
+        stage="SCORE"
     )
 
-    synthesize_user_prompt = f"""Write a marketing blog article following this synthesis blueprint.
-## Original Brief
-{original_user_prompt}
-
-## Synthesis Blueprint
-{json.dumps(blueprint.__dict__, indent=2)}
-
-Write the complete article now. Start directly with the headline."""
+    all_scores = []
+    for index, card in enumerate(cards):
+        card_results = results[index * votes:(index + 1) * votes]
+        card_votes = [r for r in card_results if not isinstance(r, BaseException)]
+        if verbose:
+            for vote_num, r in enumerate(card_results):
+                if isinstance(r, BaseException):
+                    print(f"    ⚠ Vote {vote_num + 1} failed for card {card.article_id}: {r}")
+        score = average_card_votes(card, card_votes, verbose)
+        if score is not None:
+            all_scores.append(score)
 
-    # Prepare input text for metrics tracking
-    input_text = synthesize_system_prompt + "\n\n" + synthesize_user_prompt
+    if verbose:
+        print(f"✓ Async scoring complete: {len(all_scores)}/{len(cards)} cards scored\n")
 
-    # Send to LLM with timing
-    llm_start_time = time.time()
-    article = send_to_llm(
-        llm_user_prompt=synthesize_user_prompt,
-        llm_system_prompt=synthesize_system_prompt,
-        temperature=0.7,  # Higher temp for creative writing
-        max_tokens=8000,
-        verbose=verbose
-    )
-    llm_end_time = time.time()
-    execution_time = llm_end_time - llm_start_time
+    return all_scores
 
-    # Filter out think tags if requested
-    if filter_think:
-        article = filter_think_tags(article)
-    
-    # Track LLM call metrics
-    track_llm_call("SYNTHESIZE", input_text, article, execution_time)
-    
-    if verbose:
-        word_count = len(article.split())
-        print(f"✓ Synthesized article generated ({word_count} words)\n")
-    
-    return article
 
+async def pairwise_compare_articles_async(
+    card_a: ArticleCard,
+    card_b: ArticleCard,
+    criterion: str,
+    criterion_description: str,
+    verbose: bool = False,
+    models: Optional[PipelineModels] = None
+) -> PairwiseResult:
+    """Async version of pairwise_compare_articles."""
+    return await build_pairwise_call(card_a, card_b, criterion, criterion_description).send_async(verbose, models)
 
-# ============================================================================
-# PIPELINE STAGE 6: VALIDATE
-# Purpose: Verify synthesized article meets quality standards
-# ============================================================================
 
-def validate_synthesized_article(
-    article: str,
-    blueprint: SynthesisBlueprint,
-    original_scores: List[ArticleScore],
+async def score_all_cards_pairwise_async(
+    cards: List[ArticleCard],
+    max_concurrent: int = 5,
+    criteria: Dict[str, Dict[str, Any]] = SCORING_CRITERIA,
     verbose: bool = False,
-    validation_retry_count: int = 3,
-    validation_retry_delay: float = 2.0,
-    filter_think: bool = True
-) -> ValidationResult:
+    models: Optional[PipelineModels] = None
+) -> List[ArticleScore]:
     """
-    Validate that synthesized article meets quality standards with retry loop.
+    Score all cards using pairwise comparison with every pair×criterion in flight at once.
 
     Args:
-        article: Synthesized article text
-        blueprint: SynthesisBlueprint it should follow
-        original_scores: Scores from source articles
+        cards: List of ArticleCards to score
+        max_concurrent: Maximum in-flight LLM requests
+        criteria: Scoring criteria dictionary
         verbose: Enable progress logging
-        validation_retry_count: Number of validation retry attempts (default: 3)
-        validation_retry_delay: Delay between validation retries in seconds (default: 2.0)
-        filter_think: Whether to filter out think tags from LLM responses
+        models: Presets per stage (default: the environment's pipeline model)
 
     Returns:
-        ValidationResult with pass/fail and detailed feedback
+        List of ArticleScore objects with scores derived from pairwise rankings
     """
-    if verbose:
-        print(f"\n{'='*80}")
-        print("PIPELINE STAGE 6: VALIDATE")
-        print(f"{'='*80}")
-        print("Validating synthesized article...")
-
-    # Calculate target threshold (should beat average of sources)
-    avg_source_score = sum(s.overall_score for s in original_scores) / len(original_scores)
-    target_threshold = avg_source_score + 0.5
+    tasks = pairwise_tasks(cards, criteria)
 
-    validate_system_prompt = f"""You are a content quality assurance agent. You will receive:
-1. A synthesized article
-2. The blueprint it was supposed to follow
-3. A target quality threshold
+    if verbose:
+        n_pairs = len(cards) * (len(cards) - 1) // 2
+        print_stage_banner(
+            "ASYNC PAIRWISE SCORING MODE",
+            f"Comparing {len(cards)} articles ({n_pairs} pairs × {len(criteria)} criteria = {len(tasks)} comparisons)..."
+        )
 
-Your job is to verify the article meets requirements and identify any issues.
+    await warm_prefix_cache_async("PAIRWISE", verbose=verbose, models=models)
 
-You must respond with ONLY a valid JSON object.
+    results = await _gather_bounded(
+        [
+            pairwise_compare_articles_async(
+                card_a=card_a,
+                card_b=card_b,
+                criterion=criterion_name,
+                criterion_description=criterion_desc,
+                models=models
+            )
+            for card_a, card_b, criterion_name, criterion_desc in tasks
+        ],
+        max_concurrent,
+        stage="PAIRWISE"
+    )
 
-## Validation Checks
+    win_counts: Dict[int, Dict[str, float]] = {
+        card.article_id: {crit: 0.0 for crit in criteria.keys()}
+        for card in cards
+    }
+    failed = 0
+    for result in results:
+        if isinstance(result, BaseException):
+            failed += 1
+        else:
+            record_pairwise_win(win_counts, result)
 
-1. BLUEPRINT COMPLIANCE
-   - Does the article use the specified headline?
-   - Does it follow the specified structure?
-   - Does it include the core argument?
-   - Are the supporting points present?
-   - Is the evidence included where specified?
-   - Are the memorable phrases preserved verbatim?
-   - Does it avoid the listed weaknesses?
+    all_scores = win_counts_to_scores(cards, criteria, win_counts)
 
-2. QUALITY ASSESSMENT
-   - Score the final article on the same criteria used for source articles
-   - Compare to target threshold
+    if verbose:
+        report_pairwise_scores("Async pairwise scoring", all_scores, failed)
 
-3. COHERENCE CHECK
-   - Does the article flow naturally?
-   - Are transitions smooth?
-   - Is the tone consistent?
-   - Does it feel like one coherent piece (not Frankenstein'd together)?
+    return all_scores
 
-## Output Schema
 
-{{
-  "passed": <boolean>,
-  "blueprint_compliance": {{
-    "headline_used": <boolean>,
-    "structure_followed": <boolean>,
-    "core_argument_present": <boolean>,
-    "supporting_points_included": <float 0-1, what percentage>,
-    "evidence_included": <float 0-1>,
-    "phrases_preserved": <float 0-1>,
-    "weaknesses_avoided": <boolean>,
-    "compliance_score": <float 0-1>
-  }},
-  "quality_scores": {{
-    "hook_strength": <1-10>,
-    "argument_clarity": <1-10>,
-    "evidence_quality": <1-10>,
-    "structural_coherence": <1-10>,
-    "originality": <1-10>,
-    "memorability": <1-10>,
-    "actionability": <1-10>,
-    "overall": <float>
-  }},
-  "coherence_assessment": {{
-    "flow_natural": <boolean>,
-    "transitions_smooth": <boolean>,
-    "tone_consistent": <boolean>,
-    "feels_unified": <boolean>
-  }},
-  "issues": [
-    "<specific issue 1>",
-    "<specific issue 2>"
-  ],
-  "improvement_suggestions": [
-    "<specific suggestion if failed>"
-  ],
-  "target_threshold": {target_threshold},
-  "threshold_met": <boolean>
-}}"""
+async def select_best_elements_async(
+    cards: List[ArticleCard],
+    scores: List[ArticleScore],
+    verbose: bool = False,
+    models: Optional[PipelineModels] = None
+) -> SynthesisBlueprint:
+    """Async version of select_best_elements."""
+    if verbose:
+        print_stage_banner("PIPELINE STAGE 4: SELECT", f"Analyzing {len(cards)} articles to select best elements...")
 
-    validate_user_prompt = f"""Validate this synthesized article against its blueprint.
+    blueprint = await build_select_call(cards, scores, verbose).send_async(verbose, models)
 
-## Synthesized Article
-{article}
+    if verbose:
+        print(f"✓ Blueprint created. Confidence: {blueprint.confidence['level']}\n")
 
-## Blueprint It Should Follow
-{json.dumps(blueprint.__dict__, indent=2)}
+    return blueprint
 
-## Target Quality Threshold
-The article should achieve an overall score of at least {target_threshold:.1f}
 
-Evaluate and respond with the validation JSON."""
+async def synthesize_final_article_async(
+    blueprint: SynthesisBlueprint,
+    original_user_prompt: str,
+    brand_guidelines: str,
+    target_word_count: int = 1500,
+    verbose: bool = False,
+    filter_think: bool = True,
+    models: Optional[PipelineModels] = None
+) -> str:
+    """Async version of synthesize_final_article."""
+    if verbose:
+        print_stage_banner("PIPELINE STAGE 5: SYNTHESIZE", "Generating final article from blueprint...")
 
-    # Prepare input text for metrics tracking
-    input_text = validate_system_prompt + "\n\n" + validate_user_prompt
-    
-    last_error = None
-    for attempt in range(validation_retry_count):
-        try:
-            if verbose and attempt > 0:
-                print(f"  Validation retry attempt {attempt + 1}/{validation_retry_count}...")
-            
-            # Send to LLM with timing
-            llm_start_time = time.time()
-            response = send_to_llm(
-                llm_user_prompt=validate_user_prompt,
-                llm_system_prompt=validate_system_prompt,
-                temperature=0.2,  # Low temp for consistent judgment
-                max_tokens=4000,
-                verbose=verbose
-            )
-            llm_end_time = time.time()
-            execution_time = llm_end_time - llm_start_time
+    call = build_synthesize_call(blueprint, original_user_prompt, brand_guidelines, target_word_count, filter_think)
+    article = await call.send_async(verbose, models)
 
-            # Filter out think tags if requested
-            if filter_think:
-                response = filter_think_tags(response)
+    if verbose:
+        report_synthesized_article(article)
 
-            # Extract JSON from response (handles markdown code blocks and think tags)
-            json_str = extract_json_from_response(response)
-            
-            validation_data = json.loads(json_str)
-            
-            # Handle field name mismatch between LLM output and dataclass
-            # LLM may return 'quality_score' but dataclass expects 'quality_scores'
-            if 'quality_score' in validation_data and 'quality_scores' not in validation_data:
-                validation_data['quality_scores'] = validation_data.pop('quality_score')
-            
-            result = ValidationResult(**validation_data)
-            
-            # Track LLM call metrics
-            track_llm_call("VALIDATE", input_text, json_str, execution_time)
-            
-            if verbose:
-                status = "✓ PASSED" if result.passed else "✗ FAILED"
-                print(f"{status} - Overall score: {result.quality_scores['overall']:.1f} (threshold: {target_threshold:.1f})")
-                if not result.passed and result.issues:
-                    print(f"  Issues identified: {len(result.issues)}")
-                    for issue in result.issues[:3]:  # Show first 3
-                        print(f"    - {issue}")
-                print()
-            
-            return result
-            
-        except (json.JSONDecodeError, ValueError) as e:
-            last_error = e
-            if verbose:
-                print(f"  ⚠ Validation attempt {attempt + 1} failed: {e}")
-            
-            if attempt < validation_retry_count - 1:  # Don't sleep on the last attempt
-                if verbose:
-                    print(f"  Retrying validation in {validation_retry_delay} seconds...")
-                time.sleep(validation_retry_delay)
-    
-    # If we get here, all validation retries failed
-    raise RuntimeError(f"Failed to validate article after {validation_retry_count} attempts. Last error: {last_error}")
+    return article
 
 
-def synthesize_with_validation_loop(
+async def validate_synthesized_article_async(
+    article: str,
+    blueprint: SynthesisBlueprint,
+    original_scores: List[ArticleScore],
+    verbose: bool = False,
+    validation_retry_count: int = 3,
+    validation_retry_delay: float = 2.0,
+    models: Optional[PipelineModels] = None
+) -> ValidationResult:
+    """Async version of validate_synthesized_article."""
+    if verbose:
+        print_stage_banner("PIPELINE STAGE 6: VALIDATE", "Validating synthesized article...")
+
+    call, target_threshold = build_validate_call(
+        article, blueprint, original_scores, validation_retry_count, validation_retry_delay
+    )
+    result = await call.send_async(verbose, models)
+
+    if verbose:
+        report_validation(result, target_threshold)
+
+    return result
+
+
+async def synthesize_with_validation_loop_async(
     blueprint: SynthesisBlueprint,
     original_user_prompt: str,
     brand_guidelines: str,
@@ -2078,24 +6336,10 @@ def synthesize_with_validation_loop(
     target_word_count: int = 1500,
     max_retries: int = 3,
     verbose: bool = False,
-    filter_think: bool = True
+    filter_think: bool = True,
+    models: Optional[PipelineModels] = None
 ) -> tuple[str, ValidationResult | None]:
-    """
-    Synthesize article with validation retry loop.
-
-    Args:
-        blueprint: SynthesisBlueprint
-        original_user_prompt: Original topic/brief
-        brand_guidelines: Company brand guidelines
-        original_scores: Scores from source articles
-        target_word_count: Desired article length
-        max_retries: Maximum synthesis attempts
-        verbose: Enable progress logging
-        filter_think: Whether to filter out think tags from LLM responses
-
-    Returns:
-        Tuple of (final_article, validation_result)
-    """
+    """Async version of synthesize_with_validation_loop."""
     article = ""
     validation = None
 
@@ -2103,37 +6347,34 @@ def synthesize_with_validation_loop(
         if verbose and attempt > 1:
             print(f"  Retry attempt {attempt}/{max_retries}...")
 
-        # Generate article
-        article = synthesize_final_article(
+        article = await synthesize_final_article_async(
             blueprint=blueprint,
             original_user_prompt=original_user_prompt,
             brand_guidelines=brand_guidelines,
             target_word_count=target_word_count,
             verbose=verbose,
-            filter_think=filter_think
+            filter_think=filter_think,
+            models=models
         )
 
-        # Validate
-        validation = validate_synthesized_article(
+        validation = await validate_synthesized_article_async(
             article=article,
             blueprint=blueprint,
             original_scores=original_scores,
             verbose=verbose,
             validation_retry_count=3,
             validation_retry_delay=2.0,
-            filter_think=filter_think
+            models=models
         )
-        
+
         if validation.passed:
             if verbose:
                 print(f"✓ Validation passed on attempt {attempt}")
             break
-        
-        # Add feedback to blueprint for next attempt
+
         if attempt < max_retries:
-            feedback = f"\n\nPREVIOUS ATTEMPT FAILED. Issues: {', '.join(validation.issues[:3])}"
-            blueprint.synthesis_notes += feedback
-    
+            add_validation_feedback(blueprint, validation)
+
     return article, validation
 
 
@@ -2143,11 +6384,16 @@ def synthesize_with_validation_loop(
 # ============================================================================
 
 class ArticleSynthesisPipeline:
-    """Orchestrates the complete 5-stage synthesis pipeline."""
+    """Orchestrates the complete 5-stage synthesis pipeline.
+
+    Each pipeline carries its own PipelineModels, so pipelines with different
+    presets can run concurrently in one process.
+    """
 
-    def __init__(self, verbose: bool = False, filter_think: bool = True):
+    def __init__(self, verbose: bool = False, filter_think: bool = True, models: Optional[PipelineModels] = None):
         self.verbose = verbose
         self.filter_think = filter_think
+        self.models = models
         self.artifacts = {}  # Store intermediate results
 
     def run(
@@ -2186,10 +6432,10 @@ class ArticleSynthesisPipeline:
                     candidates=candidates,
                     max_concurrent=max_concurrent,
                     verbose=self.verbose,
-                    filter_think=self.filter_think
+                    models=self.models
                 )
             else:
-                cards = extract_all_article_cards(candidates, self.verbose, self.filter_think)
+                cards = extract_all_article_cards(candidates, self.verbose, models=self.models)
             self.artifacts['cards'] = cards
 
             # STAGE 3: SCORE (with scoring mode selection)
@@ -2200,13 +6446,13 @@ class ArticleSynthesisPipeline:
                         cards=cards,
                         max_concurrent=max_concurrent,
                         verbose=self.verbose,
-                        filter_think=self.filter_think
+                        models=self.models
                     )
                 else:
                     scores = score_all_cards_pairwise(
                         cards=cards,
                         verbose=self.verbose,
-                        filter_think=self.filter_think
+                        models=self.models
                     )
             else:
                 # Absolute scoring mode (default) with voting
@@ -2216,20 +6462,20 @@ class ArticleSynthesisPipeline:
                         max_concurrent=max_concurrent,
                         votes=scoring_votes,
                         verbose=self.verbose,
-                        filter_think=self.filter_think
+                        models=self.models
                     )
                 else:
                     scores = score_all_cards_with_voting(
                         cards,
                         votes=scoring_votes,
                         verbose=self.verbose,
-                        filter_think=self.filter_think
+                        models=self.models
                     )
             self.artifacts['scores'] = scores
             self.artifacts['scoring_mode'] = scoring_mode
 
             # STAGE 4: SELECT
-            blueprint = select_best_elements(cards, scores, self.verbose, self.filter_think)
+            blueprint = select_best_elements(cards, scores, self.verbose, models=self.models)
             self.artifacts['blueprint'] = blueprint
 
             # STAGE 5 & 6: SYNTHESIZE + VALIDATE (with retry loop)
@@ -2242,7 +6488,8 @@ class ArticleSynthesisPipeline:
                 target_word_count=target_word_count,
                 max_retries=max_synthesis_retries,
                 verbose=self.verbose,
-                filter_think=self.filter_think
+                filter_think=self.filter_think,
+                models=self.models
             )
             
             return {
@@ -2259,6 +6506,92 @@ class ArticleSynthesisPipeline:
                 print(f"{'='*80}\n")
             raise
 
+    async def run_async(
+        self,
+        candidates: List[ArticleCandidate],
+        original_user_prompt: str,
+        brand_guidelines: str,
+        target_word_count: int = 1500,
+        scoring_votes: int = 5,
+        max_synthesis_retries: int = 3,
+        max_concurrent: int = 5,
+        scoring_mode: str = "absolute"
+    ) -> Dict:
+        """
+        Execute complete pipeline on the asyncio engine.
+
+        Fan-out stages (EXTRACT, SCORE) always run concurrently, bounded by
+        max_concurrent in-flight requests. Produces the same result dict as run().
+
+        Args:
+            candidates: List of generated article candidates
+            original_user_prompt: Original topic/brief
+            brand_guidelines: Company brand guidelines
+            target_word_count: Desired final article length
+            scoring_votes: Number of voting rounds for scoring (absolute mode only)
+            max_synthesis_retries: Max synthesis attempts on validation failure
+            max_concurrent: Maximum in-flight requests for fan-out stages
+            scoring_mode: "absolute" (1-10 scores with voting) or "pairwise" (head-to-head comparison)
+
+        Returns:
+            Dict with final_article, validation, and all intermediate artifacts
+        """
+        try:
+            cards = await extract_all_article_cards_async(
+                candidates=candidates,
+                max_concurrent=max_concurrent,
+                verbose=self.verbose,
+                models=self.models
+            )
+            self.artifacts['cards'] = cards
+
+            if scoring_mode == "pairwise":
+                scores = await score_all_cards_pairwise_async(
+                    cards=cards,
+                    max_concurrent=max_concurrent,
+                    verbose=self.verbose,
+                    models=self.models
+                )
+            else:
+                scores = await score_all_cards_with_voting_async(
+                    cards=cards,
+                    max_concurrent=max_concurrent,
+                    votes=scoring_votes,
+                    verbose=self.verbose,
+                    models=self.models
+                )
+            self.artifacts['scores'] = scores
+            self.artifacts['scoring_mode'] = scoring_mode
+
+            blueprint = await select_best_elements_async(cards, scores, self.verbose, models=self.models)
+            self.artifacts['blueprint'] = blueprint
+
+            final_article, validation = await synthesize_with_validation_loop_async(
+                blueprint=blueprint,
+                original_user_prompt=original_user_prompt,
+                brand_guidelines=brand_guidelines,
+                original_scores=scores,
+                target_word_count=target_word_count,
+                max_retries=max_synthesis_retries,
+                verbose=self.verbose,
+                filter_think=self.filter_think,
+                models=self.models
+            )
+
+            return {
+                'final_article': final_article,
+                'validation': validation,
+                'artifacts': self.artifacts,
+                'num_source_articles': len(candidates)
+            }
+
+        except Exception as e:
+            if self.verbose:
+                print(f"\n{'='*80}")
+                print(f"PIPELINE ERROR: {e}")
+                print(f"{'='*80}\n")
+            raise
+
 
 # ============================================================================
 # GLOBAL METRICS TRACKING
@@ -2271,24 +6604,168 @@ pipeline_metrics = PipelineMetrics()
 _metrics_lock = threading.Lock()
 
 def track_llm_call(stage_name: str, input_text: str, output_text: str, execution_time: float):
-    """Track a single LLM call with timing and token metrics (thread-safe)."""
-    stage_mapping = {
-        "CANDIDATES": pipeline_metrics.candidates_stage,
-        "EXTRACT": pipeline_metrics.extract_stage,
-        "SCORE": pipeline_metrics.score_stage,
-        "SELECT": pipeline_metrics.select_stage,
-        "SYNTHESIZE": pipeline_metrics.synthesize_stage,
-        "VALIDATE": pipeline_metrics.validate_stage
-    }
-    
-    if stage_name in stage_mapping:
+    """Track a single LLM call with timing and word metrics (thread-safe).
+
+    A response served from the response cache or by an identical in-flight
+    request is not a call: it is only counted as a cache hit or coalesced request.
+    """
+    stage = pipeline_metrics.get_stage(stage_name)
+    if stage is not None and llm_response_source.get() == "api":
         with _metrics_lock:
-            stage = stage_mapping[stage_name]
             stage.add_input(input_text)
             stage.add_output(output_text)
             stage.add_execution_time(execution_time)
             stage.llm_calls += 1
 
+def track_token_usage(request: LLMRequest, response: LLMResponse, duration: float):
+    """Record the real (or, without usage, estimated) token counts of one API request (thread-safe)."""
+    counts = usage_token_counts(response.usage)
+    estimated = counts is None
+    if estimated:
+        counts = {
+            "prompt_tokens": count_message_tokens(request.api_params.get("messages", [])),
+            "completion_tokens": count_tokens(response.content or ""),
+            "cached_tokens": 0,
+            "reasoning_tokens": 0,
+        }
+    if not counts["reasoning_tokens"]:
+        # Servers without a reasoning parser return the thinking inline as <think> blocks
+        think_tokens = sum(count_think_tokens(text) for text in (response.choices or [response.content or ""]))
+        counts["reasoning_tokens"] = min(counts["completion_tokens"], think_tokens)
+    stage = pipeline_metrics.get_stage(request.stage) if request.stage else None
+    if stage is not None:
+        # The scans are memoized, so the response checks and parsers reuse them
+        scans = ([scan_response(text) for text in (response.choices or [response.content or ""])]
+                 if request.stage in JSON_STAGES else [])
+        with _metrics_lock:
+            stage.add_usage(request.label, counts, duration, estimated)
+            for scanned in scans:
+                stage.response_bytes += scanned.discarded_bytes + len(scanned.json.encode("utf-8"))
+                stage.discarded_bytes += scanned.discarded_bytes
+                stage.reasoning_bytes += scanned.reasoning_bytes
+    if response.finish_reason != "length":
+        # Truncated outputs only show the budget, not the length the stage needs
+        choices = max(1, len(response.choices))
+        output_length_stats.record(request.length_stage, request.label, counts["completion_tokens"] // choices, choices)
+
+def track_truncation_retry(stage_name: Optional[str], label: str):
+    """Record a response truncated under an auto max_tokens budget and resent with a larger one (thread-safe)."""
+    with _metrics_lock:
+        key = f"{stage_name or 'LLM'}/{label}"
+        pipeline_metrics.truncation_retries[key] = pipeline_metrics.truncation_retries.get(key, 0) + 1
+
+def track_context_packing(preset_name: str, packed: "PackedContext"):
+    """Record how a candidate preset's reference context was packed into its budget (thread-safe)."""
+    with _metrics_lock:
+        pipeline_metrics.context_packing[preset_name] = {
+            "budget": packed.budget,
+            "full_tokens": packed.full_tokens,
+            "packed_tokens": packed.packed_tokens,
+            "condensed": len(packed.condensed),
+            "dropped_sections": packed.dropped_sections
+        }
+
+def track_context_retrieval(heading: str, **stats: Any):
+    """Record the sections retrieved for one reference file and the time it took (thread-safe)."""
+    with _metrics_lock:
+        pipeline_metrics.context_retrieval[heading] = stats
+
+def track_prefix_warmup(stage_name: str):
+    """Count a warm-up prefill sent before a stage's fan-out (thread-safe)."""
+    stage = pipeline_metrics.get_stage(stage_name)
+    if stage is not None:
+        with _metrics_lock:
+            stage.prefix_warmups += 1
+
+def track_stream_metrics(
+    stage_name: Optional[str],
+    preset: str,
+    ttft: Optional[float],
+    tokens: int,
+    decode_time: float,
+    early_stop: bool
+):
+    """Record TTFT and tokens/sec for a streamed call (thread-safe)."""
+    stage = pipeline_metrics.get_stage(stage_name) if stage_name else None
+    if stage is not None:
+        with _metrics_lock:
+            stage.add_stream_sample(preset, ttft, tokens, decode_time, early_stop)
+
+def track_breaker_transition(endpoint_url: str, old_state: str, new_state: str, reason: str):
+    """Record a circuit breaker state change for an endpoint (thread-safe)."""
+    with _metrics_lock:
+        pipeline_metrics.breaker_transitions.setdefault(endpoint_url, []).append(
+            (time.time(), old_state, new_state, reason)
+        )
+    print(f"  [Circuit breaker] {endpoint_url}: {old_state} → {new_state} ({reason})")
+
+def track_preset_fallback(preset_name: str, fallback_preset: str):
+    """Record a call that moved from a failing preset to its fallback (thread-safe)."""
+    with _metrics_lock:
+        route = f"{preset_name} → {fallback_preset}"
+        pipeline_metrics.fallback_counts[route] = pipeline_metrics.fallback_counts.get(route, 0) + 1
+
+def track_hedge(stage_name: Optional[str], label: str, outcome: str):
+    """Record the outcome of a hedging decision: hedge_won, primary_won or denied (thread-safe)."""
+    with _metrics_lock:
+        stats = pipeline_metrics.hedge_stats.setdefault(
+            f"{stage_name or 'LLM'}/{label}", {"hedge_won": 0, "primary_won": 0, "denied": 0}
+        )
+        stats[outcome] += 1
+
+def track_retry(error_class: str, allowed: bool):
+    """Record a retry decision for a failed LLM call (thread-safe)."""
+    with _metrics_lock:
+        if allowed:
+            pipeline_metrics.retry_counts[error_class] = pipeline_metrics.retry_counts.get(error_class, 0) + 1
+        else:
+            pipeline_metrics.retries_denied += 1
+
+def track_rate_limit_wait(provider: str, wait_time: float):
+    """Record time a request spent waiting for its provider's RPM/TPM budget (thread-safe)."""
+    with _metrics_lock:
+        stats = pipeline_metrics.rate_limit_stats.setdefault(
+            provider, {"requests": 0, "throttled": 0, "wait_time": 0.0}
+        )
+        stats["requests"] += 1
+        if wait_time > 0:
+            stats["throttled"] += 1
+            stats["wait_time"] += wait_time
+
+def track_concurrency_limit(provider: str, old_limit: int, new_limit: int, reason: str):
+    """Record an adaptive concurrency limit change for a provider (thread-safe)."""
+    with _metrics_lock:
+        pipeline_metrics.concurrency_history.setdefault(provider, []).append(
+            (time.time(), old_limit, new_limit, reason)
+        )
+    if adaptive_concurrency.verbose:
+        print(f"  [AIMD {provider}] concurrency {old_limit} → {new_limit} ({reason})")
+
+def track_cache_lookup(stage_name: str, hit: bool):
+    """Record a response cache lookup for a stage (thread-safe)."""
+    stage = pipeline_metrics.get_stage(stage_name)
+    if stage is not None:
+        with _metrics_lock:
+            if hit:
+                stage.cache_hits += 1
+            else:
+                stage.cache_misses += 1
+
+def track_coalesced_request(stage_name: Optional[str]):
+    """Count a request that shared an identical in-flight request's result (thread-safe)."""
+    stage = pipeline_metrics.get_stage(stage_name) if stage_name else None
+    if stage is not None:
+        with _metrics_lock:
+            stage.coalesced_requests += 1
+
+def track_client_pool_lookup(hit: bool):
+    """Record a client registry lookup as a pool hit or miss (thread-safe)."""
+    with _metrics_lock:
+        if hit:
+            pipeline_metrics.client_pool_hits += 1
+        else:
+            pipeline_metrics.client_pool_misses += 1
+
 def save_pipeline_artifacts(
     result: Dict,
     output_base: str,
@@ -2330,16 +6807,453 @@ def save_pipeline_artifacts(
         'blueprint': result['artifacts']['blueprint'].__dict__,
         'metadata': {
             'num_source_articles': result['num_source_articles'],
-            'timestamp': timestamp
+            'timestamp': timestamp,
+            'reference_hashes': reference_registry.hashes()
+        }
+    }
+    
+    artifacts_path.write_text(
+        json.dumps(serializable_artifacts, indent=2),
+        encoding='utf-8'
+    )
+    if verbose:
+        print(f"✓ Pipeline artifacts saved: {artifacts_path}")
+
+
+# ============================================================================
+# REFERENCE CONTEXT PACKING
+# Purpose: Fit the reference files of the candidate system prompt into a
+# per-preset token budget - condensed variants first, then whole sections in
+# priority order - so small models do not prefill the full context per call
+# ============================================================================
+
+# Reference files of the candidate system prompt as (heading, path), highest priority first
+GENERATION_CONTEXT_FILES: Tuple[Tuple[str, str], ...] = (
+    ("WRITING STYLE GUIDE", "reference_context/writing_style-enhanced.md"),
+    ("COMPANY CONTEXT", "reference_context/construkted_context.md"),
+    ("MARKET RESEARCH CONTEXT", "reference_context/Combined_Small_Team_Geospatial_Market_Analysis.md"),
+)
+
+CONDENSE_SYSTEM_PROMPT = """You condense reference documents that are pasted into a marketing copywriter's system prompt.
+Keep every concrete fact, figure, name, rule and instruction. Drop repetition, filler and long examples.
+Keep the markdown headings of the sections you keep, in their original order.
+Reply with the condensed markdown only."""
+
+
+def build_generation_system_prompt(contexts: Dict[str, str]) -> str:
+    """Build the candidate system prompt from the reference context keyed by heading."""
+    return f"""You are a masterful marketing copywriter for the company Construkted Reality. You generate engaging blog articles using the style guide provided.
+
+WRITING STYLE GUIDE:
+{contexts["WRITING STYLE GUIDE"]}
+
+COMPANY CONTEXT:
+{contexts["COMPANY CONTEXT"]}
+
+MARKET RESEARCH CONTEXT:
+{contexts["MARKET RESEARCH CONTEXT"]}
+
+When writing marketing content, always:
+1. Follow the writing style guidelines precisely
+2. Incorporate company context and mission naturally
+3. Reference market insights where relevant to strengthen arguments
+4. Maintain an engaging, conversational tone that educates while exciting
+5. Focus on the benefits of user-generated 3D data and community collaboration
+6. Avoid corporate jargon and speak directly to both professionals and hobbyists"""
+
+
+def split_markdown_sections(text: str) -> List[str]:
+    """Split markdown at headings; text before the first heading stays with the first section."""
+    sections = [section for section in re.split(r"(?m)^(?=#{1,6} )", text) if section.strip()]
+    if len(sections) > 1 and not sections[0].startswith("#"):
+        sections[1] = sections[0] + sections[1]
+        sections.pop(0)
+    return sections
+
+
+def _heading_level(section: str) -> int:
+    match = re.match(r"(#{1,6}) ", section)
+    return len(match.group(1)) if match else 0
+
+
+@dataclass
+class PackedContext:
+    """Reference context fitted into a token budget."""
+    budget: int
+    contexts: Dict[str, str]  # heading -> packed text
+    full_tokens: int
+    packed_tokens: int
+    condensed: List[str] = field(default_factory=list)  # headings served from a condensed variant
+    dropped_sections: int = 0
+
+
+class ContextCondenser:
+    """LLM-condensed variants of reference files, cached on disk by content hash.
+
+    A variant is generated once per source file content and ratio and reused
+    by every later run; editing the file changes its hash, so the next run
+    condenses it again and removes the stale variant.
+    """
+
+    def __init__(self):
+        self.directory: Optional[Path] = None
+        self.ratio = 0.3
+        self.models: Optional[PipelineModels] = None
+        self.retry_count = 3
+        self.retry_delay = 1.0
+        self.verbose = False
+        self._variants: Dict[Tuple[str, str], Optional[str]] = {}  # (path, sha256) -> text (None: failed)
+
+    def configure(
+        self,
+        directory: str,
+        ratio: float,
+        models: Optional[PipelineModels],
+        retry_count: int = 3,
+        retry_delay: float = 1.0,
+        verbose: bool = False
+    ) -> None:
+        """Set the cache directory, target size and the models used to condense."""
+        self.directory = Path(directory)
+        self.ratio = ratio
+        self.models = models
+        self.retry_count = retry_count
+        self.retry_delay = retry_delay
+        self.verbose = verbose
+
+    def _variant_path(self, file_path: str, digest: str) -> Path:
+        return self.directory / f"{Path(file_path).stem}-{digest[:16]}-r{round(self.ratio * 100)}.md"
+
+    def get(self, file_path: str) -> Optional[str]:
+        """Return the condensed variant of a reference file, generating it on a miss.
+
+        Returns None when condensing is not configured or the LLM call failed.
+        """
+        if self.directory is None:
+            return None
+        reference = reference_registry.get(file_path)
+        key = (reference.path, reference.sha256)
+        if key in self._variants:
+            return self._variants[key]
+        variant_path = self._variant_path(reference.path, reference.sha256)
+        if variant_path.exists():
+            text = variant_path.read_text(encoding="utf-8")
+        else:
+            text = self._condense(reference)
+            if text is not None:
+                self._store(reference.path, variant_path, text)
+        self._variants[key] = text
+        return text
+
+    def _condense(self, reference: ReferenceFile) -> Optional[str]:
+        target_tokens = max(64, int(count_tokens(reference.content) * self.ratio))
+        if self.verbose:
+            print(f"Condensing {reference.path} to ~{target_tokens:,} tokens...")
+        user_prompt = (
+            f"Condense this document to at most {int(target_tokens * 0.75)} words.\n\n"
+            f"DOCUMENT ({reference.path}):\n{reference.content}"
+        )
+        start_time = time.time()
+        try:
+            response = send_to_llm(
+                user_prompt,
+                llm_system_prompt=CONDENSE_SYSTEM_PROMPT,
+                temperature=0.0,
+                max_tokens=target_tokens * 2 + 512,
+                retry_count=self.retry_count,
+                retry_delay=self.retry_delay,
+                verbose=self.verbose,
+                seed=42,
+                stage="CONTEXT",
+                models=self.models
+            )
+        except Exception as e:
+            print(f"⚠ Could not condense {reference.path}, packing it from whole sections: {e}")
+            return None
+        text = filter_think_tags(response)
+        track_llm_call("CONTEXT", CONDENSE_SYSTEM_PROMPT + "\n\n" + user_prompt, text, time.time() - start_time)
+        return text or None
+
+    def _store(self, file_path: str, variant_path: Path, text: str) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = variant_path.with_suffix(".tmp")
+            tmp_path.write_text(text, encoding="utf-8")
+            tmp_path.replace(variant_path)
+            for stale in self.directory.glob(f"{Path(file_path).stem}-*-r{round(self.ratio * 100)}.md"):
+                if stale != variant_path:
+                    stale.unlink()
+        except OSError as e:
+            print(f"⚠ Could not save condensed context to {variant_path}: {e}")
+
+
+# Shared by all candidate presets; configured from main()
+context_condenser = ContextCondenser()
+
+
+def pack_reference_context(budget: int, contexts: Optional[Dict[str, str]] = None) -> PackedContext:
+    """
+    Fit the candidate reference context into a token budget.
+
+    Files are shrunk lowest-priority first (see GENERATION_CONTEXT_FILES):
+    first by swapping in their condensed variant, then by dropping whole
+    sections - deepest headings and later sections first, never a file's
+    first section. The result can still exceed a budget that is smaller than
+    the first sections together.
+
+    Args:
+        budget: Tokens allowed for the reference files together
+        contexts: Reference text per heading to start from, e.g. after retrieval (default: the full files)
+
+    Returns:
+        PackedContext with the text to use per heading and the token counts
+    """
+    if contexts is None:
+        contexts = {heading: read_reference_file(path) for heading, path in GENERATION_CONTEXT_FILES}
+    else:
+        contexts = dict(contexts)
+    full_tokens = sum(count_tokens(text) for text in contexts.values())
+    packed = PackedContext(budget=budget, contexts=contexts, full_tokens=full_tokens, packed_tokens=full_tokens)
+    over = full_tokens - budget
+
+    for heading, path in reversed(GENERATION_CONTEXT_FILES):
+        if over <= 0:
+            break
+        condensed = context_condenser.get(path)
+        if condensed and count_tokens(condensed) < count_tokens(contexts[heading]):
+            over -= count_tokens(contexts[heading]) - count_tokens(condensed)
+            contexts[heading] = condensed
+            packed.condensed.append(heading)
+
+    for heading, _ in reversed(GENERATION_CONTEXT_FILES):
+        if over <= 0:
+            break
+        sections = split_markdown_sections(contexts[heading])
+        kept = set(range(len(sections)))
+        for index in sorted(range(1, len(sections)), key=lambda i: (_heading_level(sections[i]), i), reverse=True):
+            if over <= 0:
+                break
+            kept.discard(index)
+            over -= count_tokens(sections[index])
+            packed.dropped_sections += 1
+        contexts[heading] = "".join(sections[index] for index in sorted(kept)).strip()
+
+    packed.packed_tokens = sum(count_tokens(text) for text in contexts.values())
+    return packed
+
+
+# ============================================================================
+# REFERENCE CONTEXT RETRIEVAL
+# Purpose: Offline BM25 index over the markdown sections of reference_context/
+# so candidate prompts carry only the market research sections that match the
+# topic brief instead of the whole report
+# ============================================================================
+
+# Headings of GENERATION_CONTEXT_FILES narrowed to retrieved sections; the others are always sent whole
+RETRIEVED_CONTEXT_HEADINGS = ("MARKET RESEARCH CONTEXT",)
+
+RETRIEVAL_INDEX_FORMAT = 1
+
+RETRIEVAL_STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from has have how if in into is it its more most not of on or "
+    "so than that the their them there these they this to use was were what when which who will with you your "
+    "we our us".split()
+)
+
+
+def retrieval_terms(text: str) -> List[str]:
+    """Lowercase word terms for BM25, without stopwords and with a plain plural 's' removed."""
+    terms = []
+    for word in re.findall(r"[a-z0-9]+(?:-[a-z0-9]+)*", text.lower()):
+        if len(word) < 2 or word in RETRIEVAL_STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+class ReferenceIndex:
+    """BM25 index over the markdown sections of every reference_context/*.md file.
+
+    The index is saved as JSON with the sha256 of each source file (from
+    `reference_registry`) and rebuilt when any of them changes. Sections are
+    indexed together with their parent headings, and heading-only sections
+    are not indexed on their own.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.path: Optional[Path] = None
+        self.directory = "reference_context"
+        self.files: Dict[str, str] = {}  # source path -> sha256 the index was built from
+        self.sections: List[Dict[str, Any]] = []  # {"path", "position", "parents", "text", "length", "terms"}
+        self.doc_freq: Dict[str, int] = {}
+        self.avg_length = 0.0
+        self.built = False  # True when the last ensure() rebuilt the index instead of loading it
+
+    def configure(self, path: str, directory: str = "reference_context") -> None:
+        """Set the index file and the directory it covers."""
+        self.path = Path(path)
+        self.directory = directory
+
+    def _source_hashes(self) -> Dict[str, str]:
+        return {
+            file_path.as_posix(): reference_registry.content_hash(str(file_path))
+            for file_path in sorted(Path(self.directory).glob("*.md"))
         }
-    }
-    
-    artifacts_path.write_text(
-        json.dumps(serializable_artifacts, indent=2),
-        encoding='utf-8'
-    )
-    if verbose:
-        print(f"✓ Pipeline artifacts saved: {artifacts_path}")
+
+    def ensure(self) -> None:
+        """Load the index from disk, or rebuild it when a source file changed."""
+        hashes = self._source_hashes()
+        if self.sections and self.files == hashes:
+            return
+        self.built = not self._load(hashes)
+        if self.built:
+            self._build(hashes)
+            self._save()
+
+    def _load(self, hashes: Dict[str, str]) -> bool:
+        if self.path is None or not self.path.exists():
+            return False
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        if payload.get("format") != RETRIEVAL_INDEX_FORMAT or payload.get("files") != hashes:
+            return False
+        self._set_sections(hashes, payload["sections"])
+        return True
+
+    def _build(self, hashes: Dict[str, str]) -> None:
+        sections = []
+        for source_path in hashes:
+            parents: List[str] = []
+            for position, text in enumerate(split_markdown_sections(reference_registry.read(source_path))):
+                level = _heading_level(text)
+                heading = text.split("\n", 1)[0].strip() if level else ""
+                if level:
+                    parents = [parent for parent in parents if _heading_level(parent) < level]
+                if text[len(heading):].strip() if level else text.strip():
+                    terms: Dict[str, int] = {}
+                    for term in retrieval_terms("\n".join(parents) + "\n" + text):
+                        terms[term] = terms.get(term, 0) + 1
+                    sections.append({
+                        "path": source_path,
+                        "position": position,
+                        "parents": list(parents),
+                        "text": text.strip(),
+                        "length": sum(terms.values()),
+                        "terms": terms
+                    })
+                if level:
+                    parents.append(heading)
+        self._set_sections(hashes, sections)
+
+    def _set_sections(self, hashes: Dict[str, str], sections: List[Dict[str, Any]]) -> None:
+        doc_freq: Dict[str, int] = {}
+        for section in sections:
+            for term in section["terms"]:
+                doc_freq[term] = doc_freq.get(term, 0) + 1
+        self.files = dict(hashes)
+        self.sections = sections
+        self.doc_freq = doc_freq
+        self.avg_length = sum(section["length"] for section in sections) / len(sections) if sections else 0.0
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        payload = json.dumps({"format": RETRIEVAL_INDEX_FORMAT, "files": self.files, "sections": self.sections})
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp_path.write_text(payload, encoding="utf-8")
+            tmp_path.replace(self.path)
+        except OSError as e:
+            print(f"⚠ Could not save reference index to {self.path}: {e}")
+
+    def search(self, query: str, top_k: int, paths: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Return the top_k sections by BM25 score (only those sharing a term with the query)."""
+        self.ensure()
+        query_terms = set(retrieval_terms(query))
+        total = len(self.sections)
+        scored = []
+        for section in self.sections:
+            if paths is not None and section["path"] not in paths:
+                continue
+            score = 0.0
+            for term in query_terms:
+                frequency = section["terms"].get(term)
+                if not frequency:
+                    continue
+                doc_freq = self.doc_freq[term]
+                idf = math.log(1 + (total - doc_freq + 0.5) / (doc_freq + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * section["length"] / self.avg_length)
+                score += idf * frequency * (self.k1 + 1) / (frequency + norm)
+            if score > 0:
+                scored.append((score, section))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [section for _, section in scored[:top_k]]
+
+    def section_count(self, source_path: str) -> int:
+        """Return the number of indexed sections of a source file."""
+        return sum(1 for section in self.sections if section["path"] == source_path)
+
+
+# Shared by all candidate presets; configured from main()
+reference_index = ReferenceIndex()
+
+
+def render_sections(sections: List[Dict[str, Any]]) -> str:
+    """Join retrieved sections in document order, repeating each parent heading once."""
+    parts: List[str] = []
+    emitted: set = set()
+    for section in sorted(sections, key=lambda section: (section["path"], section["position"])):
+        for parent in section["parents"]:
+            if (section["path"], parent) not in emitted:
+                emitted.add((section["path"], parent))
+                parts.append(parent)
+        parts.append(section["text"])
+    return "\n\n".join(parts)
+
+
+def retrieve_reference_context(contexts: Dict[str, str], query: str, top_k: int) -> Dict[str, str]:
+    """
+    Narrow the retrieved reference files to the sections that best match a query.
+
+    Args:
+        contexts: Reference text per heading (see GENERATION_CONTEXT_FILES)
+        query: Text to rank sections by, normally the topic brief
+        top_k: Sections kept per retrieved file
+
+    Returns:
+        A copy of contexts with each RETRIEVED_CONTEXT_HEADINGS entry reduced to
+        its top_k sections; a file with no matching section is kept whole
+    """
+    retrieved = dict(contexts)
+    paths = dict(GENERATION_CONTEXT_FILES)
+    start_time = time.perf_counter()
+    reference_index.ensure()
+    index_time = time.perf_counter() - start_time
+    for heading in RETRIEVED_CONTEXT_HEADINGS:
+        path = Path(paths[heading]).as_posix()
+        query_start = time.perf_counter()
+        sections = reference_index.search(query, top_k, paths=[path])
+        query_time = time.perf_counter() - query_start
+        if sections:
+            retrieved[heading] = render_sections(sections)
+        track_context_retrieval(
+            heading,
+            sections=len(sections),
+            total_sections=reference_index.section_count(path),
+            full_tokens=count_tokens(contexts[heading]),
+            retrieved_tokens=count_tokens(retrieved[heading]),
+            query_time=query_time,
+            index_time=index_time,
+            index_built=reference_index.built
+        )
+    return retrieved
 
 
 # ============================================================================
@@ -2356,7 +7270,8 @@ def generate_single_candidate(
     retry_count: int,
     retry_delay: float,
     filter_think: bool,
-    verbose: bool
+    verbose: bool,
+    seed: Optional[int] = None
 ) -> ArticleCandidate:
     """
     Generate a single article candidate using a specific preset (thread-safe worker function).
@@ -2372,6 +7287,7 @@ def generate_single_candidate(
         retry_delay: Delay between retries
         filter_think: Whether to filter think tags
         verbose: Enable verbose logging
+        seed: Optional sampling seed (batched mode passes the article ID so candidates differ)
 
     Returns:
         ArticleCandidate object
@@ -2388,11 +7304,14 @@ def generate_single_candidate(
         preset_name=preset_name,
         llm_user_prompt=generation_user_prompt,
         llm_system_prompt=generation_system_prompt,
+        stage="CANDIDATES",
+        stream_name=f"candidate_{article_id:02d}_{preset_name.replace('/', '-')}",
         temperature=temperature,
         max_tokens=max_tokens,
         retry_count=retry_count,
         retry_delay=retry_delay,
-        verbose=False  # Disable verbose in worker threads to reduce output clutter
+        verbose=False,  # Disable verbose in worker threads to reduce output clutter
+        seed=seed
     )
     llm_end_time = time.time()
     execution_time = llm_end_time - llm_start_time
@@ -2419,6 +7338,148 @@ def generate_single_candidate(
     return candidate
 
 
+def plan_candidate_batches(
+    preset_iterations: List[Tuple[str, int]],
+    batch_size: int
+) -> List[Tuple[List[int], str]]:
+    """
+    Assign article IDs to (article_ids, preset_name) generation tasks.
+
+    With batch_size 1 every candidate is its own task. Otherwise each preset's
+    share is split into as few tasks of up to batch_size candidates as possible;
+    presets whose models.yaml entry sets `supports_n: false` keep one task per
+    candidate.
+
+    Args:
+        preset_iterations: List of (preset_name, iterations_count) tuples
+        batch_size: Maximum candidates requested in one call (n)
+
+    Returns:
+        Tasks in article ID order
+    """
+    tasks = []
+    article_id = 1
+    for preset_name, iterations_count in preset_iterations:
+        ids = list(range(article_id, article_id + iterations_count))
+        article_id += iterations_count
+        size = batch_size if llm_client_registry.supports(preset_name, "supports_n") else 1
+        size = max(1, size)
+        for start in range(0, len(ids), size):
+            tasks.append((ids[start:start + size], preset_name))
+    return tasks
+
+
+def _n_rejected(error: Exception) -> bool:
+    """True when a failed multi-choice call was refused by the endpoint as a bad request."""
+    cause = error.__cause__
+    return isinstance(cause, APIStatusError) and cause.status_code in (400, 422)
+
+
+def _candidates_from_choices(
+    article_ids: List[int],
+    preset_name: str,
+    input_text: str,
+    responses: List[str],
+    execution_time: float,
+    filter_think: bool
+) -> List[ArticleCandidate]:
+    """Split one multi-choice response into candidates, each tracked as its own call.
+
+    The prompt is counted once and the request time is shared evenly between choices.
+    """
+    candidates = []
+    share = execution_time / max(1, len(responses))
+    for index, (article_id, response) in enumerate(zip(article_ids, responses)):
+        if filter_think:
+            response = filter_think_tags(response)
+        track_llm_call("CANDIDATES", input_text if index == 0 else "", response, share)
+        candidates.append(ArticleCandidate(
+            article_id=article_id,
+            content=response,
+            word_count=len(response.split()),
+            generation_timestamp=time.time(),
+            preset_name=preset_name
+        ))
+    return candidates
+
+
+def generate_candidate_batch(
+    article_ids: List[int],
+    preset_name: str,
+    generation_system_prompt: str,
+    generation_user_prompt: str,
+    temperature: float,
+    max_tokens: int,
+    retry_count: int,
+    retry_delay: float,
+    filter_think: bool,
+    verbose: bool,
+    seed_base: int = 0
+) -> List[ArticleCandidate]:
+    """
+    Generate several candidates from one preset with a single n > 1 request (thread-safe worker function).
+
+    Single-candidate tasks, presets without `supports_n`, and endpoints that
+    reject `n` or ignore it (return one choice) fall back to one request per
+    candidate with distinct seeds (seed_base plus their article IDs). A
+    rejecting preset is marked as not supporting `n` for the rest of the run.
+
+    Args:
+        article_ids: Candidate article ID numbers covered by this task
+        preset_name: Name of the model preset to use
+        seed_base: Random per-run offset for the single-request seeds, so reruns do not repeat candidates (default 0)
+        Remaining arguments as in generate_single_candidate
+
+    Returns:
+        The candidates that were generated (failed top-up requests are skipped)
+    """
+    candidates: List[ArticleCandidate] = []
+    if len(article_ids) > 1 and llm_client_registry.supports(preset_name, "supports_n"):
+        if verbose:
+            print(f"  [Thread {threading.current_thread().name}] Generating candidates {article_ids[0]}-{article_ids[-1]} with {preset_name} (n={len(article_ids)})...")
+        input_text = generation_system_prompt + "\n\n" + generation_user_prompt
+        llm_start_time = time.time()
+        try:
+            responses = send_to_llm_with_preset_choices(
+                preset_name=preset_name,
+                llm_user_prompt=generation_user_prompt,
+                llm_system_prompt=generation_system_prompt,
+                stage="CANDIDATES",
+                temperature=temperature,
+                max_tokens=max_tokens,
+                retry_count=retry_count,
+                retry_delay=retry_delay,
+                verbose=False,
+                n=len(article_ids)
+            )
+        except RuntimeError as e:
+            if not _n_rejected(e):
+                # Not an n problem: leave supports_n alone and let the separate requests use the fallbacks
+                if verbose:
+                    print(f"  ⚠ {preset_name} failed the n={len(article_ids)} request ({e}); generating with separate requests")
+                responses = None
+            else:
+                responses = []
+        if responses is not None and len(responses) <= 1:
+            llm_client_registry.disable_capability(preset_name, "supports_n")
+            if verbose:
+                print(f"  ⚠ {preset_name} does not support n; generating the rest with separate requests")
+        candidates = _candidates_from_choices(
+            article_ids, preset_name, input_text, responses or [], time.time() - llm_start_time, filter_think
+        )
+
+    for article_id in article_ids[len(candidates):]:
+        try:
+            candidates.append(generate_single_candidate(
+                article_id, preset_name, generation_system_prompt, generation_user_prompt, temperature,
+                max_tokens, retry_count, retry_delay, filter_think, verbose, seed=seed_base + article_id
+            ))
+        except Exception as e:
+            if verbose:
+                print(f"  ✗ Candidate {article_id} ({preset_name}) failed: {e}")
+    return candidates
+
+
 def save_candidate_file(
     candidate: ArticleCandidate,
     output_dir: Path,
@@ -2429,31 +7490,299 @@ def save_candidate_file(
     """
     Save a single candidate file (thread-safe).
 
-    Args:
-        candidate: ArticleCandidate to save
-        output_dir: Output directory path
-        output_base: Base filename
-        total_iterations: Total number of iterations
-        verbose: Enable verbose logging
-    """
-    # Clean preset name for filename (replace slashes and special chars with dashes)
-    safe_preset = candidate.preset_name.replace('/', '-').replace('\\', '-')
+    Args:
+        candidate: ArticleCandidate to save
+        output_dir: Output directory path
+        output_base: Base filename
+        total_iterations: Total number of iterations
+        verbose: Enable verbose logging
+    """
+    # Clean preset name for filename (replace slashes and special chars with dashes)
+    safe_preset = candidate.preset_name.replace('/', '-').replace('\\', '-')
+
+    if total_iterations == 1:
+        filename = output_dir / f"{output_base}_{safe_preset}.md"
+    else:
+        filename = output_dir / "candidates" / f"{output_base}_candidate_{candidate.article_id:02d}_{safe_preset}.md"
+
+    filename.write_text(
+        candidate.content + f"\n\n---\n**Word Count: {candidate.word_count}**\n**Model: {candidate.preset_name}**",
+        encoding='utf-8'
+    )
+
+    if verbose:
+        print(f"  Candidate {candidate.article_id} saved: {filename}")
+
+
+def generate_candidates(
+    preset_iterations: List[Tuple[str, int]],
+    generation_system_prompt: str,
+    generation_user_prompt: str,
+    temperature: float,
+    max_tokens: int,
+    retry_count: int,
+    retry_delay: float,
+    filter_think: bool,
+    output_base: Optional[str],
+    parallel: bool = False,
+    max_concurrent: int = 5,
+    verbose: bool = False,
+    batch_size: int = 1,
+    preset_system_prompts: Optional[Dict[str, str]] = None
+) -> List[ArticleCandidate]:
+    """
+    Generate multiple article candidates using either parallel or sequential execution.
+
+    Distributes generation across multiple presets, with each preset generating
+    a specified number of candidates. Both parallel and sequential modes use the
+    same core generation logic via generate_single_candidate(), or
+    generate_candidate_batch() when batch_size > 1.
+
+    Args:
+        preset_iterations: List of (preset_name, iterations_count) tuples
+        generation_system_prompt: System prompt for generation
+        generation_user_prompt: User prompt for generation
+        temperature: Sampling temperature
+        max_tokens: Maximum tokens to generate
+        retry_count: Number of API call retries
+        retry_delay: Delay between retries
+        filter_think: Whether to filter think tags
+        output_base: Base filename for outputs (optional)
+        parallel: Use parallel generation on the shared task scheduler
+        max_concurrent: Maximum concurrent LLM requests (only used when parallel=True)
+        verbose: Enable verbose logging
+        batch_size: Candidates requested per call with the `n` parameter (1 disables batching)
+        preset_system_prompts: System prompts for presets whose reference context was packed into a budget
+
+    Returns:
+        List of ArticleCandidate objects
+    """
+    # Calculate total iterations
+    total_iterations = sum(count for _, count in preset_iterations)
+
+    mode_name = "PARALLEL" if parallel else "SEQUENTIAL"
+    if verbose:
+        print(f"\n{'='*80}")
+        print(f"{mode_name} CANDIDATE GENERATION (Multi-Preset)")
+        print(f"{'='*80}")
+        if parallel:
+            print(f"Generating {total_iterations} candidates with max {max_concurrent} concurrent requests...")
+        else:
+            print(f"Generating {total_iterations} candidates sequentially...")
+        for preset_name, count in preset_iterations:
+            print(f"  - {preset_name}: {count} candidates")
+
+    candidates = []
+
+    # Create output directory if needed
+    output_dir = None
+    if output_base:
+        output_dir = create_output_directory(output_base)
+
+    # Build list of (article_ids, preset_name) tasks - one ID per task unless batching
+    tasks = plan_candidate_batches(preset_iterations, batch_size)
+    seed_base = random.randrange(2**31 - total_iterations)  # Fresh seeds per run for single-request fallbacks
+
+    def run_task(task_article_ids: List[int], task_preset_name: str, task_verbose: bool) -> List[ArticleCandidate]:
+        system_prompt = (preset_system_prompts or {}).get(task_preset_name, generation_system_prompt)
+        if batch_size > 1:
+            return generate_candidate_batch(
+                task_article_ids, task_preset_name, system_prompt, generation_user_prompt,
+                temperature, max_tokens, retry_count, retry_delay, filter_think, task_verbose, seed_base
+            )
+        return [generate_single_candidate(
+            task_article_ids[0], task_preset_name, system_prompt, generation_user_prompt,
+            temperature, max_tokens, retry_count, retry_delay, filter_think, task_verbose
+        )]
+
+    def describe(task_article_ids: List[int]) -> str:
+        if len(task_article_ids) == 1:
+            return f"Candidate {task_article_ids[0]}"
+        return f"Candidates {task_article_ids[0]}-{task_article_ids[-1]}"
+
+    if parallel:
+        # Parallel generation on the shared task scheduler
+        llm_scheduler.ensure_capacity(adaptive_concurrency.worker_count(max_concurrent))
+        future_to_task = {
+            llm_scheduler.submit("CANDIDATES", run_task, task_article_ids, task_preset_name, verbose): (task_article_ids, task_preset_name)
+            for task_article_ids, task_preset_name in tasks
+        }
+
+        # Collect results as they complete
+        completed = 0
+        for future in as_completed(future_to_task):
+            task_article_ids, task_preset_name = future_to_task[future]
+            try:
+                for candidate in future.result():
+                    candidates.append(candidate)
+                    completed += 1
+
+                    if verbose:
+                        print(f"Progress: {completed}/{total_iterations} candidates complete")
+
+                    # Save candidate file if output is specified
+                    if output_base and output_dir:
+                        save_candidate_file(
+                            candidate,
+                            output_dir,
+                            output_base,
+                            total_iterations,
+                            verbose=False  # Reduce verbosity in parallel mode
+                        )
+
+            except Exception as e:
+                if verbose:
+                    print(f"  ✗ {describe(task_article_ids)} ({task_preset_name}) failed: {e}")
+
+        # Sort candidates by article_id to maintain order
+        candidates.sort(key=lambda c: c.article_id)
+    else:
+        # Sequential generation
+        for task_article_ids, task_preset_name in tasks:
+            if verbose:
+                print(f"Generating {describe(task_article_ids).lower()}/{total_iterations} using {task_preset_name}...")
+
+            try:
+                for candidate in run_task(task_article_ids, task_preset_name, verbose):
+                    candidates.append(candidate)
+
+                    if verbose:
+                        print(f"Progress: {candidate.article_id}/{total_iterations} candidates complete")
+
+                    # Save candidate file if output is specified
+                    if output_base and output_dir:
+                        save_candidate_file(
+                            candidate,
+                            output_dir,
+                            output_base,
+                            total_iterations,
+                            verbose=verbose
+                        )
+
+            except Exception as e:
+                if verbose:
+                    print(f"  ✗ {describe(task_article_ids)} ({task_preset_name}) failed: {e}")
+
+    if verbose:
+        print(f"✓ {mode_name.capitalize()} generation complete: {len(candidates)}/{total_iterations} candidates generated\n")
+
+    return candidates
+
+
+async def generate_single_candidate_async(
+    article_id: int,
+    preset_name: str,
+    generation_system_prompt: str,
+    generation_user_prompt: str,
+    temperature: float,
+    max_tokens: int,
+    retry_count: int,
+    retry_delay: float,
+    filter_think: bool,
+    verbose: bool,
+    seed: Optional[int] = None
+) -> ArticleCandidate:
+    """Async version of generate_single_candidate."""
+    input_text = generation_system_prompt + "\n\n" + generation_user_prompt
+
+    llm_start_time = time.time()
+    response = await send_to_llm_with_preset_async(
+        preset_name=preset_name,
+        llm_user_prompt=generation_user_prompt,
+        llm_system_prompt=generation_system_prompt,
+        stage="CANDIDATES",
+        stream_name=f"candidate_{article_id:02d}_{preset_name.replace('/', '-')}",
+        temperature=temperature,
+        max_tokens=max_tokens,
+        retry_count=retry_count,
+        retry_delay=retry_delay,
+        verbose=False,
+        seed=seed
+    )
+    execution_time = time.time() - llm_start_time
+
+    if filter_think:
+        response = filter_think_tags(response)
 
-    if total_iterations == 1:
-        filename = output_dir / f"{output_base}_{safe_preset}.md"
-    else:
-        filename = output_dir / "candidates" / f"{output_base}_candidate_{candidate.article_id:02d}_{safe_preset}.md"
+    track_llm_call("CANDIDATES", input_text, response, execution_time)
 
-    filename.write_text(
-        candidate.content + f"\n\n---\n**Word Count: {candidate.word_count}**\n**Model: {candidate.preset_name}**",
-        encoding='utf-8'
+    candidate = ArticleCandidate(
+        article_id=article_id,
+        content=response,
+        word_count=len(response.split()),
+        generation_timestamp=time.time(),
+        preset_name=preset_name
     )
 
     if verbose:
-        print(f"  Candidate {candidate.article_id} saved: {filename}")
+        print(f"  ✓ Candidate {article_id} ({preset_name}) complete ({candidate.word_count} words)")
 
+    return candidate
 
-def generate_candidates(
+
+async def generate_candidate_batch_async(
+    article_ids: List[int],
+    preset_name: str,
+    generation_system_prompt: str,
+    generation_user_prompt: str,
+    temperature: float,
+    max_tokens: int,
+    retry_count: int,
+    retry_delay: float,
+    filter_think: bool,
+    verbose: bool,
+    seed_base: int = 0
+) -> List[ArticleCandidate]:
+    """Async version of generate_candidate_batch."""
+    candidates: List[ArticleCandidate] = []
+    if len(article_ids) > 1 and llm_client_registry.supports(preset_name, "supports_n"):
+        input_text = generation_system_prompt + "\n\n" + generation_user_prompt
+        llm_start_time = time.time()
+        try:
+            responses = await send_to_llm_with_preset_choices_async(
+                preset_name=preset_name,
+                llm_user_prompt=generation_user_prompt,
+                llm_system_prompt=generation_system_prompt,
+                stage="CANDIDATES",
+                temperature=temperature,
+                max_tokens=max_tokens,
+                retry_count=retry_count,
+                retry_delay=retry_delay,
+                verbose=False,
+                n=len(article_ids)
+            )
+        except RuntimeError as e:
+            if not _n_rejected(e):
+                # Not an n problem: leave supports_n alone and let the separate requests use the fallbacks
+                if verbose:
+                    print(f"  ⚠ {preset_name} failed the n={len(article_ids)} request ({e}); generating with separate requests")
+                responses = None
+            else:
+                responses = []
+        if responses is not None and len(responses) <= 1:
+            llm_client_registry.disable_capability(preset_name, "supports_n")
+            if verbose:
+                print(f"  ⚠ {preset_name} does not support n; generating the rest with separate requests")
+        candidates = _candidates_from_choices(
+            article_ids, preset_name, input_text, responses or [], time.time() - llm_start_time, filter_think
+        )
+        if verbose:
+            for candidate in candidates:
+                print(f"  ✓ Candidate {candidate.article_id} ({preset_name}) complete ({candidate.word_count} words)")
+
+    for article_id in article_ids[len(candidates):]:
+        try:
+            candidates.append(await generate_single_candidate_async(
+                article_id, preset_name, generation_system_prompt, generation_user_prompt, temperature,
+                max_tokens, retry_count, retry_delay, filter_think, verbose, seed=seed_base + article_id
+            ))
+        except Exception as e:
+            if verbose:
+                print(f"  ✗ Candidate {article_id} ({preset_name}) failed: {e}")
+    return candidates
+
+
+async def generate_candidates_async(
     preset_iterations: List[Tuple[str, int]],
     generation_system_prompt: str,
     generation_user_prompt: str,
@@ -2463,16 +7792,13 @@ def generate_candidates(
     retry_delay: float,
     filter_think: bool,
     output_base: Optional[str],
-    parallel: bool = False,
     max_concurrent: int = 5,
-    verbose: bool = False
+    verbose: bool = False,
+    batch_size: int = 1,
+    preset_system_prompts: Optional[Dict[str, str]] = None
 ) -> List[ArticleCandidate]:
     """
-    Generate multiple article candidates using either parallel or sequential execution.
-
-    Distributes generation across multiple presets, with each preset generating
-    a specified number of candidates. Both parallel and sequential modes use the
-    same core generation logic via generate_single_candidate().
+    Generate article candidates concurrently on the asyncio engine.
 
     Args:
         preset_iterations: List of (preset_name, iterations_count) tuples
@@ -2484,132 +7810,81 @@ def generate_candidates(
         retry_delay: Delay between retries
         filter_think: Whether to filter think tags
         output_base: Base filename for outputs (optional)
-        parallel: Use parallel generation with ThreadPoolExecutor
-        max_concurrent: Maximum concurrent LLM requests (only used when parallel=True)
+        max_concurrent: Maximum in-flight LLM requests
         verbose: Enable verbose logging
+        batch_size: Candidates requested per call with the `n` parameter (1 disables batching)
+        preset_system_prompts: System prompts for presets whose reference context was packed into a budget
 
     Returns:
-        List of ArticleCandidate objects
+        List of ArticleCandidate objects sorted by article_id
     """
-    # Calculate total iterations
     total_iterations = sum(count for _, count in preset_iterations)
 
-    mode_name = "PARALLEL" if parallel else "SEQUENTIAL"
     if verbose:
         print(f"\n{'='*80}")
-        print(f"{mode_name} CANDIDATE GENERATION (Multi-Preset)")
+        print("ASYNC CANDIDATE GENERATION (Multi-Preset)")
         print(f"{'='*80}")
-        if parallel:
-            print(f"Generating {total_iterations} candidates with max {max_concurrent} concurrent requests...")
-        else:
-            print(f"Generating {total_iterations} candidates sequentially...")
+        print(f"Generating {total_iterations} candidates with max {max_concurrent} in-flight requests...")
         for preset_name, count in preset_iterations:
             print(f"  - {preset_name}: {count} candidates")
 
-    candidates = []
-
-    # Create output directory if needed
-    output_dir = None
-    if output_base:
-        output_dir = create_output_directory(output_base)
-
-    # Build list of (article_id, preset_name) tasks
-    tasks = []
-    article_id = 1
-    for preset_name, iterations_count in preset_iterations:
-        for _ in range(iterations_count):
-            tasks.append((article_id, preset_name))
-            article_id += 1
-
-    if parallel:
-        # Parallel generation using ThreadPoolExecutor
-        with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
-            # Submit all generation tasks
-            future_to_task = {
-                executor.submit(
-                    generate_single_candidate,
-                    task_article_id,
-                    task_preset_name,
-                    generation_system_prompt,
-                    generation_user_prompt,
-                    temperature,
-                    max_tokens,
-                    retry_count,
-                    retry_delay,
-                    filter_think,
-                    verbose
-                ): (task_article_id, task_preset_name)
-                for task_article_id, task_preset_name in tasks
-            }
-
-            # Collect results as they complete
-            completed = 0
-            for future in as_completed(future_to_task):
-                task_article_id, task_preset_name = future_to_task[future]
-                try:
-                    candidate = future.result()
-                    candidates.append(candidate)
-                    completed += 1
-
-                    if verbose:
-                        print(f"Progress: {completed}/{total_iterations} candidates complete")
-
-                    # Save candidate file if output is specified
-                    if output_base and output_dir:
-                        save_candidate_file(
-                            candidate,
-                            output_dir,
-                            output_base,
-                            total_iterations,
-                            verbose=False  # Reduce verbosity in parallel mode
-                        )
-
-                except Exception as e:
-                    if verbose:
-                        print(f"  ✗ Candidate {task_article_id} ({task_preset_name}) failed: {e}")
+    output_dir = create_output_directory(output_base) if output_base else None
+
+    tasks = plan_candidate_batches(preset_iterations, batch_size)
+    seed_base = random.randrange(2**31 - total_iterations)  # Fresh seeds per run for single-request fallbacks
+
+    async def generate_and_save(task_article_ids: List[int], task_preset_name: str) -> List[ArticleCandidate]:
+        system_prompt = (preset_system_prompts or {}).get(task_preset_name, generation_system_prompt)
+        if batch_size > 1:
+            task_candidates = await generate_candidate_batch_async(
+                task_article_ids,
+                task_preset_name,
+                system_prompt,
+                generation_user_prompt,
+                temperature,
+                max_tokens,
+                retry_count,
+                retry_delay,
+                filter_think,
+                verbose,
+                seed_base
+            )
+        else:
+            task_candidates = [await generate_single_candidate_async(
+                task_article_ids[0],
+                task_preset_name,
+                system_prompt,
+                generation_user_prompt,
+                temperature,
+                max_tokens,
+                retry_count,
+                retry_delay,
+                filter_think,
+                verbose
+            )]
+        # Save as soon as each candidate lands, like the threaded path
+        if output_base and output_dir:
+            for candidate in task_candidates:
+                save_candidate_file(candidate, output_dir, output_base, total_iterations, verbose=False)
+        return task_candidates
+
+    results = await _gather_bounded(
+        [generate_and_save(task_article_ids, task_preset_name) for task_article_ids, task_preset_name in tasks],
+        max_concurrent,
+        stage="CANDIDATES"
+    )
 
-        # Sort candidates by article_id to maintain order
-        candidates.sort(key=lambda c: c.article_id)
-    else:
-        # Sequential generation
-        for task_article_id, task_preset_name in tasks:
+    candidates = []
+    for (task_article_ids, task_preset_name), result in zip(tasks, results):
+        if isinstance(result, BaseException):
             if verbose:
-                print(f"Generating candidate {task_article_id}/{total_iterations} using {task_preset_name}...")
-
-            try:
-                candidate = generate_single_candidate(
-                    article_id=task_article_id,
-                    preset_name=task_preset_name,
-                    generation_system_prompt=generation_system_prompt,
-                    generation_user_prompt=generation_user_prompt,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    retry_count=retry_count,
-                    retry_delay=retry_delay,
-                    filter_think=filter_think,
-                    verbose=verbose
-                )
-                candidates.append(candidate)
-
-                if verbose:
-                    print(f"Progress: {task_article_id}/{total_iterations} candidates complete")
-
-                # Save candidate file if output is specified
-                if output_base and output_dir:
-                    save_candidate_file(
-                        candidate,
-                        output_dir,
-                        output_base,
-                        total_iterations,
-                        verbose=verbose
-                    )
-
-            except Exception as e:
-                if verbose:
-                    print(f"  ✗ Candidate {task_article_id} ({task_preset_name}) failed: {e}")
+                ids = ", ".join(str(task_article_id) for task_article_id in task_article_ids)
+                print(f"  ✗ Candidate {ids} ({task_preset_name}) failed: {result}")
+        else:
+            candidates.extend(result)
 
     if verbose:
-        print(f"✓ {mode_name.capitalize()} generation complete: {len(candidates)}/{total_iterations} candidates generated\n")
+        print(f"✓ Async generation complete: {len(candidates)}/{total_iterations} candidates generated\n")
 
     return candidates
 
@@ -2718,6 +7993,11 @@ def main():
         "--pipeline-preset",
         help="Model preset for pipeline stages (EXTRACT, SCORE, SELECT, SYNTHESIZE, VALIDATE). Uses default_preset from models.yaml if not specified."
     )
+    parser.add_argument(
+        "--stage-presets",
+        default="",
+        help="Per-stage preset overrides, e.g. 'EXTRACT=local-qwen,SCORE=local-qwen,SYNTHESIZE=or-sonnet-45'. Stages not listed use --pipeline-preset; SCORE also covers pairwise comparisons and CONTEXT condenses reference files for --context-budget"
+    )
     parser.add_argument(
         "--candidate-presets",
         help="Comma-separated list of model presets for CANDIDATES stage (e.g., 'local-qwen,local-minimax,openai-4o'). Iterations are distributed across presets (rounded up). Uses default_preset if not specified."
@@ -2739,7 +8019,57 @@ def main():
         "--max-tokens",
         type=int,
         default=40000,
-        help="Maximum tokens to generate (default: 4000)"
+        help="Maximum tokens to generate for candidates (default: 40000)"
+    )
+    parser.add_argument(
+        "--max-tokens-mode",
+        choices=list(MAX_TOKENS_MODES),
+        default="fixed",
+        help="'fixed' sends each stage's configured max_tokens; 'auto' sends a high percentile of the output lengths recorded for the stage and preset plus a margin, resending truncated responses with a larger budget"
+    )
+    parser.add_argument(
+        "--max-tokens-percentile",
+        type=float,
+        default=95.0,
+        help="Output length percentile used by --max-tokens-mode auto (default: 95)"
+    )
+    parser.add_argument(
+        "--max-tokens-margin",
+        type=float,
+        default=0.25,
+        help="Fractional margin added to the percentile by --max-tokens-mode auto (default: 0.25)"
+    )
+    parser.add_argument(
+        "--max-tokens-min-samples",
+        type=int,
+        default=20,
+        help="Recorded outputs a stage and preset need before --max-tokens-mode auto lowers max_tokens (default: 20)"
+    )
+    parser.add_argument(
+        "--output-stats-file",
+        help="JSON file holding the per-stage, per-preset output length histograms (default: <cache-dir>/output_lengths.json)"
+    )
+    parser.add_argument(
+        "--context-top-k",
+        type=int,
+        default=8,
+        help="Market research sections included in candidate prompts, ranked by BM25 match with the topic brief (default: 8)"
+    )
+    parser.add_argument(
+        "--full-context",
+        action="store_true",
+        help="Include the full market research in candidate prompts instead of the sections retrieved for the topic"
+    )
+    parser.add_argument(
+        "--context-budget",
+        type=int,
+        help="Token budget for the reference context in every candidate prompt, overriding each preset's context_budget in models.yaml (0 sends the full context)"
+    )
+    parser.add_argument(
+        "--context-condense-ratio",
+        type=float,
+        default=0.3,
+        help="Target size of the LLM-condensed reference files used to meet a context budget, as a fraction of the original (default: 0.3)"
     )
     parser.add_argument(
         "--output",
@@ -2819,12 +8149,102 @@ def main():
         action="store_true",
         help="Enable parallel article generation (recommended for --iterations >= 5)"
     )
+    parser.add_argument(
+        "--batch-candidates",
+        action="store_true",
+        help="Request each preset's candidates in as few calls as possible using the n parameter; presets with supports_n: false (or that reject n) use one call per candidate with distinct seeds"
+    )
+    parser.add_argument(
+        "--candidate-batch-size",
+        type=int,
+        default=8,
+        help="Maximum candidates per call with --batch-candidates (default: 8)"
+    )
     parser.add_argument(
         "--max-concurrent",
         type=int,
         default=15,
         help="Maximum concurrent LLM requests when using --parallel (default: 5)"
     )
+    parser.add_argument(
+        "--engine",
+        choices=["threaded", "async"],
+        default="threaded",
+        help="Execution engine: 'threaded' (ThreadPoolExecutor, default) or 'async' (single asyncio event loop; every stage fans out up to --max-concurrent in-flight requests)"
+    )
+    parser.add_argument(
+        "--hedge",
+        action="store_true",
+        help="Hedge straggling calls: once a call exceeds the p90 latency of its stage and preset, send a duplicate and keep the first to finish"
+    )
+    parser.add_argument(
+        "--hedge-preset",
+        help="Send hedges to this preset instead of repeating the original one"
+    )
+    parser.add_argument(
+        "--hedge-budget",
+        type=float,
+        default=0.1,
+        help="Maximum hedges as a fraction of LLM calls (default: 0.1)"
+    )
+    parser.add_argument(
+        "--retry-budget",
+        type=float,
+        default=0.2,
+        help="Retries allowed per run as a fraction of LLM calls, on top of a floor of 10 (default: 0.2)"
+    )
+    parser.add_argument(
+        "--adaptive-concurrency",
+        action="store_true",
+        help="Adapt concurrency per provider (AIMD): start at --max-concurrent, grow while latency is stable, halve on errors, 429s or latency spikes"
+    )
+    parser.add_argument(
+        "--adaptive-max-concurrent",
+        type=int,
+        help="Upper bound for --adaptive-concurrency (default: 4x --max-concurrent). Providers may override with concurrency: {initial, min, max} in models.yaml"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream completions: JSON stages stop reading once the JSON object closes, candidates and synthesis are written to <output>/streams/ as tokens arrive, and TTFT/tokens-per-second are reported per preset"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the persistent LLM response cache"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=".cache/llm",
+        help="Directory for the persistent LLM response cache (default: .cache/llm)"
+    )
+    parser.add_argument(
+        "--cache-stages",
+        default=",".join(DEFAULT_CACHE_STAGES),
+        help="Comma-separated stages whose responses are cached (default: EXTRACT,SCORE). Add SELECT, VALIDATE, SYNTHESIZE or CANDIDATES to cache them too; sampled stages then reuse one output"
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=512,
+        help="Maximum response cache size in MB before least-recently-used entries are evicted (default: 512)"
+    )
+    parser.add_argument(
+        "--coalesce-stages",
+        default=",".join(DEFAULT_COALESCE_STAGES),
+        help="Comma-separated stages whose identical concurrent requests share one upstream call (default: EXTRACT,SCORE). Pass an empty string to disable"
+    )
+    parser.add_argument(
+        "--prompt-layout",
+        choices=["standard", "prefix-cache"],
+        default="standard",
+        help="Prompt layout: 'prefix-cache' puts static content (system prompt, criteria, schema) first and per-item data last so server prefix caches hit"
+    )
+    parser.add_argument(
+        "--prefix-warmup",
+        action="store_true",
+        help="With --prompt-layout prefix-cache, send one 1-token prefill per stage before fanning out"
+    )
     parser.add_argument(
         "--scoring-mode",
         choices=["absolute", "pairwise"],
@@ -2846,6 +8266,58 @@ def main():
         cleanup_old_outputs(args.cleanup_old)
         return 0
 
+    # Size the shared connection pools to the stage concurrency
+    llm_client_registry.configure(
+        max_connections=max(args.max_concurrent, args.adaptive_max_concurrent or args.max_concurrent * 4)
+        if args.adaptive_concurrency else args.max_concurrent
+    )
+
+    llm_retry_policy.configure(budget_ratio=args.retry_budget)
+
+    if args.hedge:
+        if args.hedge_preset:
+            try:
+                llm_client_registry.resolve_preset(args.hedge_preset)
+            except (FileNotFoundError, ValueError) as e:
+                print(f"Error: {e}", file=sys.stderr)
+                return 1
+        llm_hedging.configure(budget_ratio=args.hedge_budget, alternate_preset=args.hedge_preset)
+
+    if args.adaptive_concurrency:
+        adaptive_concurrency.configure(
+            initial_limit=args.max_concurrent,
+            max_limit=args.adaptive_max_concurrent or args.max_concurrent * 4,
+            verbose=args.verbose
+        )
+
+    prompt_layout.mode = args.prompt_layout
+    prompt_layout.warmup = args.prefix_warmup
+
+    llm_streaming.enabled = args.stream
+    if args.stream and args.output:
+        llm_streaming.stream_dir = create_output_directory(args.output) / "streams"
+
+    if not args.no_cache:
+        llm_response_cache.configure(
+            cache_dir=args.cache_dir,
+            max_mb=args.cache_max_mb,
+            stages=[stage.strip() for stage in args.cache_stages.split(",") if stage.strip()]
+        )
+
+    llm_single_flight.configure([stage.strip() for stage in args.coalesce_stages.split(",") if stage.strip()])
+
+    output_length_stats.configure(
+        path=args.output_stats_file or str(Path(args.cache_dir) / "output_lengths.json"),
+        mode=args.max_tokens_mode,
+        percentile=args.max_tokens_percentile,
+        margin=args.max_tokens_margin,
+        min_samples=args.max_tokens_min_samples
+    )
+
+    preloaded = reference_registry.preload()
+    if args.verbose:
+        print(f"Loaded {preloaded} prompt and reference files from {', '.join(REFERENCE_DIRS)}")
+
     try:
         # ====================================================================
         # PARSE CANDIDATE PRESETS AND CALCULATE ITERATIONS
@@ -2872,6 +8344,7 @@ def main():
 
         # Build list of (preset_name, iterations_count) for generation
         preset_iterations = [(preset, iterations_per_preset) for preset in candidate_preset_list]
+        candidate_batch_size = max(1, args.candidate_batch_size) if args.batch_candidates else 1
 
         if args.verbose:
             print(f"\n{'='*80}")
@@ -2886,37 +8359,23 @@ def main():
 
         # Determine pipeline preset (for EXTRACT, SCORE, SELECT, SYNTHESIZE, VALIDATE)
         pipeline_preset = args.pipeline_preset if args.pipeline_preset else default_preset
+        pipeline_models = PipelineModels.from_overrides(pipeline_preset, parse_stage_presets(args.stage_presets))
+
+        # Validate every preset this run can reach (and their fallbacks) before any LLM spend
+        referenced_presets = [] if args.candidates_dir else list(candidate_preset_list)
+        if not args.candidates_only:
+            referenced_presets.extend(pipeline_models.presets())
+        if args.hedge and args.hedge_preset:
+            referenced_presets.append(args.hedge_preset)
+        if referenced_presets:
+            for warning in validate_presets(referenced_presets):
+                print(f"⚠ {warning}")
 
         if args.verbose:
             print("Using built-in system and user prompts for Construkted Reality marketing content")
         
         # Build prompts
 
-        # Read the three reference context files
-        writing_style_content = read_reference_file("reference_context/writing_style-enhanced.md")
-        market_analysis_content = read_reference_file("reference_context/Combined_Small_Team_Geospatial_Market_Analysis.md")
-        construkted_context_content = read_reference_file("reference_context/construkted_context.md")
-        
-        # Build the system prompt by combining all content
-        generation_system_prompt = f"""You are a masterful marketing copywriter for the company Construkted Reality. You generate engaging blog articles using the style guide provided.
-
-WRITING STYLE GUIDE:
-{writing_style_content}
-
-COMPANY CONTEXT:
-{construkted_context_content}
-
-MARKET RESEARCH CONTEXT:
-{market_analysis_content}
-
-When writing marketing content, always:
-1. Follow the writing style guidelines precisely
-2. Incorporate company context and mission naturally
-3. Reference market insights where relevant to strengthen arguments
-4. Maintain an engaging, conversational tone that educates while exciting
-5. Focus on the benefits of user-generated 3D data and community collaboration
-6. Avoid corporate jargon and speak directly to both professionals and hobbyists"""
-
         # Only read topic file if provided (not needed when loading candidates from disk)
         if args.topic_file:
             generation_user_prompt = read_reference_file(args.topic_file)
@@ -2924,6 +8383,43 @@ When writing marketing content, always:
             # Placeholder when loading candidates from disk - topic is embedded in candidate files
             generation_user_prompt = "[Candidate files loaded from disk - topic embedded in source files]"
         
+        # Build the system prompt from the three reference context files, narrowing
+        # the market research to the sections that match the topic brief
+        reference_contexts = {heading: read_reference_file(path) for heading, path in GENERATION_CONTEXT_FILES}
+        if args.topic_file and not args.candidates_dir and not args.full_context:
+            reference_index.configure(str(Path(args.cache_dir) / "reference_index.json"))
+            reference_contexts = retrieve_reference_context(reference_contexts, generation_user_prompt, args.context_top_k)
+            if args.verbose:
+                for heading, retrieval in pipeline_metrics.context_retrieval.items():
+                    print(f"Retrieved {retrieval['sections']} of {retrieval['total_sections']} {heading} sections "
+                          f"({retrieval['full_tokens']:,} → {retrieval['retrieved_tokens']:,} tokens)")
+        generation_system_prompt = build_generation_system_prompt(reference_contexts)
+
+        # Presets with a context budget get the reference files packed into it
+        preset_system_prompts: Dict[str, str] = {}
+        if not args.candidates_dir:
+            context_condenser.configure(
+                directory=str(Path(args.cache_dir) / "condensed"),
+                ratio=args.context_condense_ratio,
+                models=pipeline_models,
+                retry_count=args.retry_count,
+                retry_delay=args.retry_delay,
+                verbose=args.verbose
+            )
+            for preset_name in candidate_preset_list:
+                budget = args.context_budget
+                if budget is None:
+                    budget = llm_client_registry.capability(preset_name, "context_budget")
+                if not budget:
+                    continue
+                packed = pack_reference_context(int(budget), reference_contexts)
+                preset_system_prompts[preset_name] = build_generation_system_prompt(packed.contexts)
+                track_context_packing(preset_name, packed)
+                if args.verbose:
+                    print(f"Context for {preset_name}: {packed.packed_tokens:,} of {packed.full_tokens:,} reference tokens "
+                          f"(budget {packed.budget:,}; condensed: {', '.join(packed.condensed) or 'none'}, "
+                          f"{packed.dropped_sections} sections dropped)")
+
         if args.verbose:
             print("Built system and user prompts from reference context files")
         
@@ -2942,20 +8438,39 @@ When writing marketing content, always:
         else:
             # Mode 1 or 3: Generate candidates (default or --candidates-only)
             # Unified generation function handles both parallel and sequential modes
-            candidates = generate_candidates(
-                preset_iterations=preset_iterations,
-                generation_system_prompt=generation_system_prompt,
-                generation_user_prompt=generation_user_prompt,
-                temperature=args.temperature,
-                max_tokens=args.max_tokens,
-                retry_count=args.retry_count,
-                retry_delay=args.retry_delay,
-                filter_think=args.filter_think,
-                output_base=args.output,
-                parallel=args.parallel,
-                max_concurrent=args.max_concurrent,
-                verbose=args.verbose
-            )
+            if args.engine == "async":
+                candidates = run_coroutine(generate_candidates_async(
+                    preset_iterations=preset_iterations,
+                    generation_system_prompt=generation_system_prompt,
+                    generation_user_prompt=generation_user_prompt,
+                    temperature=args.temperature,
+                    max_tokens=args.max_tokens,
+                    retry_count=args.retry_count,
+                    retry_delay=args.retry_delay,
+                    filter_think=args.filter_think,
+                    output_base=args.output,
+                    max_concurrent=args.max_concurrent,
+                    verbose=args.verbose,
+                    batch_size=candidate_batch_size,
+                    preset_system_prompts=preset_system_prompts
+                ))
+            else:
+                candidates = generate_candidates(
+                    preset_iterations=preset_iterations,
+                    generation_system_prompt=generation_system_prompt,
+                    generation_user_prompt=generation_user_prompt,
+                    temperature=args.temperature,
+                    max_tokens=args.max_tokens,
+                    retry_count=args.retry_count,
+                    retry_delay=args.retry_delay,
+                    filter_think=args.filter_think,
+                    output_base=args.output,
+                    parallel=args.parallel,
+                    max_concurrent=args.max_concurrent,
+                    verbose=args.verbose,
+                    batch_size=candidate_batch_size,
+                    preset_system_prompts=preset_system_prompts
+                )
 
             # Add total execution time for candidates stage (only if we actually generated)
             stage_end_time = time.time()
@@ -2967,36 +8482,47 @@ When writing marketing content, always:
 
         # Run synthesis pipeline unless --candidates-only is set
         if not args.candidates_only:
-            # Load pipeline preset for synthesis stages (EXTRACT, SCORE, SELECT, SYNTHESIZE, VALIDATE)
+            # Presets for synthesis stages (EXTRACT, SCORE, SELECT, SYNTHESIZE, VALIDATE) travel with
+            # the pipeline; only the plain .env configuration still goes through os.environ
+            if any(pipeline_models.preset_for(stage_name) is None for stage_name in PIPELINE_STAGES):
+                load_environment()
+
             if args.verbose:
                 print(f"\n{'='*80}")
-                print("LOADING PIPELINE PRESET FOR SYNTHESIS STAGES")
+                print("PIPELINE PRESETS FOR SYNTHESIS STAGES")
                 print(f"{'='*80}")
-                if pipeline_preset:
-                    print(f"Pipeline preset: {pipeline_preset}")
-                else:
-                    print("Using default model configuration...")
-
-            load_environment(preset=pipeline_preset)
-
-            if args.verbose:
-                print(f"API Base URL: {os.getenv('OPENAI_API_BASE')}")
-                print(f"Model Name: {os.getenv('OPENAI_MODEL_NAME')}")
+                for stage_name in PIPELINE_STAGES:
+                    preset_name, (base_url, _, model_name) = _resolve_stage_model(pipeline_models, stage_name)
+                    print(f"{stage_name}: {preset_name or '.env configuration'} ({model_name} at {base_url})")
                 print(f"{'='*80}\n")
 
-            pipeline = ArticleSynthesisPipeline(verbose=args.verbose, filter_think=args.filter_think)
-
-            result = pipeline.run(
-                candidates=candidates,
-                original_user_prompt=generation_user_prompt,
-                brand_guidelines="",
-                target_word_count=args.target_word_count,
-                scoring_votes=args.synthesis_votes,
-                max_synthesis_retries=args.synthesis_retries,
-                parallel_processing=args.parallel,
-                max_concurrent=args.max_concurrent,
-                scoring_mode=args.scoring_mode
+            pipeline = ArticleSynthesisPipeline(
+                verbose=args.verbose, filter_think=args.filter_think, models=pipeline_models
             )
+
+            if args.engine == "async":
+                result = run_coroutine(pipeline.run_async(
+                    candidates=candidates,
+                    original_user_prompt=generation_user_prompt,
+                    brand_guidelines="",
+                    target_word_count=args.target_word_count,
+                    scoring_votes=args.synthesis_votes,
+                    max_synthesis_retries=args.synthesis_retries,
+                    max_concurrent=args.max_concurrent,
+                    scoring_mode=args.scoring_mode
+                ))
+            else:
+                result = pipeline.run(
+                    candidates=candidates,
+                    original_user_prompt=generation_user_prompt,
+                    brand_guidelines="",
+                    target_word_count=args.target_word_count,
+                    scoring_votes=args.synthesis_votes,
+                    max_synthesis_retries=args.synthesis_retries,
+                    parallel_processing=args.parallel,
+                    max_concurrent=args.max_concurrent,
+                    scoring_mode=args.scoring_mode
+                )
             
             # Save all pipeline outputs
             if args.output:
@@ -3033,6 +8559,13 @@ When writing marketing content, always:
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         return 1
+    finally:
+        llm_scheduler.close()
+        llm_hedging.close()
+        endpoint_router.close()
+        llm_client_registry.close()
+        llm_response_cache.close()
+        output_length_stats.save()
 
 
 if __name__ == "__main__":
@@ -37,7 +37,7 @@ from pathlib import Path
 import re
 import hashlib
 from datetime import datetime
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 from dotenv import load_dotenv
 from gpt_researcher import GPTResearcher
 from openai import OpenAI
@@ -53,12 +53,34 @@ class InsightObject:
     blog_post_content: str = ""  # Full blog post content when generated
     used: bool = False  # Flag indicating if blog post has been generated
  
+# Loaded templates keyed by path: (mtime_ns, content, sha256). Each file is read
+# once and re-read only when its mtime changes, so the per-insight prompt
+# builders do not hit disk on every call.
+_PROMPT_TEMPLATE_CACHE: Dict[Path, Tuple[int, str, str]] = {}
+
+
+def _read_prompt_template(template_name: str) -> Tuple[str, str]:
+    """Return (content, sha256) of a template, reloading it when the file changed."""
+    template_path = Path("llm_guidance") / f"{template_name}.md"
+    mtime_ns = template_path.stat().st_mtime_ns
+    cached = _PROMPT_TEMPLATE_CACHE.get(template_path)
+    if cached is None or cached[0] != mtime_ns:
+        data = template_path.read_bytes()
+        cached = (mtime_ns, data.decode("utf-8"), hashlib.sha256(data).hexdigest())
+        _PROMPT_TEMPLATE_CACHE[template_path] = cached
+    return cached[1], cached[2]
+
+
+def prompt_template_hashes() -> Dict[str, str]:
+    """Return template path -> sha256 for every template loaded so far."""
+    return {str(path): entry[2] for path, entry in sorted(_PROMPT_TEMPLATE_CACHE.items())}
+
+
 def load_prompt_template(template_name: str, **kwargs) -> str:
     """Load a prompt template from the prompts directory and format it with provided variables.
     Uses brace-safe formatting to avoid conflicts with JSON braces in templates."""
-    template_path = Path("llm_guidance") / f"{template_name}.md"
     try:
-        template_content = template_path.read_text(encoding="utf-8")
+        template_content, _ = _read_prompt_template(template_name)
         
         # Brace-safe formatting: only replace known placeholders
         for key, value in kwargs.items():
@@ -1424,6 +1446,8 @@ async def main_cli() -> None:
     end_time = time.time()
     elapsed_time = end_time - start_time
     logging.info(f"⏱️ Total execution time: {elapsed_time:.2f} seconds")
+    for template_path, digest in prompt_template_hashes().items():
+        logging.info(f"📄 Prompt template {template_path}: sha256 {digest[:12]}")
 
 # ----------------------------------------------------------------------
 # Entry point